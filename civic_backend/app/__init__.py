@@ -0,0 +1,2 @@
+# Imported first so STARTUP_PROFILE can time every module the app loads
+from .startup import startup_report
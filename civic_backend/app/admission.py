@@ -0,0 +1,133 @@
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from .auth import get_current_user
+from .cache import TTLCache
+from .db import get_db
+from .metrics import registry
+
+# Per-user rate limiting (load shedding stays on either way); off for load tests
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1").lower() in ("1", "true", "yes")
+
+# Requests per second each user may sustain across all endpoints, and the burst
+# a client that has been idle may spend at once
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "10"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "50"))
+
+def parse_route_limits(text: str) -> Dict[str, Tuple[float, float]]:
+    """Parse "route=rate:burst,..." (e.g. "/api/reports/all=2:20") into {route: (rate, burst)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        route, _, limit = item.partition("=")
+        rate, _, burst = limit.partition(":")
+        limits[route.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+# Tighter per-user limits (requests per second, burst) for expensive endpoints;
+# RATE_LIMIT_ROUTES overrides or adds entries
+ROUTE_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "/api/reports/all": (1.0, 10),
+    "/api/reports/my": (2.0, 10),
+    "/api/reports/search": (2.0, 10),
+    "/api/reports/nearby": (5.0, 20),
+    "/api/reports/upload": (0.5, 10),
+    "/api/reports/batch": (0.2, 5),
+    "/api/reports/status": (0.5, 5),
+    "/api/reports/export": (1 / 60, 2),
+    **parse_route_limits(os.getenv("RATE_LIMIT_ROUTES", "")),
+}
+
+# Buckets kept in memory; one idle for longer than the TTL would be full again anyway
+RATE_LIMIT_BUCKETS = int(os.getenv("RATE_LIMIT_BUCKETS", "50000"))
+RATE_LIMIT_IDLE_TTL = 600
+
+# Shed requests once callers are queueing for the pool and recent acquires
+# waited longer than this (seconds), instead of letting the queue grow
+DB_POOL_SHED_WAIT = float(os.getenv("DB_POOL_SHED_WAIT", "1.0"))
+
+rejections = registry.counter(
+    "admission_rejections_total", "Requests refused by rate limiting or load shedding", ("reason", "route")
+)
+
+class TokenBucket:
+    """Refills at rate tokens per second up to burst; each request takes one"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float = 1.0) -> float:
+        """Seconds until cost tokens are available (0 if they are now)"""
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+_buckets = TTLCache(maxsize=RATE_LIMIT_BUCKETS, ttl=RATE_LIMIT_IDLE_TTL)
+
+def _bucket(key: tuple, rate: float, burst: float) -> TokenBucket:
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = TokenBucket(rate, burst)
+    # Re-storing keeps an active bucket from expiring (and refilling) under the TTL
+    _buckets.set(key, bucket)
+    return bucket
+
+def check_rate_limit(user_id: int, route: str) -> Optional[float]:
+    """
+    Take a token from the user's overall bucket and the route's bucket.
+    Returns None if admitted, otherwise seconds until the request would be.
+    Nothing is taken unless every bucket has a token.
+    """
+    buckets = [_bucket((user_id,), RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)]
+    if route in ROUTE_RATE_LIMITS:
+        buckets.append(_bucket((user_id, route), *ROUTE_RATE_LIMITS[route]))
+
+    now = time.monotonic()
+    for bucket in buckets:
+        bucket.refill(now)
+    wait = max(bucket.wait_time() for bucket in buckets)
+    if wait > 0:
+        return wait
+
+    for bucket in buckets:
+        bucket.tokens -= 1
+    return None
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+async def admitted_user(request: Request, current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    get_current_user plus admission control: fail fast with 503 when the
+    database pool is saturated, and with 429 when the user is over a rate limit.
+    """
+    route = request.scope.get("route")
+    path = route.path if route is not None else request.url.path
+
+    db_pool = await get_db()
+    if db_pool.waiting and db_pool.wait_estimate > DB_POOL_SHED_WAIT:
+        rejections.inc(("overloaded", path))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": _retry_after(db_pool.wait_estimate)},
+        )
+
+    wait = check_rate_limit(current_user["id"], path) if RATE_LIMITS_ENABLED else None
+    if wait is not None:
+        rejections.inc(("rate_limited", path))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": _retry_after(wait)},
+        )
+
+    return current_user
@@ -0,0 +1,338 @@
+import asyncpg
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Geohash precision of an analytics area ("district"): cells of about 5km x 5km.
+# Reports without a location are counted under the empty area.
+AREA_PRECISION = 5
+
+OPEN_STATUSES = ("pending", "in_progress")
+
+# Longest window (days) and most areas one analytics request may return
+MAX_ANALYTICS_DAYS = 366
+MAX_ANALYTICS_AREAS = 1000
+
+def report_area(report) -> str:
+    geohash = report["geohash"]
+    return geohash[:AREA_PRECISION] if geohash else ""
+
+def _new_day():
+    # created, resolved, resolution seconds, closed, reopened
+    return [0, 0, 0.0, 0, 0]
+
+async def _apply_deltas(connection: asyncpg.Connection, daily: dict, backlog: dict):
+    """Upsert day and backlog deltas, each in one statement in sorted key order"""
+    days = sorted(key for key, delta in daily.items() if any(delta))
+    if days:
+        await connection.execute("""
+            INSERT INTO report_daily (
+                day, area, category, created_count, resolved_count, resolution_seconds,
+                closed_count, reopened_count
+            )
+            SELECT * FROM unnest($1::date[], $2::text[], $3::text[], $4::int[], $5::int[],
+                                 $6::float8[], $7::int[], $8::int[])
+            ON CONFLICT (day, area, category) DO UPDATE SET
+                created_count = report_daily.created_count + EXCLUDED.created_count,
+                resolved_count = report_daily.resolved_count + EXCLUDED.resolved_count,
+                resolution_seconds = report_daily.resolution_seconds + EXCLUDED.resolution_seconds,
+                closed_count = report_daily.closed_count + EXCLUDED.closed_count,
+                reopened_count = report_daily.reopened_count + EXCLUDED.reopened_count
+        """,
+            [key[0] for key in days],
+            [key[1] for key in days],
+            [key[2] for key in days],
+            *([daily[key][i] for key in days] for i in range(5))
+        )
+
+    areas = sorted(key for key, delta in backlog.items() if delta)
+    if areas:
+        await connection.execute("""
+            INSERT INTO report_backlog (area, category, open_count)
+            SELECT * FROM unnest($1::text[], $2::text[], $3::int[])
+            ON CONFLICT (area, category) DO UPDATE SET
+                open_count = report_backlog.open_count + EXCLUDED.open_count
+        """,
+            [key[0] for key in areas],
+            [key[1] for key in areas],
+            [backlog[key] for key in areas]
+        )
+
+async def apply_reports_created(connection: asyncpg.Connection, reports: Sequence):
+    """Count newly inserted reports in the rollups (call inside the insert transaction)"""
+    daily = defaultdict(_new_day)
+    backlog = defaultdict(int)
+
+    for report in reports:
+        area = report_area(report)
+        daily[(report["created_at"].date(), area, report["category"])][0] += 1
+        if (report["status"] or "pending") in OPEN_STATUSES:
+            backlog[(area, report["category"])] += 1
+
+    await _apply_deltas(connection, daily, backlog)
+
+async def apply_status_changes(connection: asyncpg.Connection, changes: Sequence[Tuple[object, str]]):
+    """
+    Record resolutions and backlog moves for (updated report, previous status)
+    pairs. Reports must carry created_at and changed_at (the update time).
+    """
+    daily = defaultdict(_new_day)
+    backlog = defaultdict(int)
+
+    for report, old_status in changes:
+        old_status = old_status or "pending"
+        new_status = report["status"]
+        if old_status == new_status:
+            continue
+
+        area, category = report_area(report), report["category"]
+        totals = daily[(report["changed_at"].date(), area, category)]
+        if new_status == "resolved":
+            totals[1] += 1
+            totals[2] += (report["changed_at"] - report["created_at"]).total_seconds()
+
+        was_open, is_open = old_status in OPEN_STATUSES, new_status in OPEN_STATUSES
+        if was_open and not is_open:
+            totals[3] += 1
+            backlog[(area, category)] -= 1
+        elif is_open and not was_open:
+            totals[4] += 1
+            backlog[(area, category)] += 1
+
+    await _apply_deltas(connection, daily, backlog)
+
+async def rebuild_rollups(connection: asyncpg.Connection):
+    """
+    Recompute the rollups from the reports table. Past resolutions and closures
+    leave no trace in reports, so only creations and the current backlog are
+    rebuilt; resolution figures accumulate from then on, and the backlog trend
+    starts at the rebuild day.
+    """
+    async with connection.transaction():
+        await connection.execute("TRUNCATE report_daily, report_backlog")
+        # The table is missing while migration 19 seeds; migration 21 dates that seed
+        if await connection.fetchval("SELECT to_regclass('analytics_state') IS NOT NULL"):
+            await connection.execute("""
+                INSERT INTO analytics_state (tracked_since) VALUES (LOCALTIMESTAMP::date)
+                ON CONFLICT (singleton) DO UPDATE SET tracked_since = EXCLUDED.tracked_since
+            """)
+        await connection.execute("""
+            INSERT INTO report_daily (day, area, category, created_count)
+            SELECT created_at::date, COALESCE(left(geohash, $1), ''), category, COUNT(*)
+            FROM reports
+            GROUP BY 1, 2, 3
+        """, AREA_PRECISION)
+        await connection.execute("""
+            INSERT INTO report_backlog (area, category, open_count)
+            SELECT COALESCE(left(geohash, $1), ''), category, COUNT(*)
+            FROM reports
+            WHERE COALESCE(status, 'pending') = ANY($2::text[])
+            GROUP BY 1, 2
+        """, AREA_PRECISION, list(OPEN_STATUSES))
+    logger.info("Analytics rollups rebuilt")
+
+async def remove_archived_reports(connection: asyncpg.Connection, table: str):
+    """
+    Take the open reports in a detached partition out of the backlog. The daily
+    rollups keep their history and count them as archived today, so the
+    backlog trend before today is unchanged.
+    """
+    await connection.execute(f"""
+        WITH archived AS (
+            SELECT COALESCE(left(geohash, $1), '') AS area, category, COUNT(*) AS n
+            FROM {table}
+            WHERE COALESCE(status, 'pending') = ANY($2::text[])
+            GROUP BY 1, 2
+        ),
+        backlog AS (
+            INSERT INTO report_backlog (area, category, open_count)
+            SELECT area, category, -n FROM archived
+            ORDER BY 1, 2
+            ON CONFLICT (area, category) DO UPDATE SET
+                open_count = report_backlog.open_count + EXCLUDED.open_count
+        )
+        INSERT INTO report_daily (day, area, category, archived_count)
+        SELECT LOCALTIMESTAMP::date, area, category, n FROM archived
+        ORDER BY 2, 3
+        ON CONFLICT (day, area, category) DO UPDATE SET
+            archived_count = report_daily.archived_count + EXCLUDED.archived_count
+    """, AREA_PRECISION, list(OPEN_STATUSES))
+
+def _filters(args: list, category: Optional[str], area: Optional[str]) -> List[str]:
+    """Category and area-prefix conditions, appending their parameters to args"""
+    conditions = []
+    if category is not None:
+        args.append(category)
+        conditions.append(f"category = ${len(args)}")
+    if area:
+        # Geohash prefixes contain no LIKE wildcards
+        args.append(area + "%")
+        conditions.append(f"area LIKE ${len(args)}")
+    return conditions
+
+def build_daily_query(since: date, until: date, category: Optional[str] = None, area: Optional[str] = None):
+    """Build the per day and category totals query over [since, until]"""
+    args = [since, until]
+    conditions = ["day BETWEEN $1 AND $2", *_filters(args, category, area)]
+
+    query = f"""
+        SELECT day, category,
+               SUM(created_count) AS created, SUM(resolved_count) AS resolved,
+               SUM(resolution_seconds) AS resolution_seconds,
+               SUM(closed_count) AS closed, SUM(reopened_count) AS reopened
+        FROM report_daily
+        WHERE {' AND '.join(conditions)}
+        GROUP BY day, category
+        ORDER BY day, category
+    """
+    return query, args
+
+async def fetch_daily(
+    connection: asyncpg.Connection,
+    since: date,
+    until: date,
+    category: Optional[str] = None,
+    area: Optional[str] = None
+) -> List[dict]:
+    """Reports created and resolved per day and category over [since, until]"""
+    query, args = build_daily_query(since, until, category, area)
+    rows = await connection.fetch(query, *args)
+
+    return [
+        {
+            "day": row["day"],
+            "category": row["category"],
+            "created": row["created"],
+            "resolved": row["resolved"],
+            "closed": row["closed"],
+            "reopened": row["reopened"],
+            "mean_resolution_hours": row["resolution_seconds"] / row["resolved"] / 3600 if row["resolved"] else None
+        }
+        for row in rows
+    ]
+
+def build_resolution_by_area_query(
+    since: date,
+    until: date,
+    category: Optional[str] = None,
+    limit: int = MAX_ANALYTICS_AREAS
+):
+    """Build the per-area resolutions query over [since, until]"""
+    args = [since, until]
+    conditions = ["day BETWEEN $1 AND $2", "resolved_count > 0", *_filters(args, category, None)]
+    args.append(limit)
+
+    query = f"""
+        SELECT area, SUM(resolved_count) AS resolved, SUM(resolution_seconds) AS resolution_seconds
+        FROM report_daily
+        WHERE {' AND '.join(conditions)}
+        GROUP BY area
+        ORDER BY resolved DESC, area
+        LIMIT ${len(args)}
+    """
+    return query, args
+
+async def fetch_resolution_by_area(
+    connection: asyncpg.Connection,
+    since: date,
+    until: date,
+    category: Optional[str] = None,
+    limit: int = MAX_ANALYTICS_AREAS
+) -> List[dict]:
+    """Resolutions and mean resolution time per area over [since, until], busiest areas first"""
+    query, args = build_resolution_by_area_query(since, until, category, limit)
+    rows = await connection.fetch(query, *args)
+
+    return [
+        {
+            "area": row["area"],
+            "resolved": row["resolved"],
+            "mean_resolution_hours": row["resolution_seconds"] / row["resolved"] / 3600
+        }
+        for row in rows
+    ]
+
+def build_backlog_by_area_query(category: Optional[str] = None, limit: int = MAX_ANALYTICS_AREAS):
+    """Build the per-area open backlog query"""
+    args = []
+    conditions = ["open_count > 0", *_filters(args, category, None)]
+    args.append(limit)
+
+    query = f"""
+        SELECT area, SUM(open_count) AS open
+        FROM report_backlog
+        WHERE {' AND '.join(conditions)}
+        GROUP BY area
+        ORDER BY open DESC, area
+        LIMIT ${len(args)}
+    """
+    return query, args
+
+async def fetch_backlog_by_area(
+    connection: asyncpg.Connection,
+    category: Optional[str] = None,
+    limit: int = MAX_ANALYTICS_AREAS
+) -> List[dict]:
+    """Open reports per area right now, largest backlogs first"""
+    query, args = build_backlog_by_area_query(category, limit)
+    rows = await connection.fetch(query, *args)
+
+    return [{"area": row["area"], "open": row["open"]} for row in rows]
+
+def build_backlog_net_query(since: date, today: date, category: Optional[str] = None, area: Optional[str] = None):
+    """Build the query for each day's net backlog change over [since, today]"""
+    args = [since, today]
+    conditions = ["day BETWEEN $1 AND $2", *_filters(args, category, area)]
+
+    query = f"""
+        SELECT day, SUM(created_count + reopened_count - closed_count - archived_count) AS net
+        FROM report_daily
+        WHERE {' AND '.join(conditions)}
+        GROUP BY day
+    """
+    return query, args
+
+async def fetch_backlog_trend(
+    connection: asyncpg.Connection,
+    since: date,
+    until: date,
+    category: Optional[str] = None,
+    area: Optional[str] = None
+) -> List[dict]:
+    """
+    Open backlog at the end of each day in [since, until]. Works back from the
+    current backlog through each day's net change, so it reads only the days
+    from since to today. Days before the rollups were last rebuilt have no
+    closure history and get None.
+    """
+    backlog_args = []
+    backlog_conditions = _filters(backlog_args, category, area)
+    current = await connection.fetchrow(f"""
+        SELECT LOCALTIMESTAMP::date AS today, COALESCE(SUM(open_count), 0) AS open,
+               (SELECT tracked_since FROM analytics_state) AS tracked_since
+        FROM report_backlog
+        {'WHERE ' + ' AND '.join(backlog_conditions) if backlog_conditions else ''}
+    """, *backlog_args)
+    today, tracked_since = current["today"], current["tracked_since"]
+
+    query, args = build_backlog_net_query(since, today, category, area)
+    rows = await connection.fetch(query, *args)
+    net = {row["day"]: row["net"] for row in rows}
+
+    # Walk back from today: the backlog at the end of day d-1 is the backlog
+    # at the end of day d minus d's net change
+    trend = []
+    backlog = current["open"]
+    day = today
+    while day >= since:
+        if day <= until:
+            tracked = tracked_since is None or day >= tracked_since
+            trend.append({"day": day, "open": max(backlog, 0) if tracked else None})
+        backlog -= net.get(day, 0)
+        day = date.fromordinal(day.toordinal() - 1)
+
+    trend.reverse()
+    return trend
@@ -3,12 +3,43 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional
 import asyncpg
-from .db import get_db
-from .utils import hash_password, verify_password, create_access_token, decode_token
+import logging
+import os
+from .db import get_db, add_listener, on_listener_reconnect
+from .cache import TTLCache
+from .utils import (
+    hash_password_async, verify_password_async, PasswordPoolBusy, create_access_token, decode_token
+)
+
+logger = logging.getLogger(__name__)
 
 auth_router = APIRouter()
 security = HTTPBearer()
 
+# Authenticated principals by user id, so hot-path requests skip the users lookup.
+# Entries are dropped on user_changes notifications; the TTL bounds staleness if
+# a notification is missed.
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(user_id: int):
+    """Drop a cached principal after the user changes or is deleted"""
+    principal_cache.invalidate(user_id)
+
+def _on_user_changed(connection, pid, channel, payload):
+    """Handle a user_changes notification from the users table trigger"""
+    try:
+        invalidate_principal(int(payload))
+    except ValueError:
+        logger.warning(f"Ignoring malformed {channel} payload: {payload!r}")
+
+async def start_principal_invalidation():
+    """Listen for user changes so every worker drops stale principals"""
+    await add_listener("user_changes", _on_user_changed)
+    # Changes made while the listener was down were never seen
+    on_listener_reconnect(principal_cache.clear)
+
 # Pydantic models
 class UserRegister(BaseModel):
     username: str
@@ -47,12 +78,28 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    
+    # A change notified while the row is being read must win over the row
+    generation = principal_cache.generation
+    
     # Get user from database
     db_pool = await get_db()
     async with db_pool.acquire() as connection:
         user = await connection.fetchrow(
             "SELECT id, username FROM users WHERE id = $1",
-            int(user_id)
+            user_id
         )
         
         if user is None:
@@ -62,7 +109,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        return {"id": user["id"], "username": user["username"]}
+        principal = {"id": user["id"], "username": user["username"]}
+        principal_cache.set(user_id, principal, generation)
+        return principal
+
+def password_pool_busy() -> HTTPException:
+    """Build the error returned when the password hashing queue is full"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
 @auth_router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserRegister):
@@ -76,15 +133,19 @@ async def register(user_data: UserRegister):
             user_data.username
         )
         
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered"
-            )
-        
-        # Hash password and create user
-        hashed_password = hash_password(user_data.password)
-        
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered"
+        )
+    
+    # Hash password on the worker pool, without holding a database connection
+    try:
+        hashed_password = await hash_password_async(user_data.password)
+    except PasswordPoolBusy:
+        raise password_pool_busy()
+    
+    async with db_pool.acquire() as connection:
         try:
             user = await connection.fetchrow(
                 "INSERT INTO users (username, password) VALUES ($1, $2) RETURNING id, username",
@@ -117,21 +178,27 @@ async def login(user_data: UserLogin):
             "SELECT id, username, password FROM users WHERE username = $1",
             user_data.username
         )
-        
-        if not user or not verify_password(user_data.password, user["password"]):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid username or password"
-            )
-        
-        # Create access token
-        access_token = create_access_token(user["id"], user["username"])
-        
-        return TokenResponse(
-            access_token=access_token,
-            token_type="bearer",
-            user=UserResponse(id=user["id"], username=user["username"])
+    
+    # Verify on the worker pool after releasing the connection
+    try:
+        valid = user is not None and await verify_password_async(user_data.password, user["password"])
+    except PasswordPoolBusy:
+        raise password_pool_busy()
+    
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid username or password"
         )
+    
+    # Create access token
+    access_token = create_access_token(user["id"], user["username"])
+    
+    return TokenResponse(
+        access_token=access_token,
+        token_type="bearer",
+        user=UserResponse(id=user["id"], username=user["username"])
+    )
 
 @auth_router.get("/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
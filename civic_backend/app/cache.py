@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry expiry and least-recently-used
+    eviction. generation advances on every invalidation, so a value fetched
+    before one can be refused by set.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Optional[Any]:
+        """Return a live entry and mark it recently used, or default"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """
+        Store an entry, evicting the least recently used one when full. Given the
+        generation read before the value was fetched, skips storing it if an
+        invalidation happened meanwhile.
+        """
+        if generation is not None and generation != self.generation:
+            return
+
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop an entry if present"""
+        self._entries.pop(key, None)
+        self.generation += 1
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+        self.generation += 1
+
+    def stats(self) -> dict:
+        """Return size and hit/miss/eviction counters"""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
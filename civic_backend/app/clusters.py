@@ -0,0 +1,161 @@
+import asyncpg
+import logging
+from collections import defaultdict
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Geohash precisions with a maintained per-cell aggregate (~5000km down to ~150m)
+CLUSTER_PRECISIONS = range(1, 8)
+
+# Upper bound on cells returned for a single viewport
+MAX_VIEWPORT_CELLS = 256
+
+def zoom_to_precision(zoom: int) -> int:
+    """Pick the geohash precision giving a handful of clusters across a map tile at this zoom"""
+    precision = round((zoom + 3) * 2 / 5)
+    return max(CLUSTER_PRECISIONS[0], min(precision, CLUSTER_PRECISIONS[-1]))
+
+def _report_deltas(report, sign: int, status: Optional[str] = None):
+    """
+    Yield one aggregate delta per cluster precision for a geolocated report.
+    Duplicates are left out, as they are from /nearby and /all.
+    """
+    geohash = report["geohash"]
+    if not geohash or report["latitude"] is None or report["longitude"] is None:
+        return
+    if report["duplicate_of"] is not None:
+        return
+
+    latitude = float(report["latitude"]) * sign
+    longitude = float(report["longitude"]) * sign
+    status = status or report["status"] or "pending"
+
+    for precision in CLUSTER_PRECISIONS:
+        yield (precision, geohash[:precision], report["category"], status), (sign, latitude, longitude)
+
+async def _apply_deltas(connection: asyncpg.Connection, deltas: Iterable[Tuple[tuple, tuple]]):
+    """Merge deltas per cell and upsert them in one statement"""
+    merged = defaultdict(lambda: [0, 0.0, 0.0])
+    for key, (count, lat_sum, lon_sum) in deltas:
+        totals = merged[key]
+        totals[0] += count
+        totals[1] += lat_sum
+        totals[2] += lon_sum
+
+    if not merged:
+        return
+
+    # Sorted keys give concurrent writers a consistent lock order
+    keys = sorted(merged)
+    await connection.execute("""
+        INSERT INTO report_cells (precision, cell, category, status, report_count, latitude_sum, longitude_sum)
+        SELECT * FROM unnest($1::smallint[], $2::text[], $3::text[], $4::text[],
+                             $5::int[], $6::float8[], $7::float8[])
+        ON CONFLICT (precision, cell, category, status) DO UPDATE SET
+            report_count = report_cells.report_count + EXCLUDED.report_count,
+            latitude_sum = report_cells.latitude_sum + EXCLUDED.latitude_sum,
+            longitude_sum = report_cells.longitude_sum + EXCLUDED.longitude_sum
+    """,
+        [key[0] for key in keys],
+        [key[1] for key in keys],
+        [key[2] for key in keys],
+        [key[3] for key in keys],
+        [merged[key][0] for key in keys],
+        [merged[key][1] for key in keys],
+        [merged[key][2] for key in keys]
+    )
+
+async def apply_reports_created(connection: asyncpg.Connection, reports: Sequence):
+    """Add newly inserted reports to the per-cell aggregates (call inside the insert transaction)"""
+    await _apply_deltas(connection, (
+        delta
+        for report in reports
+        for delta in _report_deltas(report, 1)
+    ))
+
+async def apply_status_changes(connection: asyncpg.Connection, changes: Sequence[Tuple[object, str]]):
+    """Move reports between status buckets; changes holds (updated report, previous status) pairs"""
+    await _apply_deltas(connection, (
+        delta
+        for report, old_status in changes
+        if old_status != report["status"]
+        for delta in [*_report_deltas(report, -1, status=old_status), *_report_deltas(report, 1)]
+    ))
+
+async def apply_duplicates_released(connection: asyncpg.Connection, reports: Sequence):
+    """Add duplicates that became canonical again (their duplicate_of now NULL) to the aggregates"""
+    await apply_reports_created(connection, reports)
+
+async def rebuild_report_cells(connection: asyncpg.Connection):
+    """Recompute every per-cell aggregate from the reports table"""
+    async with connection.transaction():
+        await connection.execute("TRUNCATE report_cells")
+        await connection.execute("""
+            INSERT INTO report_cells (precision, cell, category, status, report_count, latitude_sum, longitude_sum)
+            SELECT p.precision, left(r.geohash, p.precision), r.category, COALESCE(r.status, 'pending'),
+                   COUNT(*), SUM(r.latitude::float8), SUM(r.longitude::float8)
+            FROM reports r
+            CROSS JOIN generate_series($1::int, $2::int) AS p(precision)
+            WHERE r.geohash IS NOT NULL AND r.latitude IS NOT NULL AND r.longitude IS NOT NULL
+              AND r.duplicate_of IS NULL
+            GROUP BY 1, 2, 3, 4
+        """, CLUSTER_PRECISIONS[0], CLUSTER_PRECISIONS[-1])
+    logger.info("Report cluster aggregates rebuilt")
+
+async def remove_archived_reports(connection: asyncpg.Connection, table: str):
+    """Subtract the reports in a detached partition from the per-cell aggregates"""
+    await connection.execute(f"""
+        INSERT INTO report_cells (precision, cell, category, status, report_count, latitude_sum, longitude_sum)
+        SELECT p.precision, left(r.geohash, p.precision), r.category, COALESCE(r.status, 'pending'),
+               -COUNT(*), -SUM(r.latitude::float8), -SUM(r.longitude::float8)
+        FROM {table} r
+        CROSS JOIN generate_series($1::int, $2::int) AS p(precision)
+        WHERE r.geohash IS NOT NULL AND r.latitude IS NOT NULL AND r.longitude IS NOT NULL
+          AND r.duplicate_of IS NULL
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (precision, cell, category, status) DO UPDATE SET
+            report_count = report_cells.report_count + EXCLUDED.report_count,
+            latitude_sum = report_cells.latitude_sum + EXCLUDED.latitude_sum,
+            longitude_sum = report_cells.longitude_sum + EXCLUDED.longitude_sum
+    """, CLUSTER_PRECISIONS[0], CLUSTER_PRECISIONS[-1])
+
+# Aggregates of the cells covering a viewport at one precision
+CLUSTER_CELLS_QUERY = """
+    SELECT cell, category, status, report_count, latitude_sum, longitude_sum
+    FROM report_cells
+    WHERE precision = $1 AND cell = ANY($2::text[]) AND report_count > 0
+"""
+
+async def fetch_clusters(connection: asyncpg.Connection, precision: int, cells: List[str]) -> List[dict]:
+    """Read the aggregates for the given cells and fold them into one cluster per cell"""
+    rows = await connection.fetch(CLUSTER_CELLS_QUERY, precision, cells)
+
+    clusters = {}
+    for row in rows:
+        cluster = clusters.setdefault(row["cell"], {
+            "cell": row["cell"],
+            "count": 0,
+            "latitude_sum": 0.0,
+            "longitude_sum": 0.0,
+            "by_status": defaultdict(int),
+            "by_category": defaultdict(int)
+        })
+        cluster["count"] += row["report_count"]
+        cluster["latitude_sum"] += row["latitude_sum"]
+        cluster["longitude_sum"] += row["longitude_sum"]
+        cluster["by_status"][row["status"]] += row["report_count"]
+        cluster["by_category"][row["category"]] += row["report_count"]
+
+    return [
+        {
+            "cell": cluster["cell"],
+            "count": cluster["count"],
+            "latitude": cluster["latitude_sum"] / cluster["count"],
+            "longitude": cluster["longitude_sum"] / cluster["count"],
+            "by_status": dict(cluster["by_status"]),
+            "by_category": dict(cluster["by_category"])
+        }
+        for cluster in clusters.values()
+    ]
@@ -0,0 +1,191 @@
+import asyncio
+import asyncpg
+import logging
+import os
+import random
+from collections import defaultdict
+from typing import Dict, Optional, Sequence, Tuple
+from .etags import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+# report_counters.user_id value holding the global totals. These leave out
+# duplicates like /all does; each user's own counts include them, like /my.
+GLOBAL_USER_ID = 0
+
+# Global totals are spread over several rows so concurrent inserts
+# don't all queue on the same row lock
+GLOBAL_SLOTS = 16
+
+# Advisory lock key so only one worker reconciles at a time
+RECONCILE_LOCK_KEY = 7_340_001
+
+# Seconds between reconciliation passes (0 disables the background job)
+RECONCILE_INTERVAL = int(os.getenv("COUNTER_RECONCILE_INTERVAL", "3600"))
+
+async def _apply_deltas(connection: asyncpg.Connection, deltas: Dict[Tuple[int, str, int], int]):
+    """Upsert counter deltas keyed by (user_id, status, slot) in one statement"""
+    keys = sorted(key for key, delta in deltas.items() if delta)
+    if not keys:
+        return
+
+    await connection.execute("""
+        INSERT INTO report_counters (user_id, status, slot, report_count)
+        SELECT * FROM unnest($1::int[], $2::text[], $3::smallint[], $4::bigint[])
+        ON CONFLICT (user_id, status, slot) DO UPDATE SET
+            report_count = report_counters.report_count + EXCLUDED.report_count
+    """,
+        [key[0] for key in keys],
+        [key[1] for key in keys],
+        [key[2] for key in keys],
+        [deltas[key] for key in keys]
+    )
+
+async def apply_reports_created(connection: asyncpg.Connection, reports: Sequence):
+    """Count newly inserted reports (call inside the insert transaction)"""
+    slot = random.randrange(GLOBAL_SLOTS)
+    deltas = defaultdict(int)
+
+    for report in reports:
+        report_status = report["status"] or "pending"
+        if report["duplicate_of"] is None:
+            deltas[(GLOBAL_USER_ID, report_status, slot)] += 1
+        deltas[(report["user_id"], report_status, 0)] += 1
+
+    await _apply_deltas(connection, deltas)
+
+async def apply_status_changes(connection: asyncpg.Connection, changes: Sequence[Tuple[object, str]]):
+    """Move counts between statuses; changes holds (updated report, previous status) pairs"""
+    slot = random.randrange(GLOBAL_SLOTS)
+    deltas = defaultdict(int)
+
+    for report, old_status in changes:
+        old_status = old_status or "pending"
+        if old_status == report["status"]:
+            continue
+        if report["duplicate_of"] is None:
+            deltas[(GLOBAL_USER_ID, old_status, slot)] -= 1
+            deltas[(GLOBAL_USER_ID, report["status"], slot)] += 1
+        deltas[(report["user_id"], old_status, 0)] -= 1
+        deltas[(report["user_id"], report["status"], 0)] += 1
+
+    await _apply_deltas(connection, deltas)
+
+async def apply_duplicates_released(connection: asyncpg.Connection, reports: Sequence):
+    """Add duplicates that became canonical again to the global totals"""
+    slot = random.randrange(GLOBAL_SLOTS)
+    deltas = defaultdict(int)
+
+    for report in reports:
+        deltas[(GLOBAL_USER_ID, report["status"] or "pending", slot)] += 1
+
+    await _apply_deltas(connection, deltas)
+
+async def remove_archived_reports(connection: asyncpg.Connection, table: str):
+    """Subtract the reports in a detached partition from the counters"""
+    await connection.execute(f"""
+        INSERT INTO report_counters (user_id, status, slot, report_count)
+        SELECT user_id, status, 0, -n
+        FROM (
+            SELECT $1::int AS user_id, COALESCE(status, 'pending') AS status, COUNT(*) AS n
+            FROM {table}
+            WHERE duplicate_of IS NULL
+            GROUP BY 2
+            UNION ALL
+            SELECT user_id, COALESCE(status, 'pending'), COUNT(*)
+            FROM {table}
+            WHERE user_id IS NOT NULL
+            GROUP BY 1, 2
+        ) archived
+        ORDER BY 1, 2
+        ON CONFLICT (user_id, status, slot) DO UPDATE SET
+            report_count = report_counters.report_count + EXCLUDED.report_count
+    """, GLOBAL_USER_ID)
+
+async def fetch_stats(connection: asyncpg.Connection, user_id: int) -> dict:
+    """Read the global totals and one user's total from the counters"""
+    rows = await connection.fetch("""
+        SELECT user_id, status, SUM(report_count) AS report_count
+        FROM report_counters
+        WHERE user_id = ANY($1::int[])
+        GROUP BY user_id, status
+    """, [GLOBAL_USER_ID, user_id])
+
+    by_status = defaultdict(int)
+    user_reports = 0
+    for row in rows:
+        if row["user_id"] == GLOBAL_USER_ID:
+            by_status[row["status"]] += row["report_count"]
+        else:
+            user_reports += row["report_count"]
+
+    return {
+        "total_reports": sum(by_status.values()),
+        "pending_reports": by_status["pending"],
+        "resolved_reports": by_status["resolved"],
+        "user_reports": user_reports
+    }
+
+async def reconcile_counters(connection: asyncpg.Connection, wait: bool = False) -> Optional[int]:
+    """
+    Recount reports and repair any counters that drifted (e.g. reports removed
+    by ON DELETE CASCADE). Returns the number of repaired counters, or None if
+    another worker is already reconciling. With wait, waits for that worker
+    instead, so the recount always runs.
+    """
+    if wait:
+        await connection.execute("SELECT pg_advisory_lock($1)", RECONCILE_LOCK_KEY)
+    elif not await connection.fetchval("SELECT pg_try_advisory_lock($1)", RECONCILE_LOCK_KEY):
+        return None
+
+    try:
+        # Reports and their counters change in the same transactions, so one
+        # snapshot sees them consistent without blocking any writer
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            drifted = await connection.fetch("""
+                WITH actual AS (
+                    SELECT $1::int AS user_id, COALESCE(status, 'pending') AS status, COUNT(*) AS n
+                    FROM reports
+                    WHERE duplicate_of IS NULL
+                    GROUP BY 2
+                    UNION ALL
+                    SELECT user_id, COALESCE(status, 'pending'), COUNT(*)
+                    FROM reports
+                    WHERE user_id IS NOT NULL
+                    GROUP BY 1, 2
+                ), stored AS (
+                    SELECT user_id, status, SUM(report_count) AS n
+                    FROM report_counters
+                    GROUP BY 1, 2
+                )
+                SELECT user_id, status, COALESCE(actual.n, 0) - COALESCE(stored.n, 0) AS delta
+                FROM actual FULL JOIN stored USING (user_id, status)
+                WHERE COALESCE(actual.n, 0) <> COALESCE(stored.n, 0)
+            """, GLOBAL_USER_ID)
+
+        # Applied as deltas, the corrections stay right whatever was written
+        # since the snapshot
+        if drifted:
+            async with connection.transaction():
+                await _apply_deltas(connection, {
+                    (row["user_id"], row["status"], 0): row["delta"] for row in drifted
+                })
+            logger.warning(f"Repaired {len(drifted)} drifted report counters")
+
+        return len(drifted)
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock($1)", RECONCILE_LOCK_KEY)
+
+async def run_reconciliation(pool: asyncpg.Pool, interval: int = RECONCILE_INTERVAL):
+    """Periodically reconcile the counters until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with pool.acquire() as connection:
+                # Repaired counts change /stats, so cached copies must revalidate
+                if await reconcile_counters(connection):
+                    await bump_data_version(connection)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Counter reconciliation failed: {e}")
@@ -1,18 +1,42 @@
 import os
+import asyncio
 import asyncpg
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 import logging
 from dotenv import load_dotenv
+from .migrations import schema_is_current, apply_migrations
+from .metrics import InstrumentedPool, instrument_connection, register_pool_metrics
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# Database connection pool
-db_pool: Optional[asyncpg.Pool] = None
+# Connection pool sizing; requests queue for a connection once all are in use
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+
+# Longest a request waits for a pooled connection before failing with 503
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+
+# Database connection pool (instrumented for acquire wait and saturation)
+db_pool: Optional[InstrumentedPool] = None
+
+# Dedicated connection for LISTEN/NOTIFY subscriptions (kept out of the pool)
+listener_connection: Optional[asyncpg.Connection] = None
+
+# Seconds between attempts to reopen a lost listener connection (doubling up to the max)
+LISTENER_RECONNECT_DELAY = 0.5
+LISTENER_RECONNECT_MAX_DELAY = 30.0
+
+# Callbacks per channel, re-subscribed on every new listener connection, and
+# callbacks run once a lost connection is back (notifications in between are lost)
+_listeners: Dict[str, List[Callable]] = {}
+_reconnect_callbacks: List[Callable[[], None]] = []
+_reconnect_task: Optional[asyncio.Task] = None
 
 async def init_db():
-    """Initialize database connection pool and create tables"""
+    """Initialize database connection pool and apply pending schema migrations"""
     global db_pool
     
     database_url = os.getenv("DATABASE_URL")
@@ -20,67 +44,35 @@ async def init_db():
         raise ValueError("DATABASE_URL environment variable is required")
     
     try:
-        db_pool = await asyncpg.create_pool(
+        db_pool = InstrumentedPool(await asyncpg.create_pool(
             database_url,
-            min_size=1,
-            max_size=10,
-            command_timeout=60
-        )
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            command_timeout=DB_COMMAND_TIMEOUT,
+            init=instrument_connection
+        ), acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT)
+        register_pool_metrics(db_pool)
         logger.info("Database connection pool created successfully")
         
-        # Create tables if they don't exist
-        await create_tables()
+        await migrate_schema(database_url)
         
     except Exception as e:
         logger.error(f"Failed to create database pool: {e}")
         raise
 
-async def create_tables():
-    """Create database tables if they don't exist"""
-    if not db_pool:
-        raise RuntimeError("Database pool not initialized")
-    
+async def migrate_schema(database_url: str):
+    """Bring the schema up to date; workers on a current schema skip all DDL"""
     async with db_pool.acquire() as connection:
-        # Create users table
-        await connection.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create reports table
-        await connection.execute("""
-            CREATE TABLE IF NOT EXISTS reports (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                text TEXT NOT NULL,
-                latitude DECIMAL(10, 8),
-                longitude DECIMAL(11, 8),
-                image_url TEXT,
-                category VARCHAR(100) NOT NULL,
-                status VARCHAR(50) DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create indexes for better mobile query performance
-        await connection.execute("""
-            CREATE INDEX IF NOT EXISTS idx_reports_user_id ON reports(user_id)
-        """)
-        await connection.execute("""
-            CREATE INDEX IF NOT EXISTS idx_reports_status ON reports(status)
-        """)
-        await connection.execute("""
-            CREATE INDEX IF NOT EXISTS idx_reports_category ON reports(category)
-        """)
-        await connection.execute("""
-            CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at DESC)
-        """)
-        
-        logger.info("Database tables created/verified successfully")
+        if await schema_is_current(connection):
+            return
+    
+    # Index builds and backfills can outlast the pool's command timeout
+    connection = await asyncpg.connect(database_url)
+    try:
+        applied = await apply_migrations(connection)
+        logger.info(f"Applied {applied} schema migrations")
+    finally:
+        await connection.close()
 
 async def get_db():
     """Get database connection from pool"""
@@ -88,9 +80,69 @@ async def get_db():
         raise RuntimeError("Database pool not initialized")
     return db_pool
 
+async def _open_listener_connection():
+    """Connect the listener and LISTEN on every subscribed channel"""
+    global listener_connection
+    
+    connection = await asyncpg.connect(os.getenv("DATABASE_URL"))
+    for channel, callbacks in _listeners.items():
+        for callback in callbacks:
+            await connection.add_listener(channel, callback)
+    connection.add_termination_listener(_on_listener_lost)
+    listener_connection = connection
+    logger.info("Database listener connection opened")
+
+def _on_listener_lost(connection):
+    global _reconnect_task
+    
+    # close_db() detaches the connection before closing it on purpose
+    if connection is not listener_connection:
+        return
+    logger.warning("Database listener connection lost, reconnecting")
+    if _reconnect_task is None or _reconnect_task.done():
+        _reconnect_task = asyncio.get_running_loop().create_task(_reconnect_listener())
+
+async def _reconnect_listener():
+    """Reopen the listener connection with exponential backoff, then run the reconnect callbacks"""
+    delay = LISTENER_RECONNECT_DELAY
+    while True:
+        try:
+            await _open_listener_connection()
+            break
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning(f"Listener reconnect failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTENER_RECONNECT_MAX_DELAY)
+    
+    for callback in _reconnect_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Listener reconnect callback failed: {e}")
+
+async def add_listener(channel: str, callback):
+    """Subscribe a callback to a NOTIFY channel on this worker's listener connection"""
+    _listeners.setdefault(channel, []).append(callback)
+    
+    if listener_connection is None or listener_connection.is_closed():
+        await _open_listener_connection()
+    else:
+        await listener_connection.add_listener(channel, callback)
+
+def on_listener_reconnect(callback: Callable[[], None]):
+    """Run callback whenever a lost listener connection is reopened, to recover missed notifications"""
+    _reconnect_callbacks.append(callback)
+
 async def close_db():
     """Close database connection pool"""
-    global db_pool
+    global db_pool, listener_connection
+    if _reconnect_task:
+        _reconnect_task.cancel()
+    if listener_connection:
+        connection, listener_connection = listener_connection, None
+        await connection.close()
+    _listeners.clear()
+    _reconnect_callbacks.clear()
     if db_pool:
         await db_pool.close()
         db_pool = None
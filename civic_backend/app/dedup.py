@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import logging
+import re
+import struct
+from typing import List, Optional, Sequence, Tuple
+import asyncpg
+from .geo import bounding_box, covering_cells, prefix_ranges, haversine_km
+
+logger = logging.getLogger(__name__)
+
+# MinHash signature length, split into LSH bands of ROWS_PER_BAND values.
+# Reports whose texts have Jaccard similarity s share a band with probability
+# 1 - (1 - s^4)^8: ~0.99 at s=0.8, ~0.4 at s=0.5, ~0.03 at s=0.25.
+NUM_PERMUTATIONS = 32
+ROWS_PER_BAND = 4
+BANDS = NUM_PERMUTATIONS // ROWS_PER_BAND
+
+# Character n-gram length used to shingle report text
+SHINGLE_SIZE = 4
+
+# Only the start of a long text is signed: hashing costs about a millisecond
+# per 200 characters, and repeats of a report already differ early on
+MAX_SIGNED_CHARS = 2000
+
+# A new report duplicates a canonical one of the same category, within this
+# distance and window, whose estimated text similarity is at least the threshold
+DUPLICATE_RADIUS_KM = 0.1
+DUPLICATE_WINDOW_DAYS = 30
+DUPLICATE_SIMILARITY = 0.6
+
+# Candidates fetched from the band index per check
+MAX_DUPLICATE_CANDIDATES = 20
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+
+def _seeded(label: str) -> int:
+    return int.from_bytes(hashlib.blake2b(label.encode(), digest_size=8).digest(), "big")
+
+# Fixed (a, b) pairs for the universal hashes h(x) = (a*x + b) mod p; derived
+# from constant labels so every process computes identical signatures
+_PERMUTATIONS = [
+    (_seeded(f"minhash-a-{i}") % (_PRIME - 1) + 1, _seeded(f"minhash-b-{i}") % _PRIME)
+    for i in range(NUM_PERMUTATIONS)
+]
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+def shingles(text: str) -> set:
+    """Character n-grams of the normalized text"""
+    normalized = " ".join(_NON_WORD.sub(" ", text.lower()).split())
+    if not normalized:
+        return set()
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+def text_signature(text: str) -> Tuple[List[int], List[int]]:
+    """
+    Return (MinHash signature, LSH band keys) for a report text, from its
+    first MAX_SIGNED_CHARS characters. Text with no words gets empty arrays
+    and never matches.
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for shingle in shingles(text[:MAX_SIGNED_CHARS])
+    ]
+    if not hashes:
+        return [], []
+
+    signature = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+    # One signed 64-bit key per band; the band index keeps equal rows in
+    # different bands from colliding
+    bands = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f">H{ROWS_PER_BAND}Q", band, *rows), digest_size=8).digest()
+        bands.append(int.from_bytes(digest, "big", signed=True))
+
+    return signature, bands
+
+async def sign_texts(texts: Sequence[str]) -> List[Tuple[List[int], List[int]]]:
+    """text_signature for each text, computed off the event loop"""
+    return await asyncio.to_thread(lambda: [text_signature(text) for text in texts])
+
+def similarity(signature: Sequence[int], other: Sequence[int]) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures"""
+    if not signature or len(signature) != len(other):
+        return 0.0
+    return sum(1 for a, b in zip(signature, other) if a == b) / len(signature)
+
+# Recent canonical reports of a category sharing a band, within geohash ranges
+CANONICAL_CANDIDATES_QUERY = """
+    SELECT r.id, r.latitude::float8 AS latitude, r.longitude::float8 AS longitude, r.text_minhash
+    FROM reports r
+    JOIN unnest($1::text[], $2::text[]) AS cell(lo, hi)
+      ON r.geohash >= cell.lo AND r.geohash < cell.hi
+    WHERE r.duplicate_of IS NULL
+      AND r.text_bands && $3::bigint[]
+      AND r.category = $4
+      AND r.created_at >= LOCALTIMESTAMP - make_interval(days => $5)
+    ORDER BY r.created_at DESC
+    LIMIT $6
+"""
+
+async def find_canonical(
+    connection: asyncpg.Connection,
+    signature: List[int],
+    bands: List[int],
+    category: str,
+    latitude: float,
+    longitude: float
+) -> Optional[int]:
+    """
+    Find the canonical report a new submission most likely duplicates.
+    Candidates come from the band index intersected with a geohash range scan,
+    so the check never scans the table.
+    """
+    if not bands:
+        return None
+
+    cells = covering_cells(*bounding_box(latitude, longitude, DUPLICATE_RADIUS_KM))
+    if cells is None:
+        return None
+    lows, highs = prefix_ranges(cells)
+
+    candidates = await connection.fetch(
+        CANONICAL_CANDIDATES_QUERY, lows, highs, bands, category, DUPLICATE_WINDOW_DAYS, MAX_DUPLICATE_CANDIDATES
+    )
+
+    best_id, best_score = None, DUPLICATE_SIMILARITY
+    for candidate in candidates:
+        if haversine_km(latitude, longitude, candidate["latitude"], candidate["longitude"]) > DUPLICATE_RADIUS_KM:
+            continue
+        score = similarity(signature, candidate["text_minhash"])
+        if score >= best_score:
+            best_id, best_score = candidate["id"], score
+
+    return best_id
+
+async def link_duplicate(connection: asyncpg.Connection, canonical_id: int):
+    """Count a new duplicate against its canonical report"""
+    # Canonical reports come from the candidate window (plus a day of slack),
+    # so the bound prunes the update to the newest partitions
+    await connection.execute("""
+        UPDATE reports
+        SET duplicate_count = duplicate_count + 1, row_version = row_version + 1
+        WHERE id = $1 AND created_at >= LOCALTIMESTAMP - make_interval(days => $2)
+    """, canonical_id, DUPLICATE_WINDOW_DAYS + 1)
+
+async def backfill_text_signatures(connection: asyncpg.Connection, batch_size: int = 1000):
+    """Sign recent reports created before the columns existed (older ones can't be candidates)"""
+    total = 0
+
+    while True:
+        rows = await connection.fetch("""
+            SELECT id, text FROM reports
+            WHERE text_bands IS NULL
+              AND created_at >= LOCALTIMESTAMP - make_interval(days => $1)
+            LIMIT $2
+        """, DUPLICATE_WINDOW_DAYS, batch_size)
+
+        if not rows:
+            break
+
+        await connection.executemany(
+            "UPDATE reports SET text_minhash = $2, text_bands = $3 WHERE id = $1",
+            [(row["id"], *text_signature(row["text"])) for row in rows]
+        )
+        total += len(rows)
+
+    if total:
+        logger.info(f"Computed text signatures for {total} reports")
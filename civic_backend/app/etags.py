@@ -0,0 +1,54 @@
+from typing import Optional
+import asyncpg
+from fastapi.responses import Response
+from fastapi import status
+
+# Sequence bumped after every committed change to report data. Its current
+# value is the data version behind the weak ETags of list and stats responses.
+DATA_VERSION_SEQUENCE = "report_data_version"
+
+# Clients may keep responses but must revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+async def fetch_data_version(connection: asyncpg.Connection) -> int:
+    """Read the current report data version (no reports table access)"""
+    # A sequence never advanced reports last_value 1, the value its first
+    # nextval returns, so it reads as version 0 until the first bump
+    return await connection.fetchval(
+        f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {DATA_VERSION_SEQUENCE}"
+    )
+
+async def bump_data_version(connection: asyncpg.Connection) -> int:
+    """
+    Advance the data version. Call after the writing transaction commits, so a
+    reader can never pair the new version with data from before the change.
+    """
+    return await connection.fetchval(f"SELECT nextval('{DATA_VERSION_SEQUENCE}')")
+
+def weak_etag(*parts) -> str:
+    """Build a weak entity tag from its parts"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an entity tag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def cache_headers(etag: str) -> dict:
+    """Validator headers sent with a cacheable response"""
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response telling the client its cached copy is current"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
@@ -0,0 +1,198 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from .db import get_db
+from .serialization import REPORT_COLUMNS
+
+# Export formats and their media types
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# COPY output chunks buffered between the database and a slow client; the copy
+# pauses once the buffer is full, so memory stays flat for any export size
+EXPORT_BUFFER_CHUNKS = 16
+
+# Upper bound in seconds on one COPY export (the pool's command timeout is
+# meant for ordinary queries and would cut large exports short)
+EXPORT_TIMEOUT = float(os.getenv("EXPORT_TIMEOUT", "3600"))
+
+# Rows per Parquet row group (each group is encoded and sent as it fills)
+PARQUET_ROW_GROUP_SIZE = 10_000
+
+# NDJSON is COPYed in CSV mode with control characters as delimiter and quote.
+# row_to_json escapes every control character, so lines come out verbatim,
+# unlike text mode, which would double the backslashes in JSON escapes.
+_NDJSON_COPY_OPTIONS = {"format": "csv", "delimiter": "\x02", "quote": "\x01"}
+
+def build_export_query(
+    category: Optional[str] = None,
+    report_status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    include_duplicates: bool = False
+) -> Tuple[str, list]:
+    """Build the filtered report SELECT behind an export, oldest first"""
+    args = []
+    conditions = []
+
+    for column, value in (("category", category), ("status", report_status), ("user_id", user_id)):
+        if value is not None:
+            args.append(value)
+            conditions.append(f"r.{column} = ${len(args)}")
+
+    if since is not None:
+        args.append(since)
+        conditions.append(f"r.created_at >= ${len(args)}")
+    if until is not None:
+        args.append(until)
+        conditions.append(f"r.created_at < ${len(args)}")
+    if not include_duplicates:
+        conditions.append("r.duplicate_of IS NULL")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {REPORT_COLUMNS}
+        FROM reports r
+        {where}
+        ORDER BY r.created_at, r.id
+    """
+
+    return query, args
+
+async def stream_copy(query: str, args: list, **copy_options) -> AsyncIterator[bytes]:
+    """Yield the output of COPY (query) TO STDOUT as the server produces it"""
+    db_pool = await get_db()
+
+    async with db_pool.acquire() as connection:
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_BUFFER_CHUNKS)
+
+        async def write(data):
+            await chunks.put(bytes(data))
+
+        async def produce():
+            # None tells the reader the copy ended (either way); a cancelled
+            # copy has no reader left to tell
+            try:
+                await connection.copy_from_query(
+                    query, *args, output=write, timeout=EXPORT_TIMEOUT, **copy_options
+                )
+            except Exception:
+                await chunks.put(None)
+                raise
+            await chunks.put(None)
+
+        copy = asyncio.create_task(produce())
+        try:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+            # Surface a failed copy (the client sees a truncated response)
+            await copy
+        finally:
+            if not copy.done():
+                copy.cancel()
+                try:
+                    await copy
+                except asyncio.CancelledError:
+                    pass
+
+def stream_csv(query: str, args: list) -> AsyncIterator[bytes]:
+    return stream_copy(query, args, format="csv", header=True)
+
+def stream_ndjson(query: str, args: list) -> AsyncIterator[bytes]:
+    return stream_copy(f"SELECT row_to_json(export) FROM ({query}) export", args, **_NDJSON_COPY_OPTIONS)
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class _ChunkSink:
+    """Write-only file object collecting encoded Parquet bytes until they are sent"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("username", pa.string()),
+        ("text", pa.string()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("image_url", pa.string()),
+        ("thumbnail_url", pa.string()),
+        ("medium_url", pa.string()),
+        ("category", pa.string()),
+        ("status", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("duplicate_of", pa.int64()),
+        ("duplicate_count", pa.int64())
+    ])
+
+def _write_row_group(writer, schema, rows: list):
+    import pyarrow as pa
+
+    columns = {name: [row[index] for row in rows] for index, name in enumerate(schema.names)}
+    writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+async def stream_parquet(query: str, args: list) -> AsyncIterator[bytes]:
+    """Yield a Parquet file one row group at a time, read from a server-side cursor"""
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    db_pool = await get_db()
+
+    async with db_pool.acquire() as connection:
+        async with connection.transaction(readonly=True):
+            rows = []
+            async for row in connection.cursor(query, *args, prefetch=PARQUET_ROW_GROUP_SIZE):
+                rows.append(tuple(row))
+                if len(rows) == PARQUET_ROW_GROUP_SIZE:
+                    # Encoding is CPU-bound; keep it off the event loop
+                    await asyncio.to_thread(_write_row_group, writer, schema, rows)
+                    rows = []
+                    yield sink.drain()
+            if rows:
+                await asyncio.to_thread(_write_row_group, writer, schema, rows)
+
+    writer.close()
+    yield sink.drain()
+
+EXPORT_STREAMS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+    "parquet": stream_parquet
+}
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+from typing import Optional, Set, Tuple
+import asyncpg
+import orjson
+from .db import add_listener, on_listener_reconnect
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel carrying report deltas between workers
+FEED_CHANNEL = "report_events"
+
+# Frames buffered per subscriber before it is considered too slow
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256"))
+
+# Seconds between keep-alive comments on an idle stream
+FEED_KEEPALIVE = float(os.getenv("FEED_KEEPALIVE", "15"))
+
+# Sent in place of dropped events; the client should refetch its list
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+def _coordinate(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+def created_event(report) -> dict:
+    """Compact delta for a newly created report"""
+    return {
+        "type": "created",
+        "id": report["id"],
+        "user_id": report["user_id"],
+        "category": report["category"],
+        "status": report["status"],
+        "latitude": _coordinate(report["latitude"]),
+        "longitude": _coordinate(report["longitude"]),
+        "created_at": report["created_at"].isoformat(),
+        "duplicate_of": report["duplicate_of"],
+    }
+
+def status_event(report, old_status: str) -> dict:
+    """Compact delta for a status change"""
+    return {
+        "type": "status",
+        "id": report["id"],
+        "category": report["category"],
+        "status": report["status"],
+        "old_status": old_status,
+        "latitude": _coordinate(report["latitude"]),
+        "longitude": _coordinate(report["longitude"]),
+    }
+
+async def _notify(connection: asyncpg.Connection, events):
+    # NOTIFY is transactional: events are delivered only if the write commits
+    if events:
+        await connection.execute(
+            "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+            FEED_CHANNEL,
+            [dumps(event).decode() for event in events]
+        )
+
+async def publish_reports_created(connection: asyncpg.Connection, reports):
+    """Queue created deltas for newly inserted reports (inside the insert transaction)"""
+    await _notify(connection, [created_event(report) for report in reports])
+
+async def publish_status_changes(connection: asyncpg.Connection, changes):
+    """Queue status deltas for (updated report, previous status) pairs"""
+    await _notify(connection, [status_event(report, old_status) for report, old_status in changes])
+
+class Subscription:
+    """One client's filtered view of the feed, buffered in a bounded queue"""
+
+    def __init__(
+        self,
+        categories: Optional[Set[str]] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        maxsize: int = FEED_QUEUE_SIZE
+    ):
+        self.categories = categories
+        self.bbox = bbox
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        """Check an event against the category and area filters"""
+        if self.categories and event.get("category") not in self.categories:
+            return False
+        if self.bbox:
+            latitude, longitude = event.get("latitude"), event.get("longitude")
+            if latitude is None or longitude is None:
+                return False
+            min_lat, min_lon, max_lat, max_lon = self.bbox
+            if not min_lat <= latitude <= max_lat:
+                return False
+            # A box with min_lon > max_lon crosses the antimeridian
+            if min_lon <= max_lon:
+                return min_lon <= longitude <= max_lon
+            return longitude >= min_lon or longitude <= max_lon
+        return True
+
+    def offer(self, frame: Optional[bytes]):
+        """
+        Enqueue a frame without blocking the broadcaster. A subscriber that falls
+        a full queue behind loses its backlog and gets a single resync frame.
+        """
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME if frame is not None else None)
+
+class FeedBroker:
+    """Fans NOTIFY deltas received on this worker out to its subscribers"""
+
+    def __init__(self):
+        self.subscribers: Set[Subscription] = set()
+        self.published = 0
+
+    def subscribe(self, **filters) -> Subscription:
+        subscription = Subscription(**filters)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, payload: str):
+        """Decode a delta once and hand the same encoded frame to every match"""
+        event = orjson.loads(payload)
+        frame = f"event: {event['type']}\ndata: {payload}\n\n".encode()
+        for subscription in self.subscribers:
+            if subscription.matches(event):
+                subscription.offer(frame)
+        self.published += 1
+
+    def resync(self):
+        """Tell every subscriber to refetch, after notifications may have been missed"""
+        for subscription in self.subscribers:
+            subscription.offer(RESYNC_FRAME)
+
+    def close(self):
+        """End every open stream"""
+        for subscription in self.subscribers:
+            subscription.offer(None)
+        self.subscribers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": sum(subscription.dropped for subscription in self.subscribers)
+        }
+
+feed_broker = FeedBroker()
+
+def _on_report_event(connection, pid, channel, payload):
+    """Handle a report_events notification"""
+    try:
+        feed_broker.publish(payload)
+    except (orjson.JSONDecodeError, KeyError):
+        logger.warning(f"Ignoring malformed {channel} payload: {payload!r}")
+
+async def start_feed():
+    """Listen for report deltas on this worker's listener connection"""
+    await add_listener(FEED_CHANNEL, _on_report_event)
+    # Deltas sent while the listener was down are gone; clients refetch instead
+    on_listener_reconnect(feed_broker.resync)
+
+def stop_feed():
+    """Close all feed streams"""
+    feed_broker.close()
+
+async def stream_events(keepalive: float = FEED_KEEPALIVE, **filters):
+    """Subscribe and yield server-sent event frames until the stream is closed"""
+    # Subscribing inside the generator ties the subscription to the stream's lifetime
+    subscription = feed_broker.subscribe(**filters)
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE_FRAME
+                continue
+            if frame is None:
+                break
+            yield frame
+    finally:
+        feed_broker.unsubscribe(subscription)
@@ -0,0 +1,128 @@
+import math
+from typing import List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+
+# Precision stored on reports.geohash (~5m x 5m cells)
+GEOHASH_PRECISION = 9
+
+# Upper bound on geohash cells scanned per radius query
+MAX_COVERING_CELLS = 16
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Sorts after every geohash character under the "C" collation, so
+# [prefix, prefix + _RANGE_END) spans every geohash starting with prefix
+_RANGE_END = "{"
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a base32 geohash of the given precision"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        # Geohash interleaves bits, starting with longitude
+        if even:
+            rng, coord = lon_range, longitude
+        else:
+            rng, coord = lat_range, latitude
+
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+
+    return "".join(chars)
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """Return the (latitude, longitude) size in degrees of a geohash cell"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Return (min_lat, min_lon, max_lat, max_lon) enclosing a circle on the globe.
+    Near the poles or across the antimeridian the longitude range is widened
+    to the full [-180, 180] rather than split in two.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+
+    cos_lat = math.cos(math.radians(latitude))
+    if min_lat <= -90.0 or max_lat >= 90.0 or cos_lat <= 1e-9:
+        return min_lat, -180.0, max_lat, 180.0
+
+    delta_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+    if min_lon < -180.0 or max_lon > 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+
+    return min_lat, min_lon, max_lat, max_lon
+
+def covering_cells(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    max_cells: int = MAX_COVERING_CELLS,
+    max_precision: int = GEOHASH_PRECISION
+) -> Optional[List[str]]:
+    """
+    Return geohash prefixes that together cover a bounding box, using the finest
+    precision that needs at most max_cells cells. Returns None when even
+    single-character cells cannot cover the box within the budget.
+    """
+    for precision in range(max_precision, 0, -1):
+        cell_lat, cell_lon = geohash_cell_size(precision)
+        lat_cells = int(180.0 / cell_lat)
+        lon_cells = int(360.0 / cell_lon)
+
+        first_row = min(int((min_lat + 90.0) / cell_lat), lat_cells - 1)
+        last_row = min(int((max_lat + 90.0) / cell_lat), lat_cells - 1)
+        first_col = min(int((min_lon + 180.0) / cell_lon), lon_cells - 1)
+        last_col = min(int((max_lon + 180.0) / cell_lon), lon_cells - 1)
+
+        if (last_row - first_row + 1) * (last_col - first_col + 1) > max_cells:
+            continue
+
+        # Encode each cell's centre to get its geohash
+        return sorted(
+            encode_geohash(
+                -90.0 + (row + 0.5) * cell_lat,
+                -180.0 + (col + 0.5) * cell_lon,
+                precision
+            )
+            for row in range(first_row, last_row + 1)
+            for col in range(first_col, last_col + 1)
+        )
+
+    return None
+
+def prefix_ranges(prefixes: List[str]) -> Tuple[List[str], List[str]]:
+    """Turn geohash prefixes into parallel [low, high) bounds for index range scans"""
+    return list(prefixes), [prefix + _RANGE_END for prefix in prefixes]
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,107 @@
+import asyncio
+import io
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional
+from .db import get_db
+from .storage import upload_file
+from .etags import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+# Derived renditions by name, with the longest edge in pixels
+IMAGE_VARIANTS = {"thumbnail": 400, "medium": 1280}
+VARIANT_QUALITY = 80
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_image_executor: Optional[ProcessPoolExecutor] = None
+
+def render_variants(path: str) -> Dict[str, bytes]:
+    """Decode an image and return EXIF-free WebP renditions (runs in a worker process)"""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as original:
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        variants = {}
+        for name, edge in IMAGE_VARIANTS.items():
+            variant = image.copy()
+            variant.thumbnail((edge, edge), Image.LANCZOS)
+            # Saving without exif= writes no EXIF (GPS, device) metadata
+            buffer = io.BytesIO()
+            variant.save(buffer, "WEBP", quality=VARIANT_QUALITY, method=4)
+            variants[name] = buffer.getvalue()
+
+    return variants
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Create the image worker pool on first use"""
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _image_executor
+
+def shutdown_image_pool():
+    """Stop the image worker processes"""
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(wait=False)
+        _image_executor = None
+
+def _spool_to_disk(source: BinaryIO) -> str:
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="report-image-", delete=False) as target:
+        shutil.copyfileobj(source, target)
+        return target.name
+
+async def save_for_processing(source: BinaryIO) -> str:
+    """Copy an upload to a temporary file the worker processes can read"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _spool_to_disk, source)
+
+def discard(path: str):
+    """Remove a temporary image file"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# created_at prunes the update to the report's monthly partition
+IMAGE_URLS_UPDATE_QUERY = """
+    UPDATE reports
+    SET thumbnail_url = $3, medium_url = $4, row_version = row_version + 1
+    WHERE id = $1 AND created_at = $2
+"""
+
+async def process_report_image(report_id: int, created_at: datetime, path: str):
+    """Render the variants of a report's image, store them and record their URLs"""
+    try:
+        loop = asyncio.get_running_loop()
+        variants = await loop.run_in_executor(_get_executor(), render_variants, path)
+
+        urls = {}
+        for name, content in variants.items():
+            urls[name] = await upload_file(content, f"{name}.webp", "image/webp")
+
+        db_pool = await get_db()
+        async with db_pool.acquire() as connection:
+            await connection.execute(
+                IMAGE_URLS_UPDATE_QUERY,
+                report_id,
+                created_at,
+                urls["thumbnail"],
+                urls["medium"]
+            )
+            await bump_data_version(connection)
+    except Exception as e:
+        logger.error(f"Image processing failed for report {report_id}: {e}")
+    finally:
+        discard(path)
@@ -1,10 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
-from .db import init_db, close_db
-from .auth import auth_router
-from .routes import reports_router
+import asyncio
+from .startup import startup_report
+from .db import init_db, close_db, get_db
+from .counters import RECONCILE_INTERVAL, run_reconciliation
+from .partitions import PARTITION_MAINTENANCE_INTERVAL, ensure_partitions, run_partition_maintenance
+from .auth import auth_router, start_principal_invalidation, principal_cache
+from .feed import start_feed, stop_feed, feed_broker
+from .metrics import MetricsMiddleware, PoolExhausted, registry, monitor_event_loop, CONTENT_TYPE
+from .routes import reports_router, analytics_router
+from .utils import shutdown_password_pool, password_pool_stats
+from .images import shutdown_image_pool
+from .uploads import UploadSizeLimitMiddleware, MAX_IMAGE_BYTES, MULTIPART_OVERHEAD_BYTES
+from .storage import init_storage, close_storage, local_storage_mount_path, LOCAL_STORAGE_DIR
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -14,11 +25,41 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up...")
-    await init_db()
+    with startup_report.phase("database"):
+        await init_db()
+    # Inserts need this month's partition even with the maintenance job off
+    with startup_report.phase("partitions"):
+        db_pool = await get_db()
+        async with db_pool.acquire() as connection:
+            await ensure_partitions(connection)
+    with startup_report.phase("storage"):
+        await init_storage()
+    with startup_report.phase("listeners"):
+        await start_principal_invalidation()
+        await start_feed()
+    
+    reconciler = None
+    if RECONCILE_INTERVAL > 0:
+        reconciler = asyncio.create_task(run_reconciliation(await get_db()))
+    partition_maintainer = None
+    if PARTITION_MAINTENANCE_INTERVAL > 0:
+        partition_maintainer = asyncio.create_task(run_partition_maintenance(await get_db()))
+    loop_monitor = asyncio.create_task(monitor_event_loop())
+    
+    startup_report.log()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    if reconciler:
+        reconciler.cancel()
+    if partition_maintainer:
+        partition_maintainer.cancel()
+    loop_monitor.cancel()
+    stop_feed()
+    await close_storage()
     await close_db()
+    shutdown_password_pool()
+    shutdown_image_pool()
 
 app = FastAPI(
     title="Civic Issues API",
@@ -27,6 +68,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Reject oversized uploads while the body is still arriving
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={"/api/reports/upload": MAX_IMAGE_BYTES + MULTIPART_OVERHEAD_BYTES}
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,11 +81,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
+)
+
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
+registry.callback(
+    "password_hash_jobs",
+    "Password hashing jobs by state",
+    lambda: {(state,): password_pool_stats()[state] for state in ("queued", "in_flight")},
+    ("state",)
+)
+registry.callback(
+    "password_hash_rejected_total",
+    "Password hashing jobs rejected because the queue was full",
+    lambda: password_pool_stats()["rejected"],
+    kind="counter"
 )
+registry.callback("feed_subscribers", "Open live feed streams", lambda: feed_broker.stats()["subscribers"])
+registry.callback(
+    "principal_cache_lookups_total",
+    "Authenticated principal cache lookups by result",
+    lambda: {("hit",): principal_cache.hits, ("miss",): principal_cache.misses},
+    ("result",),
+    kind="counter"
+)
+
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted_handler(request, exc):
+    """Fail fast instead of queueing on a saturated connection pool"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
 
 # Include routers
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(reports_router, prefix="/api/reports", tags=["Reports"])
+app.include_router(analytics_router, prefix="/api/analytics", tags=["Analytics"])
+
+# Serve uploaded files when using the local storage backend
+media_path = local_storage_mount_path()
+if media_path:
+    app.mount(media_path, StaticFiles(directory=LOCAL_STORAGE_DIR, check_dir=False), name="media")
 
 @app.get("/health")
 async def health_check():
@@ -51,6 +138,11 @@ async def health_check():
         }
     )
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -60,6 +152,8 @@ async def root():
         "docs": "/docs"
     }
 
+startup_report.mark_imported()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Seconds between event-loop lag probes
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Weight of the newest sample in the moving average of pool acquire wait
+ACQUIRE_WAIT_SMOOTHING = 0.2
+
+Labels = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+class Histogram:
+    """Fixed-bucket distribution per label set (cumulated only when rendered)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, labels, f'le="{le}"'), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+
+class CallbackMetric:
+    """Gauge or counter whose values are read from a function at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], Union[float, Dict[Labels, float]]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge"
+    ):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def samples(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            if value is not None:
+                yield self.name, _format_labels(self.labelnames, labels), value
+
+class MetricsRegistry:
+    """The metrics exposed on /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, read, labelnames: Sequence[str] = (), kind: str = "gauge"):
+        return self.register(CallbackMetric(name, help, read, labelnames, kind))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.warning(f"Skipping metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+)
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Database query latency by statement type and table", ("statement",)
+)
+db_query_errors = registry.counter(
+    "db_query_errors_total", "Database queries that raised, by statement type and table", ("statement",)
+)
+db_acquire_wait = registry.histogram(
+    "db_pool_acquire_wait_seconds", "Time spent waiting for a pooled database connection"
+)
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "Delay of event loop timer callbacks beyond their schedule", buckets=LAG_BUCKETS
+)
+
+class MetricsMiddleware:
+    """Record latency and status per route template (not raw path, to bound cardinality)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._templates: Optional[Dict[object, str]] = None
+
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "other"
+        if self._templates is None:
+            # The router records the matched endpoint in the scope; map it back to its path
+            self._templates = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self._templates.get(endpoint, "other")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            method, route = scope["method"], self._route_template(scope)
+            http_requests.inc((method, route, str(status_code)))
+            http_duration.observe(elapsed, (method, route))
+
+_STATEMENT_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def statement_label(query: str) -> str:
+    """Summarize a query as its leading keyword and first table, e.g. "select reports" """
+    words = query.split(None, 1)
+    keyword = words[0].lower() if words else "unknown"
+    match = _STATEMENT_TABLE.search(query)
+    return f"{keyword} {match.group(1).lower()}" if match else keyword
+
+def _record_query(record):
+    label = statement_label(record.query)
+    db_query_duration.observe(record.elapsed, (label,))
+    if record.exception is not None:
+        db_query_errors.inc((label,))
+
+async def instrument_connection(connection: asyncpg.Connection):
+    """Pool init hook timing every query on a new connection"""
+    connection.add_query_logger(_record_query)
+
+class PoolExhausted(Exception):
+    """Raised when no pooled connection frees up within the acquire timeout"""
+
+class _TimedAcquire:
+    def __init__(self, pool: "InstrumentedPool", timeout: Optional[float]):
+        self._pool = pool
+        self._context = pool.pool.acquire(timeout=timeout if timeout is not None else pool.acquire_timeout)
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        self._pool.waiting += 1
+        start = time.perf_counter()
+        try:
+            return await self._context.__aenter__()
+        except asyncio.TimeoutError:
+            raise PoolExhausted("Timed out waiting for a database connection") from None
+        finally:
+            wait = time.perf_counter() - start
+            db_acquire_wait.observe(wait)
+            self._pool.wait_estimate += ACQUIRE_WAIT_SMOOTHING * (wait - self._pool.wait_estimate)
+            self._pool.waiting -= 1
+
+    async def __aexit__(self, *exc_info):
+        return await self._context.__aexit__(*exc_info)
+
+class InstrumentedPool:
+    """
+    asyncpg pool wrapper measuring acquire wait and exposing saturation gauges.
+    Acquires without a timeout wait at most acquire_timeout seconds.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, acquire_timeout: Optional[float] = None):
+        self.pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.waiting = 0
+        # Moving average of recent acquire waits, in seconds
+        self.wait_estimate = 0.0
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _TimedAcquire:
+        return _TimedAcquire(self, timeout)
+
+    def stats(self) -> dict:
+        size, idle = self.pool.get_size(), self.pool.get_idle_size()
+        return {
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "max_size": self.pool.get_max_size(),
+            "waiting": self.waiting
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+def register_pool_metrics(pool: InstrumentedPool):
+    """Expose pool size, usage and queue depth"""
+    registry.callback(
+        "db_pool_connections",
+        "Database pool connections by state (in_use, idle, max_size) and callers waiting",
+        lambda: {(state,): value for state, value in pool.stats().items() if state != "size"},
+        ("state",)
+    )
+
+async def monitor_event_loop(interval: float = LOOP_LAG_INTERVAL):
+    """Sample how late a timer fires; sustained lag means something blocks the loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(0.0, loop.time() - start - interval))
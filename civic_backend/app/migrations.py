@@ -0,0 +1,627 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, List, Union
+import asyncpg
+from .geo import encode_geohash
+from .clusters import CLUSTER_PRECISIONS, rebuild_report_cells
+from .counters import GLOBAL_SLOTS, GLOBAL_USER_ID, reconcile_counters
+from .etags import DATA_VERSION_SEQUENCE
+from .dedup import backfill_text_signatures
+from .analytics import rebuild_rollups
+from .partitions import partition_reports
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock held by the one worker applying migrations
+MIGRATION_LOCK_KEY = 7_340_002
+
+# Seconds between attempts to take the migration lock
+MIGRATION_LOCK_POLL = 0.5
+
+# Transactional migrations give up waiting for table locks after this long and
+# are retried, rather than queueing every query on the table behind them
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+MIGRATION_RETRIES = 5
+
+# Text search configuration behind reports.search_vector
+SEARCH_CONFIG = "english"
+
+Step = Union[str, Callable[[asyncpg.Connection], Awaitable[None]]]
+
+class Migration:
+    """
+    A numbered schema change made of SQL statements and async callables.
+    Transactional migrations apply atomically. Others run step by step, which
+    CREATE INDEX CONCURRENTLY and batched backfills need, so each of their steps
+    must be safe to re-run after an interruption.
+    """
+
+    def __init__(self, version: int, name: str, steps: List[Step], transactional: bool = True):
+        self.version = version
+        self.name = name
+        self.steps = steps
+        self.transactional = transactional
+
+def concurrent_index(name: str, definition: str, unique: bool = False) -> Step:
+    """Step building an index without blocking writes to its table"""
+    async def step(connection: asyncpg.Connection):
+        # An interrupted concurrent build leaves an invalid index behind
+        invalid = await connection.fetchval("""
+            SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)
+        """, name)
+        if invalid:
+            await connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        await connection.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}"
+        )
+    return step
+
+async def backfill_geohashes(connection: asyncpg.Connection, batch_size: int = 1000):
+    """Fill reports.geohash for geolocated rows created before the column existed"""
+    total = 0
+
+    while True:
+        rows = await connection.fetch("""
+            SELECT id, latitude, longitude FROM reports
+            WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+            LIMIT $1
+        """, batch_size)
+
+        if not rows:
+            break
+
+        await connection.executemany(
+            "UPDATE reports SET geohash = $2 WHERE id = $1",
+            [
+                (row["id"], encode_geohash(float(row["latitude"]), float(row["longitude"])))
+                for row in rows
+            ]
+        )
+        total += len(rows)
+
+    if total:
+        logger.info(f"Backfilled geohash for {total} reports")
+
+async def backfill_report_usernames(connection: asyncpg.Connection, batch_size: int = 5000):
+    """Copy usernames onto reports created before the column existed, walking ids in batches"""
+    last_id, total = 0, 0
+
+    while True:
+        row = await connection.fetchrow("""
+            WITH batch AS (
+                SELECT id FROM reports WHERE id > $1 ORDER BY id LIMIT $2
+            ),
+            filled AS (
+                UPDATE reports r
+                SET username = u.username
+                FROM batch, users u
+                WHERE r.id = batch.id AND u.id = r.user_id AND r.username IS NULL
+                RETURNING r.id
+            )
+            SELECT (SELECT max(id) FROM batch) AS last_id, (SELECT count(*) FROM filled) AS filled
+        """, last_id, batch_size)
+
+        if row["last_id"] is None:
+            break
+        last_id = row["last_id"]
+        total += row["filled"]
+
+    if total:
+        logger.info(f"Backfilled usernames for {total} reports")
+
+# The aggregates leave out duplicates, so databases that predate duplicate_of
+# get theirs built by migration 23 instead
+HAS_DUPLICATE_COLUMN = """
+    EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'reports' AND column_name = 'duplicate_of'
+    )
+"""
+
+async def seed_report_cells(connection: asyncpg.Connection):
+    """Build the cluster aggregates for databases that predate them"""
+    needs_rebuild = await connection.fetchval(f"""
+        SELECT NOT EXISTS (SELECT 1 FROM report_cells)
+           AND EXISTS (SELECT 1 FROM reports WHERE geohash IS NOT NULL)
+           AND {HAS_DUPLICATE_COLUMN}
+    """)
+    if needs_rebuild:
+        await rebuild_report_cells(connection)
+
+async def recount_report_counters(connection: asyncpg.Connection):
+    """Recount the counters, waiting for a reconcile already running rather than skipping"""
+    await reconcile_counters(connection, wait=True)
+
+async def seed_report_counters(connection: asyncpg.Connection):
+    """Count existing reports for databases that predate the counters"""
+    needs_recount = await connection.fetchval(f"""
+        SELECT NOT EXISTS (SELECT 1 FROM report_counters)
+           AND EXISTS (SELECT 1 FROM reports)
+           AND {HAS_DUPLICATE_COLUMN}
+    """)
+    if needs_recount:
+        await recount_report_counters(connection)
+
+async def seed_analytics_rollups(connection: asyncpg.Connection):
+    """Build the analytics rollups for databases that predate them"""
+    needs_rebuild = await connection.fetchval("""
+        SELECT NOT EXISTS (SELECT 1 FROM report_daily)
+           AND EXISTS (SELECT 1 FROM reports)
+    """)
+    if needs_rebuild:
+        await rebuild_rollups(connection)
+
+# Every schema change, in order. Append new migrations; never edit applied ones.
+# Statements use IF NOT EXISTS so databases created before this runner existed
+# (by the old create-on-startup code) upgrade cleanly.
+MIGRATIONS = [
+    Migration(1, "initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(255) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS reports (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            text TEXT NOT NULL,
+            latitude DECIMAL(10, 8),
+            longitude DECIMAL(11, 8),
+            image_url TEXT,
+            category VARCHAR(100) NOT NULL,
+            status VARCHAR(50) DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_reports_user_id ON reports(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_reports_status ON reports(status)",
+        "CREATE INDEX IF NOT EXISTS idx_reports_category ON reports(category)",
+        "CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at DESC)",
+    ]),
+    # Notify workers when a user changes so cached principals are dropped
+    Migration(2, "user change notifications", [
+        """
+        CREATE OR REPLACE FUNCTION notify_user_changed() RETURNS trigger AS $fn$
+        BEGIN
+            PERFORM pg_notify('user_changes', OLD.id::text);
+            RETURN NULL;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS users_notify_changed ON users",
+        """
+        CREATE TRIGGER users_notify_changed
+        AFTER UPDATE OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION notify_user_changed()
+        """,
+    ]),
+    Migration(3, "report geohash", [
+        'ALTER TABLE reports ADD COLUMN IF NOT EXISTS geohash VARCHAR(12) COLLATE "C"',
+    ]),
+    Migration(4, "report geohash index and backfill", [
+        concurrent_index("idx_reports_geohash", "ON reports(geohash)"),
+        backfill_geohashes,
+    ], transactional=False),
+    # Per-cell aggregates behind the map clustering endpoint
+    Migration(5, "report cells", [
+        """
+        CREATE TABLE IF NOT EXISTS report_cells (
+            precision SMALLINT NOT NULL,
+            cell VARCHAR(12) COLLATE "C" NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            report_count INTEGER NOT NULL DEFAULT 0,
+            latitude_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            longitude_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (precision, cell, category, status)
+        )
+        """,
+    ]),
+    # Incrementally maintained report counts behind /stats
+    # (user_id 0 holds the global totals, sharded over several slots)
+    Migration(6, "report counters", [
+        """
+        CREATE TABLE IF NOT EXISTS report_counters (
+            user_id INTEGER NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            slot SMALLINT NOT NULL DEFAULT 0,
+            report_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, status, slot)
+        )
+        """,
+    ]),
+    Migration(7, "seed aggregates", [
+        seed_report_cells,
+        seed_report_counters,
+    ], transactional=False),
+    Migration(8, "image variants and batch client ids", [
+        """
+        ALTER TABLE reports
+            ADD COLUMN IF NOT EXISTS thumbnail_url TEXT,
+            ADD COLUMN IF NOT EXISTS medium_url TEXT,
+            ADD COLUMN IF NOT EXISTS client_id VARCHAR(64)
+        """,
+    ]),
+    # Makes batch resubmissions idempotent per user
+    Migration(9, "batch client id index", [
+        concurrent_index(
+            "idx_reports_user_client_id",
+            "ON reports(user_id, client_id) WHERE client_id IS NOT NULL",
+            unique=True
+        ),
+    ], transactional=False),
+    # Version of report data as a whole, behind the list and stats ETags
+    Migration(10, "report versions", [
+        "ALTER TABLE reports ADD COLUMN IF NOT EXISTS row_version INTEGER NOT NULL DEFAULT 1",
+        f"CREATE SEQUENCE IF NOT EXISTS {DATA_VERSION_SEQUENCE}",
+    ]),
+    # Adding a stored generated column rewrites the table once
+    Migration(11, "text search column", [
+        f"""
+        ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+            GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', text)) STORED
+        """,
+    ]),
+    Migration(12, "text search index", [
+        concurrent_index("idx_reports_search", "ON reports USING GIN (search_vector)"),
+    ], transactional=False),
+    Migration(13, "duplicate detection columns", [
+        """
+        ALTER TABLE reports
+            ADD COLUMN IF NOT EXISTS text_minhash BIGINT[],
+            ADD COLUMN IF NOT EXISTS text_bands BIGINT[],
+            ADD COLUMN IF NOT EXISTS duplicate_of INTEGER REFERENCES reports(id) ON DELETE SET NULL,
+            ADD COLUMN IF NOT EXISTS duplicate_count INTEGER NOT NULL DEFAULT 0
+        """,
+    ]),
+    # Candidate lookup for near-duplicate detection (canonical reports only)
+    Migration(14, "duplicate detection indexes and backfill", [
+        concurrent_index("idx_reports_text_bands", "ON reports USING GIN (text_bands) WHERE duplicate_of IS NULL"),
+        concurrent_index("idx_reports_duplicate_of", "ON reports(duplicate_of) WHERE duplicate_of IS NOT NULL"),
+        backfill_text_signatures,
+    ], transactional=False),
+    # Reports carry their author's username so read queries need no join with
+    # users. Inserts that leave it out get it from a trigger, and renames are
+    # copied to existing reports.
+    Migration(15, "denormalized report usernames", [
+        "ALTER TABLE reports ADD COLUMN IF NOT EXISTS username VARCHAR(255)",
+        """
+        CREATE OR REPLACE FUNCTION fill_report_username() RETURNS trigger AS $fn$
+        BEGIN
+            IF NEW.username IS NULL THEN
+                SELECT username INTO NEW.username FROM users WHERE id = NEW.user_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS reports_fill_username ON reports",
+        """
+        CREATE TRIGGER reports_fill_username
+        BEFORE INSERT ON reports
+        FOR EACH ROW EXECUTE FUNCTION fill_report_username()
+        """,
+        """
+        CREATE OR REPLACE FUNCTION copy_username_to_reports() RETURNS trigger AS $fn$
+        BEGIN
+            UPDATE reports SET username = NEW.username, row_version = row_version + 1
+            WHERE user_id = NEW.id;
+            RETURN NULL;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS users_copy_username ON users",
+        """
+        CREATE TRIGGER users_copy_username
+        AFTER UPDATE OF username ON users
+        FOR EACH ROW WHEN (OLD.username IS DISTINCT FROM NEW.username)
+        EXECUTE FUNCTION copy_username_to_reports()
+        """,
+    ]),
+    Migration(16, "backfill report usernames", [
+        backfill_report_usernames,
+    ], transactional=False),
+    # Indexes shaped like the read queries: equality filters first, then the
+    # (created_at, id) keyset order, so pages are read in order without a sort.
+    # They replace the single-column indexes, which are their prefixes.
+    Migration(17, "composite report indexes", [
+        concurrent_index("idx_reports_user_created", "ON reports(user_id, created_at DESC, id DESC)"),
+        concurrent_index("idx_reports_created", "ON reports(created_at DESC, id DESC)"),
+        concurrent_index("idx_reports_category_created", "ON reports(category, created_at DESC, id DESC)"),
+        concurrent_index("idx_reports_status_created", "ON reports(status, created_at DESC, id DESC)"),
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_reports_user_id",
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_reports_created_at",
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_reports_category",
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_reports_status",
+    ], transactional=False),
+    # Analytics rollups: per day, area (geohash cell) and category, plus the
+    # current open backlog per area and category
+    Migration(18, "analytics rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS report_daily (
+            day DATE NOT NULL,
+            area VARCHAR(12) COLLATE "C" NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            created_count INTEGER NOT NULL DEFAULT 0,
+            resolved_count INTEGER NOT NULL DEFAULT 0,
+            resolution_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            closed_count INTEGER NOT NULL DEFAULT 0,
+            reopened_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, area, category)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS report_backlog (
+            area VARCHAR(12) COLLATE "C" NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            open_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (area, category)
+        )
+        """,
+    ]),
+    Migration(19, "seed analytics rollups", [
+        seed_analytics_rollups,
+    ], transactional=False),
+    # Monthly range partitions on created_at (see app/partitions.py). Unique
+    # indexes on a partitioned table must include the partition key, so batch
+    # client ids are claimed in their own table, and the duplicate_of foreign
+    # key gives way to a trigger releasing the duplicates of deleted reports.
+    Migration(20, "partition reports by month", [
+        """
+        CREATE TABLE IF NOT EXISTS report_client_ids (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            client_id VARCHAR(64) NOT NULL,
+            PRIMARY KEY (user_id, client_id)
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION release_report_duplicates() RETURNS trigger AS $fn$
+        BEGIN
+            UPDATE reports SET duplicate_of = NULL, row_version = row_version + 1
+            WHERE duplicate_of = OLD.id;
+            RETURN NULL;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """,
+        partition_reports,
+    ], transactional=False),
+    # Day the analytics history starts: rollups rebuilt from existing reports
+    # know their creations but not their past closures, so the backlog trend
+    # can't be walked back past it. Databases seeded by migration 19 start then.
+    Migration(21, "analytics history start", [
+        """
+        CREATE TABLE IF NOT EXISTS analytics_state (
+            singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+            tracked_since DATE NOT NULL
+        )
+        """,
+        """
+        INSERT INTO analytics_state (tracked_since)
+        SELECT m.applied_at::date FROM schema_migrations m
+        WHERE m.version = 19 AND EXISTS (SELECT 1 FROM reports r WHERE r.created_at < m.applied_at)
+        ON CONFLICT (singleton) DO NOTHING
+        """,
+    ]),
+    # Open reports leaving the backlog when their partition is archived
+    Migration(22, "archived report counts", [
+        "ALTER TABLE report_daily ADD COLUMN IF NOT EXISTS archived_count INTEGER NOT NULL DEFAULT 0",
+    ]),
+    # Map cells and global counters stop counting duplicates, as the lists do
+    Migration(23, "aggregates without duplicates", [
+        rebuild_report_cells,
+        recount_report_counters,
+    ], transactional=False),
+    # Deleting a report (e.g. with its user) releases its duplicates; they are
+    # canonical again, so they rejoin the map cells and global counters the way
+    # archive_partition adds them back, and a deleted canonical report leaves the
+    # cells, which have no reconciler
+    Migration(24, "release duplicates into the aggregates", [
+        f"""
+        CREATE OR REPLACE FUNCTION release_report_duplicates() RETURNS trigger AS $fn$
+        DECLARE
+            global_slot SMALLINT := floor(random() * {GLOBAL_SLOTS});
+        BEGIN
+            WITH released AS (
+                UPDATE reports SET duplicate_of = NULL, row_version = row_version + 1
+                WHERE duplicate_of = OLD.id
+                RETURNING status, category, latitude, longitude, geohash
+            ),
+            cells AS (
+                INSERT INTO report_cells (precision, cell, category, status, report_count, latitude_sum, longitude_sum)
+                SELECT p.precision, left(r.geohash, p.precision), r.category, COALESCE(r.status, 'pending'),
+                       COUNT(*), SUM(r.latitude::float8), SUM(r.longitude::float8)
+                FROM released r
+                CROSS JOIN generate_series({CLUSTER_PRECISIONS[0]}, {CLUSTER_PRECISIONS[-1]}) AS p(precision)
+                WHERE r.geohash IS NOT NULL AND r.latitude IS NOT NULL AND r.longitude IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ORDER BY 1, 2, 3, 4
+                ON CONFLICT (precision, cell, category, status) DO UPDATE SET
+                    report_count = report_cells.report_count + EXCLUDED.report_count,
+                    latitude_sum = report_cells.latitude_sum + EXCLUDED.latitude_sum,
+                    longitude_sum = report_cells.longitude_sum + EXCLUDED.longitude_sum
+            )
+            INSERT INTO report_counters (user_id, status, slot, report_count)
+            SELECT {GLOBAL_USER_ID}, COALESCE(status, 'pending'), global_slot, COUNT(*)
+            FROM released
+            GROUP BY 2
+            ORDER BY 2
+            ON CONFLICT (user_id, status, slot) DO UPDATE SET
+                report_count = report_counters.report_count + EXCLUDED.report_count;
+
+            IF OLD.duplicate_of IS NULL AND OLD.geohash IS NOT NULL
+               AND OLD.latitude IS NOT NULL AND OLD.longitude IS NOT NULL THEN
+                UPDATE report_cells SET
+                    report_count = report_count - 1,
+                    latitude_sum = latitude_sum - OLD.latitude::float8,
+                    longitude_sum = longitude_sum - OLD.longitude::float8
+                WHERE precision BETWEEN {CLUSTER_PRECISIONS[0]} AND {CLUSTER_PRECISIONS[-1]}
+                  AND cell = left(OLD.geohash, precision)
+                  AND category = OLD.category
+                  AND status = COALESCE(OLD.status, 'pending');
+            END IF;
+            RETURN NULL;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """,
+    ]),
+    # Renaming a user and releasing duplicates change list payloads (username,
+    # duplicate_of) from inside triggers, so they advance the data version too
+    Migration(25, "trigger data version bumps", [
+        f"""
+        CREATE OR REPLACE FUNCTION copy_username_to_reports() RETURNS trigger AS $fn$
+        BEGIN
+            UPDATE reports SET username = NEW.username, row_version = row_version + 1
+            WHERE user_id = NEW.id;
+            PERFORM nextval('{DATA_VERSION_SEQUENCE}');
+            RETURN NULL;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION release_report_duplicates() RETURNS trigger AS $fn$
+        DECLARE
+            global_slot SMALLINT := floor(random() * {GLOBAL_SLOTS});
+        BEGIN
+            WITH released AS (
+                UPDATE reports SET duplicate_of = NULL, row_version = row_version + 1
+                WHERE duplicate_of = OLD.id
+                RETURNING status, category, latitude, longitude, geohash
+            ),
+            cells AS (
+                INSERT INTO report_cells (precision, cell, category, status, report_count, latitude_sum, longitude_sum)
+                SELECT p.precision, left(r.geohash, p.precision), r.category, COALESCE(r.status, 'pending'),
+                       COUNT(*), SUM(r.latitude::float8), SUM(r.longitude::float8)
+                FROM released r
+                CROSS JOIN generate_series({CLUSTER_PRECISIONS[0]}, {CLUSTER_PRECISIONS[-1]}) AS p(precision)
+                WHERE r.geohash IS NOT NULL AND r.latitude IS NOT NULL AND r.longitude IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ORDER BY 1, 2, 3, 4
+                ON CONFLICT (precision, cell, category, status) DO UPDATE SET
+                    report_count = report_cells.report_count + EXCLUDED.report_count,
+                    latitude_sum = report_cells.latitude_sum + EXCLUDED.latitude_sum,
+                    longitude_sum = report_cells.longitude_sum + EXCLUDED.longitude_sum
+            )
+            INSERT INTO report_counters (user_id, status, slot, report_count)
+            SELECT {GLOBAL_USER_ID}, COALESCE(status, 'pending'), global_slot, COUNT(*)
+            FROM released
+            GROUP BY 2
+            ORDER BY 2
+            ON CONFLICT (user_id, status, slot) DO UPDATE SET
+                report_count = report_counters.report_count + EXCLUDED.report_count;
+
+            IF OLD.duplicate_of IS NULL AND OLD.geohash IS NOT NULL
+               AND OLD.latitude IS NOT NULL AND OLD.longitude IS NOT NULL THEN
+                UPDATE report_cells SET
+                    report_count = report_count - 1,
+                    latitude_sum = latitude_sum - OLD.latitude::float8,
+                    longitude_sum = longitude_sum - OLD.longitude::float8
+                WHERE precision BETWEEN {CLUSTER_PRECISIONS[0]} AND {CLUSTER_PRECISIONS[-1]}
+                  AND cell = left(OLD.geohash, precision)
+                  AND category = OLD.category
+                  AND status = COALESCE(OLD.status, 'pending');
+            END IF;
+
+            PERFORM nextval('{DATA_VERSION_SEQUENCE}');
+            RETURN NULL;
+        END;
+        $fn$ LANGUAGE plpgsql
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+async def schema_is_current(connection: asyncpg.Connection) -> bool:
+    """Fast path: one catalog-free read telling whether any migration is pending"""
+    try:
+        version = await connection.fetchval("SELECT max(version) FROM schema_migrations")
+    except asyncpg.UndefinedTableError:
+        return False
+    # A newer release may already have migrated further during a rolling deploy
+    return (version or 0) >= LATEST_VERSION
+
+async def _run_steps(connection: asyncpg.Connection, migration: Migration):
+    for step in migration.steps:
+        if isinstance(step, str):
+            await connection.execute(step)
+        else:
+            await step(connection)
+
+async def _apply(connection: asyncpg.Connection, migration: Migration):
+    """Apply one migration and record it"""
+    record = "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)"
+
+    if not migration.transactional:
+        await _run_steps(connection, migration)
+        await connection.execute(record, migration.version, migration.name)
+        return
+
+    for attempt in range(MIGRATION_RETRIES):
+        try:
+            async with connection.transaction():
+                await connection.execute(f"SET LOCAL lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'")
+                await _run_steps(connection, migration)
+                await connection.execute(record, migration.version, migration.name)
+            return
+        except asyncpg.LockNotAvailableError:
+            if attempt == MIGRATION_RETRIES - 1:
+                raise
+            logger.warning(f"Migration {migration.version} timed out waiting for a lock, retrying")
+            await asyncio.sleep(2 ** attempt)
+
+async def _acquire_lock(connection: asyncpg.Connection):
+    # Poll instead of blocking in pg_advisory_lock: a blocked statement holds a
+    # snapshot, which CREATE INDEX CONCURRENTLY in the running migration would wait on
+    waiting = False
+    while not await connection.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_KEY):
+        if not waiting:
+            logger.info("Waiting for another worker to apply migrations")
+            waiting = True
+        await asyncio.sleep(MIGRATION_LOCK_POLL)
+
+async def apply_migrations(connection: asyncpg.Connection) -> int:
+    """
+    Apply pending migrations in order while holding the migration lock, so only
+    one worker changes the schema. Returns the number of migrations applied.
+    """
+    await _acquire_lock(connection)
+    try:
+        await connection.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        applied = {row["version"] for row in await connection.fetch("SELECT version FROM schema_migrations")}
+        pending = [migration for migration in MIGRATIONS if migration.version not in applied]
+
+        for migration in pending:
+            logger.info(f"Applying migration {migration.version}: {migration.name}")
+            await _apply(connection, migration)
+
+        return len(pending)
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+async def main():
+    """Apply pending migrations from the command line, e.g. before a deploy"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    connection = await asyncpg.connect(os.getenv("DATABASE_URL"))
+    try:
+        applied = await apply_migrations(connection)
+        logger.info(f"Applied {applied} schema migrations (schema version {LATEST_VERSION})")
+    finally:
+        await connection.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
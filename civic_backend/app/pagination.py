@@ -0,0 +1,45 @@
+import base64
+import math
+from datetime import datetime
+from typing import Tuple
+
+# Page size limits for keyset-paginated list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Rows fetched per round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 500
+
+def encode_cursor(created_at: datetime, report_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{report_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode an opaque cursor back into its (created_at, id) keyset position"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, report_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(report_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def encode_rank_cursor(rank: float, report_id: int) -> str:
+    """Encode a (rank, id) keyset position for relevance-ordered results"""
+    raw = f"{rank!r}|{report_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a relevance cursor back into its (rank, id) keyset position"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        rank, report_id = raw.rsplit("|", 1)
+        rank = float(rank)
+        # NaN or infinite ranks would make the keyset comparison meaningless
+        if not math.isfinite(rank):
+            raise ValueError("Rank must be finite")
+        return rank, int(report_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
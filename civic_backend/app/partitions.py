@@ -0,0 +1,428 @@
+import asyncio
+import asyncpg
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+from . import analytics, clusters, counters
+from .etags import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Monthly partitions kept ready beyond the current month, so inserts never
+# depend on the maintenance job having run recently
+PARTITION_PREMAKE_MONTHS = int(os.getenv("REPORT_PARTITION_PREMAKE_MONTHS", "3"))
+
+# Partitions for months older than this are detached, archived and dropped.
+# Opt-in: 0 (the default) keeps every partition attached.
+REPORT_RETENTION_MONTHS = int(os.getenv("REPORT_RETENTION_MONTHS", "0"))
+
+# Directory receiving archived partitions as gzipped CSV. Must be set to an
+# absolute path on durable storage, or nothing is archived.
+REPORT_ARCHIVE_DIR = os.getenv("REPORT_ARCHIVE_DIR", "")
+
+# Seconds between maintenance passes (0 disables the background job)
+PARTITION_MAINTENANCE_INTERVAL = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "86400"))
+
+# Advisory lock key so only one worker maintains partitions at a time
+PARTITION_LOCK_KEY = 7_340_003
+
+# Transaction lock serializing partition creation, which startup and inserts
+# also do, without waiting on a maintenance pass busy archiving
+PARTITION_CREATE_LOCK_KEY = 7_340_004
+
+# DDL on reports gives up waiting for its table lock after this long and is
+# retried, rather than queueing every query on the table behind it
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+PARTITION_LOCK_RETRIES = 5
+
+# Upper bound in seconds on copying one partition to its archive file
+ARCHIVE_COPY_TIMEOUT = 3600
+
+# Rows copied per batch when converting an unpartitioned reports table
+PARTITION_COPY_BATCH = 10_000
+
+PARTITION_NAME = re.compile(r"^reports_p(\d{4})(\d{2})$")
+
+# Indexes of the partitioned table, cascaded to every partition. Unique indexes
+# would have to include created_at, so idx_reports_user_client_id is a plain
+# index and report_client_ids keeps batch submissions idempotent instead.
+REPORT_INDEXES = [
+    ("idx_reports_geohash", "(geohash)"),
+    ("idx_reports_user_client_id", "(user_id, client_id) WHERE client_id IS NOT NULL"),
+    ("idx_reports_search", "USING GIN (search_vector)"),
+    ("idx_reports_text_bands", "USING GIN (text_bands) WHERE duplicate_of IS NULL"),
+    ("idx_reports_duplicate_of", "(duplicate_of) WHERE duplicate_of IS NOT NULL"),
+    ("idx_reports_user_created", "(user_id, created_at DESC, id DESC)"),
+    ("idx_reports_created", "(created_at DESC, id DESC)"),
+    ("idx_reports_category_created", "(category, created_at DESC, id DESC)"),
+    ("idx_reports_status_created", "(status, created_at DESC, id DESC)"),
+]
+
+def month_start(moment) -> date:
+    return date(moment.year, moment.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"reports_p{month:%Y%m}"
+
+def partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+async def _with_lock_timeout(connection: asyncpg.Connection, step: Callable[[], Awaitable[None]]):
+    """Run step in a transaction under the lock timeout, retrying when it times out"""
+    for attempt in range(PARTITION_LOCK_RETRIES):
+        try:
+            async with connection.transaction():
+                await connection.execute(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'")
+                await step()
+            return
+        except asyncpg.LockNotAvailableError:
+            if attempt == PARTITION_LOCK_RETRIES - 1:
+                raise
+            logger.warning("Partition maintenance timed out waiting for a lock, retrying")
+            await asyncio.sleep(2 ** attempt)
+
+async def is_partitioned(connection: asyncpg.Connection) -> bool:
+    return bool(await connection.fetchval(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('reports')"
+    ))
+
+async def _stored_columns(connection: asyncpg.Connection, table: str) -> List[str]:
+    """Columns of table in order, leaving out generated ones (they can't be written)"""
+    rows = await connection.fetch("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = to_regclass($1) AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+    """, table)
+    return [row["attname"] for row in rows]
+
+async def _partitions(connection: asyncpg.Connection, parent: str = "reports") -> List[str]:
+    rows = await connection.fetch("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass($1)
+        ORDER BY c.relname
+    """, parent)
+    return [row["relname"] for row in rows]
+
+async def ensure_partitions(
+    connection: asyncpg.Connection,
+    since: Optional[datetime] = None,
+    parent: str = "reports"
+) -> List[str]:
+    """
+    Create the monthly partitions from the month of since (default: now) to
+    PARTITION_PREMAKE_MONTHS ahead. Returns the names of the partitions created.
+    """
+    now = await connection.fetchval("SELECT LOCALTIMESTAMP")
+    month = month_start(min(since, now) if since else now)
+    last = add_months(month_start(now), PARTITION_PREMAKE_MONTHS)
+    existing = set(await _partitions(connection, parent))
+
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            bounds = f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+
+            async def create():
+                await connection.execute("SELECT pg_advisory_xact_lock($1)", PARTITION_CREATE_LOCK_KEY)
+                await connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} FOR VALUES {bounds}"
+                )
+            await _with_lock_timeout(connection, create)
+            created.append(name)
+        month = add_months(month, 1)
+
+    if created:
+        logger.info(f"Created report partitions {', '.join(created)}")
+    return created
+
+async def _write_archive(connection: asyncpg.Connection, table: str) -> str:
+    """COPY a detached partition into REPORT_ARCHIVE_DIR/<table>.csv.gz and return the path"""
+    os.makedirs(REPORT_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(REPORT_ARCHIVE_DIR, f"{table}.csv.gz")
+    partial = f"{path}.partial"
+    columns = await _stored_columns(connection, table)
+
+    raw = open(partial, "wb")
+    archive = gzip.GzipFile(fileobj=raw, mode="wb")
+
+    async def write(data):
+        # Compression is CPU-bound; keep it off the event loop
+        await asyncio.to_thread(archive.write, data)
+
+    def finish():
+        archive.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+        raw.close()
+
+    try:
+        await connection.copy_from_table(
+            table, columns=columns, output=write, format="csv", header=True, timeout=ARCHIVE_COPY_TIMEOUT
+        )
+        await asyncio.to_thread(finish)
+    except BaseException:
+        archive.close()
+        raw.close()
+        os.remove(partial)
+        raise
+
+    # The file only appears under its final name once it is complete
+    os.replace(partial, path)
+    return path
+
+async def archive_partition(connection: asyncpg.Connection, name: str, attached: bool = True) -> str:
+    """
+    Detach a partition, write it to an archive file and drop it. Its reports
+    leave the derived aggregates (but not the daily analytics history) in the
+    transaction that detaches it. Returns the archive path.
+    """
+    if attached:
+        async def detach():
+            await connection.execute(f"ALTER TABLE reports DETACH PARTITION {name}")
+            await clusters.remove_archived_reports(connection, name)
+            await counters.remove_archived_reports(connection, name)
+            await analytics.remove_archived_reports(connection, name)
+            # Newer duplicates of archived reports become canonical again
+            released = await connection.fetch(f"""
+                UPDATE reports d
+                SET duplicate_of = NULL, row_version = d.row_version + 1
+                FROM {name} a
+                WHERE d.duplicate_of IS NOT NULL AND d.duplicate_of = a.id
+                RETURNING d.id, d.user_id, d.status, d.category, d.latitude, d.longitude, d.geohash,
+                          d.duplicate_of
+            """)
+            await clusters.apply_duplicates_released(connection, released)
+            await counters.apply_duplicates_released(connection, released)
+            # A resubmitted client_id would otherwise point at a report that is gone
+            await connection.execute(f"""
+                DELETE FROM report_client_ids c
+                USING {name} a
+                WHERE c.user_id = a.user_id AND c.client_id = a.client_id
+            """)
+        await _with_lock_timeout(connection, detach)
+
+    path = await _write_archive(connection, name)
+    await connection.execute(f"DROP TABLE {name}")
+    logger.info(f"Archived report partition {name} to {path}")
+    return path
+
+def is_missing_partition(error: Exception) -> bool:
+    return isinstance(error, asyncpg.CheckViolationError) and "no partition of relation" in str(error)
+
+async def retry_on_missing_partition(connection: asyncpg.Connection, insert: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run an insert (a whole transaction), and if a row had no partition to go to
+    (maintenance stopped for longer than the premade months), create the
+    partitions and run it once more
+    """
+    try:
+        return await insert()
+    except asyncpg.CheckViolationError as e:
+        if not is_missing_partition(e):
+            raise
+        logger.warning("Report insert found no partition; creating partitions and retrying")
+        await ensure_partitions(connection)
+        return await insert()
+
+async def expired_partitions(connection: asyncpg.Connection) -> List[Tuple[str, bool]]:
+    """
+    (name, attached) of the partitions past the retention period, including
+    ones an interrupted archival already detached, oldest first
+    """
+    if REPORT_RETENTION_MONTHS <= 0:
+        return []
+    if not os.path.isabs(REPORT_ARCHIVE_DIR):
+        logger.error(
+            "REPORT_RETENTION_MONTHS is set but REPORT_ARCHIVE_DIR is not an absolute path; "
+            "not archiving report partitions"
+        )
+        return []
+
+    now = await connection.fetchval("SELECT LOCALTIMESTAMP")
+    cutoff = add_months(month_start(now), -REPORT_RETENTION_MONTHS)
+    rows = await connection.fetch("""
+        SELECT relname, relispartition FROM pg_class
+        WHERE relnamespace = current_schema()::regnamespace
+          AND relkind = 'r' AND relname ~ '^reports_p[0-9]{6}$'
+        ORDER BY relname
+    """)
+    return [
+        (row["relname"], row["relispartition"])
+        for row in rows
+        if partition_month(row["relname"]) < cutoff
+    ]
+
+async def maintain_partitions(connection: asyncpg.Connection) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Create upcoming partitions and archive expired ones. Returns the created
+    partitions and archive paths, or None if another worker holds the lock.
+    """
+    if not await connection.fetchval("SELECT pg_try_advisory_lock($1)", PARTITION_LOCK_KEY):
+        return None
+
+    try:
+        created = await ensure_partitions(connection)
+        archived = [
+            await archive_partition(connection, name, attached)
+            for name, attached in await expired_partitions(connection)
+        ]
+        # Archived reports leave lists and /stats, so cached copies must revalidate
+        if archived:
+            await bump_data_version(connection)
+        return created, archived
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock($1)", PARTITION_LOCK_KEY)
+
+async def run_partition_maintenance(pool: asyncpg.Pool, interval: int = PARTITION_MAINTENANCE_INTERVAL):
+    """Maintain partitions at startup and then periodically until cancelled"""
+    while True:
+        try:
+            async with pool.acquire() as connection:
+                await maintain_partitions(connection)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
+
+async def _apply_conversion_log(connection: asyncpg.Connection, columns: str) -> int:
+    """Recopy the reports changed since they were copied; returns how many there were"""
+    async with connection.transaction():
+        ids = await connection.fetchval("""
+            WITH logged AS (DELETE FROM reports_conversion_log RETURNING id)
+            SELECT array_agg(DISTINCT id) FROM logged
+        """)
+        if not ids:
+            return 0
+
+        await connection.execute("DELETE FROM reports_partitioned WHERE id = ANY($1::int[])", ids)
+        await connection.execute(f"""
+            INSERT INTO reports_partitioned ({columns})
+            SELECT {columns} FROM reports WHERE id = ANY($1::int[])
+        """, ids)
+        await connection.execute("""
+            INSERT INTO report_client_ids (user_id, client_id)
+            SELECT user_id, client_id FROM reports
+            WHERE id = ANY($1::int[]) AND user_id IS NOT NULL AND client_id IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """, ids)
+        return len(ids)
+
+async def partition_reports(connection: asyncpg.Connection, batch_size: int = PARTITION_COPY_BATCH):
+    """
+    Convert an unpartitioned reports table into monthly partitions while it
+    stays in use. Rows are copied in id batches and a trigger logs the ids
+    changed meanwhile; only the last catch-up and the swap of the two tables
+    hold the table lock. The old table stays authoritative until the swap, so
+    an interrupted conversion starts over.
+    """
+    if await is_partitioned(connection):
+        return
+
+    await _with_lock_timeout(connection, lambda: connection.execute(
+        "DROP TRIGGER IF EXISTS reports_log_conversion ON reports"
+    ))
+    await connection.execute("DROP TABLE IF EXISTS reports_partitioned, reports_conversion_log")
+
+    await connection.execute("CREATE TABLE reports_conversion_log (id INTEGER NOT NULL)")
+    await connection.execute("""
+        CREATE OR REPLACE FUNCTION log_report_conversion() RETURNS trigger AS $fn$
+        BEGIN
+            INSERT INTO reports_conversion_log (id) VALUES (COALESCE(NEW.id, OLD.id));
+            RETURN NULL;
+        END;
+        $fn$ LANGUAGE plpgsql
+    """)
+    await _with_lock_timeout(connection, lambda: connection.execute("""
+        CREATE TRIGGER reports_log_conversion
+        AFTER INSERT OR UPDATE OR DELETE ON reports
+        FOR EACH ROW EXECUTE FUNCTION log_report_conversion()
+    """))
+
+    # The partition key can't be NULL (the column default means it never is in practice)
+    await connection.execute("UPDATE reports SET created_at = LOCALTIMESTAMP WHERE created_at IS NULL")
+
+    await connection.execute("""
+        CREATE TABLE reports_partitioned (
+            LIKE reports INCLUDING DEFAULTS INCLUDING GENERATED,
+            CONSTRAINT reports_partitioned_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT reports_partitioned_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at)
+    """)
+    oldest = await connection.fetchval("SELECT min(created_at) FROM reports")
+    await ensure_partitions(connection, oldest, parent="reports_partitioned")
+    for name, definition in REPORT_INDEXES:
+        await connection.execute(f"CREATE INDEX {name}_new ON reports_partitioned {definition}")
+
+    columns = ", ".join(await _stored_columns(connection, "reports"))
+    last_id, total = 0, 0
+    while True:
+        row = await connection.fetchrow(f"""
+            WITH copied AS (
+                INSERT INTO reports_partitioned ({columns})
+                SELECT {columns} FROM reports WHERE id > $1 ORDER BY id LIMIT $2
+                RETURNING id
+            )
+            SELECT max(id) AS last_id, count(*) AS copied FROM copied
+        """, last_id, batch_size)
+        if row["last_id"] is None:
+            break
+        last_id = row["last_id"]
+        total += row["copied"]
+
+    await connection.execute("""
+        INSERT INTO report_client_ids (user_id, client_id)
+        SELECT user_id, client_id FROM reports
+        WHERE user_id IS NOT NULL AND client_id IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """)
+
+    # Catch up outside the lock until what is left is small
+    while await _apply_conversion_log(connection, columns) >= batch_size:
+        pass
+
+    sequence = await connection.fetchval("SELECT pg_get_serial_sequence('reports', 'id')")
+
+    async def swap():
+        await connection.execute("LOCK TABLE reports IN ACCESS EXCLUSIVE MODE")
+        await _apply_conversion_log(connection, columns)
+        await connection.execute("ALTER TABLE reports RENAME TO reports_unpartitioned")
+        await connection.execute("ALTER TABLE reports_partitioned RENAME TO reports")
+        if sequence:
+            await connection.execute(f"ALTER SEQUENCE {sequence} OWNED BY reports.id")
+        await connection.execute("DROP TABLE reports_unpartitioned, reports_conversion_log")
+        await connection.execute("DROP FUNCTION log_report_conversion()")
+
+        for name, _ in REPORT_INDEXES:
+            await connection.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+        await connection.execute("ALTER TABLE reports RENAME CONSTRAINT reports_partitioned_pkey TO reports_pkey")
+        await connection.execute(
+            "ALTER TABLE reports RENAME CONSTRAINT reports_partitioned_user_id_fkey TO reports_user_id_fkey"
+        )
+
+        await connection.execute("""
+            CREATE TRIGGER reports_fill_username
+            BEFORE INSERT ON reports
+            FOR EACH ROW EXECUTE FUNCTION fill_report_username()
+        """)
+        await connection.execute("""
+            CREATE TRIGGER reports_release_duplicates
+            AFTER DELETE ON reports
+            FOR EACH ROW EXECUTE FUNCTION release_report_duplicates()
+        """)
+
+    await _with_lock_timeout(connection, swap)
+    logger.info(f"Partitioned reports by month ({total} reports copied)")
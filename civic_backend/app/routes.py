@@ -1,14 +1,50 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi import (
+    APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Query, Header, BackgroundTasks
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 import asyncpg
 from .db import get_db
-from .auth import get_current_user
+from .migrations import SEARCH_CONFIG
+from .admission import admitted_user
 from .storage import upload_file
+from .uploads import IMAGE_EXTENSIONS, validate_image_upload
+from .images import save_for_processing, process_report_image, discard
+from .dedup import sign_texts, find_canonical, link_duplicate
+from .partitions import retry_on_missing_partition
+from .geo import encode_geohash, bounding_box, covering_cells, prefix_ranges
+from .clusters import MAX_VIEWPORT_CELLS, zoom_to_precision, fetch_clusters
+from . import analytics, clusters, counters, feed
+from .feed import stream_events
+from .export import EXPORT_MEDIA_TYPES, EXPORT_STREAMS, build_export_query, parquet_available
+from .serialization import (
+    REPORT_COLUMNS, RecordJSONResponse, report_payload, encode_reports, encode_report_line
+)
+from .etags import (
+    fetch_data_version, bump_data_version, weak_etag, etag_matches, cache_headers, not_modified
+)
+from .pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, encode_cursor, decode_cursor,
+    encode_rank_cursor, decode_rank_cursor
+)
 
 reports_router = APIRouter()
+analytics_router = APIRouter()
+
+# Maximum number of reports accepted by one batch submission
+MAX_BATCH_SIZE = 500
+
+# Maximum total text (characters) across one batch, which bounds the work of
+# signing it for duplicate detection
+MAX_BATCH_TEXT_CHARS = 200_000
+
+# Maximum number of reports changed by one bulk status update
+MAX_BULK_STATUS_SIZE = 1000
+
+VALID_STATUSES = ["pending", "in_progress", "resolved", "rejected"]
 
 # Pydantic models
 class ReportCreate(BaseModel):
@@ -25,9 +61,31 @@ class ReportResponse(BaseModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
     image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
     category: str
     status: str
     created_at: datetime
+    duplicate_of: Optional[int] = None
+    duplicate_count: int = 0
+
+class BatchReportItem(BaseModel):
+    client_id: str = Field(..., min_length=1, max_length=64)
+    text: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    category: str
+
+class BatchReportRequest(BaseModel):
+    items: List[BatchReportItem]
+
+class BatchReportResult(BaseModel):
+    client_id: str
+    status: str  # "created" or "duplicate"
+    report: ReportResponse
+
+class BatchReportResponse(BaseModel):
+    results: List[BatchReportResult]
 
 class ReportStats(BaseModel):
     total_reports: int
@@ -35,48 +93,434 @@ class ReportStats(BaseModel):
     resolved_reports: int
     user_reports: int
 
+class ReportCluster(BaseModel):
+    cell: str
+    count: int
+    latitude: float
+    longitude: float
+    by_status: Dict[str, int]
+    by_category: Dict[str, int]
+
+class ClusterResponse(BaseModel):
+    precision: int
+    clusters: List[ReportCluster]
+
+class BulkStatusFilter(BaseModel):
+    category: Optional[str] = None
+    status: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class BulkStatusUpdate(BaseModel):
+    status: str
+    report_ids: Optional[List[int]] = None
+    filter: Optional[BulkStatusFilter] = None
+
+class BulkStatusResult(BaseModel):
+    id: int
+    outcome: str  # "updated", "unchanged", "forbidden" or "not_found"
+
+class BulkStatusResponse(BaseModel):
+    status: str
+    updated: int
+    has_more: bool
+    results: List[BulkStatusResult]
+
+class DailyTrend(BaseModel):
+    day: date
+    category: str
+    created: int
+    resolved: int
+    closed: int
+    reopened: int
+    mean_resolution_hours: Optional[float] = None
+
+class AreaResolution(BaseModel):
+    area: str
+    resolved: int
+    mean_resolution_hours: float
+
+class AreaBacklog(BaseModel):
+    area: str
+    open: int
+
+class BacklogPoint(BaseModel):
+    day: date
+    open: Optional[int] = None  # None before the analytics history starts
+
 class NearbyReportsRequest(BaseModel):
     latitude: float
     longitude: float
     radius_km: Optional[float] = 5.0
 
+async def record_reports_created(connection: asyncpg.Connection, reports):
+    """Update derived aggregates for newly inserted reports (inside the insert transaction)"""
+    await clusters.apply_reports_created(connection, reports)
+    await counters.apply_reports_created(connection, reports)
+    await analytics.apply_reports_created(connection, reports)
+    await feed.publish_reports_created(connection, reports)
+
+async def record_status_changes(connection: asyncpg.Connection, changes):
+    """Update derived aggregates for (updated report, previous status) pairs"""
+    await clusters.apply_status_changes(connection, changes)
+    await counters.apply_status_changes(connection, changes)
+    await analytics.apply_status_changes(connection, changes)
+    await feed.publish_status_changes(connection, changes)
+
+# One report with the row version behind its ETag. Clients only know the id,
+# so these probe the (id, created_at) key of every attached partition, one
+# index lookup per month kept (see REPORT_RETENTION_MONTHS)
+REPORT_BY_ID_QUERY = f"""
+    SELECT {REPORT_COLUMNS}, r.row_version
+    FROM reports r
+    WHERE r.id = $1
+"""
+
+REPORT_VERSION_QUERY = "SELECT row_version FROM reports WHERE id = $1"
+
+# Reports an earlier batch stored under the given client ids
+EXISTING_CLIENT_IDS_QUERY = f"""
+    SELECT {REPORT_COLUMNS}, r.client_id FROM reports r
+    WHERE r.user_id = $1 AND r.client_id = ANY($2::text[])
+"""
+
+def build_reports_page_query(cursor: Optional[str], limit: Optional[int], user_id: Optional[int] = None):
+    """
+    Build a keyset-paginated reports query ordered newest first by (created_at, id).
+    The created_at bound lets Postgres walk idx_reports_created (or
+    idx_reports_user_created for one user) from the cursor position instead of
+    scanning and discarding earlier pages.
+    """
+    conditions = []
+    args = []
+    
+    if user_id is not None:
+        args.append(user_id)
+        conditions.append(f"r.user_id = ${len(args)}")
+    else:
+        # Duplicates only appear in their submitter's own list
+        conditions.append("r.duplicate_of IS NULL")
+    
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        args.extend([created_at, last_id])
+        ts, rid = len(args) - 1, len(args)
+        conditions.append(f"r.created_at <= ${ts} AND (r.created_at < ${ts} OR r.id < ${rid})")
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {REPORT_COLUMNS}
+        FROM reports r
+        {where}
+        ORDER BY r.created_at DESC, r.id DESC
+    """
+    
+    if limit is not None:
+        args.append(limit)
+        query += f"LIMIT ${len(args)}"
+    
+    return query, args
+
+def build_status_update_query(
+    new_status: str,
+    user_id: int,
+    report_ids: Optional[List[int]] = None,
+    filters: Optional[BulkStatusFilter] = None,
+    limit: int = MAX_BULK_STATUS_SIZE
+):
+    """
+    Build one statement that locks the reports the user may change, updates
+    them and reports an outcome per report. Ownership is checked in SQL; each
+    changed row also carries its previous status for the derived aggregates.
+    Targets are given as report_ids, or as filters matching up to limit reports.
+    Rows are locked in id order so concurrent bulk updates can't deadlock, and
+    updated by their full (id, created_at) key, which names their partition.
+    """
+    args = [new_status, user_id]
+    
+    if report_ids is not None:
+        args.append(report_ids)
+        requested = f"""
+            requested AS (
+                SELECT DISTINCT unnest(${len(args)}::int[]) AS id
+            ),
+        """
+        target = """
+            SELECT r.id, r.created_at, r.status AS old_status
+            FROM reports r
+            JOIN requested q ON r.id = q.id
+            WHERE r.user_id = $2
+            ORDER BY r.id
+            FOR UPDATE OF r
+        """
+        outcomes = """
+            SELECT q.id,
+                   CASE WHEN u.id IS NOT NULL THEN 'updated'
+                        WHEN t.id IS NOT NULL THEN 'unchanged'
+                        WHEN EXISTS (SELECT 1 FROM reports r WHERE r.id = q.id) THEN 'forbidden'
+                        ELSE 'not_found'
+                   END AS outcome,
+                   u.user_id, u.status, u.category, u.latitude, u.longitude, u.geohash, u.old_status,
+                   u.duplicate_of, u.created_at, u.changed_at
+            FROM requested q
+            LEFT JOIN target t ON t.id = q.id
+            LEFT JOIN updated u ON u.id = q.id
+            ORDER BY q.id
+        """
+    else:
+        filters = filters or BulkStatusFilter()
+        conditions = ["r.user_id = $2", "r.status IS DISTINCT FROM $1"]
+        for column, value in (("category", filters.category), ("status", filters.status)):
+            if value is not None:
+                args.append(value)
+                conditions.append(f"r.{column} = ${len(args)}")
+        if filters.created_after is not None:
+            args.append(filters.created_after)
+            conditions.append(f"r.created_at >= ${len(args)}")
+        if filters.created_before is not None:
+            args.append(filters.created_before)
+            conditions.append(f"r.created_at < ${len(args)}")
+        args.append(limit)
+        
+        requested = ""
+        target = f"""
+            SELECT r.id, r.created_at, r.status AS old_status
+            FROM reports r
+            WHERE {' AND '.join(conditions)}
+            ORDER BY r.id
+            LIMIT ${len(args)}
+            FOR UPDATE OF r
+        """
+        outcomes = """
+            SELECT u.id, 'updated' AS outcome,
+                   u.user_id, u.status, u.category, u.latitude, u.longitude, u.geohash, u.old_status,
+                   u.duplicate_of, u.created_at, u.changed_at
+            FROM updated u
+            ORDER BY u.id
+        """
+    
+    query = f"""
+        WITH {requested}
+        target AS ({target}),
+        updated AS (
+            UPDATE reports r
+            SET status = $1, row_version = r.row_version + 1
+            FROM target t
+            WHERE r.id = t.id AND r.created_at = t.created_at AND t.old_status IS DISTINCT FROM $1
+            RETURNING r.id, r.user_id, r.status, r.category, r.latitude, r.longitude, r.geohash, t.old_status,
+                      r.duplicate_of, r.created_at, LOCALTIMESTAMP AS changed_at
+        )
+        {outcomes}
+    """
+    
+    return query, args
+
+async def apply_status_update(connection: asyncpg.Connection, query: str, args: list):
+    """Run a status update statement and its aggregate hooks in one transaction"""
+    async with connection.transaction():
+        results = await connection.fetch(query, *args)
+        changes = [(row, row["old_status"]) for row in results if row["outcome"] == "updated"]
+        await record_status_changes(connection, changes)
+    
+    if changes:
+        await bump_data_version(connection)
+    
+    return results
+
+def build_nearby_query(latitude: float, longitude: float, radius_km: float, limit: int = 50):
+    """
+    Build a radius query that narrows candidates with geohash range scans and a
+    lat/lon bounding box before computing the exact Haversine distance.
+    """
+    min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_km)
+    args = [latitude, longitude, radius_km, min_lat, max_lat, min_lon, max_lon, limit]
+    
+    # Very large radii fall back to the bounding box alone
+    cells = covering_cells(min_lat, min_lon, max_lat, max_lon)
+    cell_join = ""
+    if cells is not None:
+        lows, highs = prefix_ranges(cells)
+        args.extend([lows, highs])
+        cell_join = """
+            JOIN unnest($9::text[], $10::text[]) AS cell(lo, hi)
+              ON r.geohash >= cell.lo AND r.geohash < cell.hi
+        """
+    
+    # LEAST() keeps acos() in its domain when rounding pushes the cosine past 1
+    query = f"""
+        SELECT * FROM (
+            SELECT {REPORT_COLUMNS},
+                   (6371 * acos(LEAST(1.0, cos(radians($1)) * cos(radians(r.latitude))
+                   * cos(radians(r.longitude) - radians($2))
+                   + sin(radians($1)) * sin(radians(r.latitude))))) AS distance
+            FROM reports r
+            {cell_join}
+            WHERE r.latitude IS NOT NULL AND r.longitude IS NOT NULL
+              AND r.duplicate_of IS NULL
+              AND r.latitude::float8 BETWEEN $4::float8 AND $5::float8
+              AND r.longitude::float8 BETWEEN $6::float8 AND $7::float8
+        ) nearby
+        WHERE distance <= $3
+        ORDER BY distance, created_at DESC
+        LIMIT $8
+    """
+    
+    return query, args
+
+def build_search_query(
+    text: str,
+    sort: str,
+    cursor: Optional[str],
+    limit: int,
+    category: Optional[str] = None,
+    report_status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    near: Optional[tuple] = None
+):
+    """
+    Build a full-text search over reports.search_vector (GIN indexed) with
+    optional filters, ordered by relevance or recency and keyset-paginated.
+    near is a (latitude, longitude, radius_km) tuple.
+    """
+    args = [text]
+    conditions = ["r.search_vector @@ query", "r.duplicate_of IS NULL"]
+    
+    for column, value in (("category", category), ("status", report_status)):
+        if value is not None:
+            args.append(value)
+            conditions.append(f"r.{column} = ${len(args)}")
+    
+    if since is not None:
+        args.append(since)
+        conditions.append(f"r.created_at >= ${len(args)}")
+    if until is not None:
+        args.append(until)
+        conditions.append(f"r.created_at < ${len(args)}")
+    
+    if near is not None:
+        latitude, longitude, radius_km = near
+        min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_km)
+        args.extend([latitude, longitude, radius_km, min_lat, max_lat, min_lon, max_lon])
+        lat, lon, radius, lo_lat, hi_lat, lo_lon, hi_lon = range(len(args) - 6, len(args) + 1)
+        conditions.append(f"""
+            r.latitude::float8 BETWEEN ${lo_lat}::float8 AND ${hi_lat}::float8
+            AND r.longitude::float8 BETWEEN ${lo_lon}::float8 AND ${hi_lon}::float8
+            AND 6371 * acos(LEAST(1.0, cos(radians(${lat})) * cos(radians(r.latitude))
+                * cos(radians(r.longitude) - radians(${lon}))
+                + sin(radians(${lat})) * sin(radians(r.latitude)))) <= ${radius}
+        """)
+    
+    # Relevance pages continue after the last (rank, id); recency pages after (created_at, id)
+    outer = ""
+    if sort == "relevance":
+        order = "rank DESC, id DESC"
+        if cursor:
+            args.extend(decode_rank_cursor(cursor))
+            outer = f"WHERE (rank, id) < (${len(args) - 1}::real, ${len(args)})"
+    else:
+        order = "created_at DESC, id DESC"
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            args.extend([created_at, last_id])
+            ts, rid = len(args) - 1, len(args)
+            conditions.append(f"r.created_at <= ${ts} AND (r.created_at < ${ts} OR r.id < ${rid})")
+    
+    args.append(limit)
+    query = f"""
+        SELECT * FROM (
+            SELECT {REPORT_COLUMNS}, ts_rank_cd(r.search_vector, query) AS rank
+            FROM reports r
+            CROSS JOIN websearch_to_tsquery('{SEARCH_CONFIG}', $1) AS query
+            WHERE {' AND '.join(conditions)}
+        ) matches
+        {outer}
+        ORDER BY {order}
+        LIMIT ${len(args)}
+    """
+    
+    return query, args
+
+async def stream_reports(query: str, args: list):
+    """Yield reports as NDJSON lines, reading rows from a server-side cursor in batches"""
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        # asyncpg cursors only live inside a transaction
+        async with connection.transaction(readonly=True):
+            async for report in connection.cursor(query, *args, prefetch=STREAM_BATCH_SIZE):
+                yield encode_report_line(report)
+
+async def list_reports(
+    cursor: Optional[str],
+    limit: int,
+    stream: bool,
+    if_none_match: Optional[str],
+    user_id: Optional[int] = None
+):
+    """Serve one keyset page of reports, or every row after the cursor as NDJSON"""
+    try:
+        query, args = build_reports_page_query(cursor, None if stream else limit, user_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        # Read the version before the rows, so a tag is never newer than its data
+        version = await fetch_data_version(connection)
+        etag = weak_etag("reports", version, user_id if user_id is not None else "all")
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        if stream:
+            return StreamingResponse(
+                stream_reports(query, args),
+                media_type="application/x-ndjson",
+                headers=cache_headers(etag)
+            )
+        
+        reports = await connection.fetch(query, *args)
+    
+    # A full page means there may be more rows after the last one
+    headers = cache_headers(etag)
+    if len(reports) == limit:
+        last = reports[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
+    
+    return RecordJSONResponse(encode_reports(reports), headers=headers)
+
 @reports_router.post("/upload", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
 async def create_report(
+    background_tasks: BackgroundTasks,
     text: str = Form(...),
     latitude: Optional[float] = Form(None),
     longitude: Optional[float] = Form(None),
     category: str = Form(...),
     image: Optional[UploadFile] = File(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(admitted_user)
 ):
     """Create a new civic issue report with optional image upload"""
     
     image_url = None
+    image_path = None
     
     # Handle image upload if provided
     if image:
-        # Validate file type
-        if not image.content_type or not image.content_type.startswith('image/'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Only image files are allowed"
-            )
-        
-        # Validate file size (max 10MB for mobile uploads)
-        max_size = 10 * 1024 * 1024  # 10MB
-        content = await image.read()
-        if len(content) > max_size:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Image file too large. Maximum size is 10MB"
-            )
+        # Validate type from the file's magic bytes and size (max 10MB for mobile
+        # uploads) without loading the spooled upload into memory
+        content_type, size = await validate_image_upload(image)
         
-        # Read file content
+        # Stream the spooled file to storage in chunks
         try:
             image_url = await upload_file(
-                content, 
-                image.filename or "image.jpg", 
-                image.content_type
+                image.file,
+                f"image.{IMAGE_EXTENSIONS[content_type]}",
+                content_type,
+                size=size
             )
             
             if not image_url:
@@ -89,106 +533,288 @@ async def create_report(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Image upload failed: {str(e)}"
             )
+        
+        # Keep a copy for the thumbnail pipeline, which runs after the response
+        image_path = await save_for_processing(image.file)
+    
+    # Index geolocated reports by geohash for spatial lookups
+    geohash = None
+    if latitude is not None and longitude is not None:
+        geohash = encode_geohash(latitude, longitude)
+    
+    [(text_minhash, text_bands)] = await sign_texts([text])
     
     # Save report to database
     db_pool = await get_db()
     
     async with db_pool.acquire() as connection:
         try:
-            report = await connection.fetchrow("""
-                INSERT INTO reports (user_id, text, latitude, longitude, image_url, category, status)
-                VALUES ($1, $2, $3, $4, $5, $6, 'pending')
-                RETURNING id, user_id, text, latitude, longitude, image_url, category, status, created_at
-            """, 
-                current_user["id"],
-                text,
-                latitude,
-                longitude,
-                image_url,
-                category
-            )
+            async def insert():
+                async with connection.transaction():
+                    # Link likely repeats of a nearby report to it instead of
+                    # listing them as independent reports
+                    canonical_id = None
+                    if geohash:
+                        canonical_id = await find_canonical(
+                            connection, text_minhash, text_bands, category, latitude, longitude
+                        )
+                    
+                    report = await connection.fetchrow("""
+                        INSERT INTO reports (
+                            user_id, text, latitude, longitude, image_url, category, status, geohash,
+                            text_minhash, text_bands, duplicate_of, username
+                        )
+                        VALUES ($1, $2, $3, $4, $5, $6, 'pending', $7, $8, $9, $10, $11)
+                        RETURNING id, user_id, username, text, latitude::float8 AS latitude, longitude::float8 AS longitude,
+                                  image_url, thumbnail_url, medium_url, category, status, created_at, geohash,
+                                  duplicate_of, duplicate_count
+                    """, 
+                        current_user["id"],
+                        text,
+                        latitude,
+                        longitude,
+                        image_url,
+                        category,
+                        geohash,
+                        text_minhash,
+                        text_bands,
+                        canonical_id,
+                        current_user["username"]
+                    )
+                    
+                    if canonical_id is not None:
+                        await link_duplicate(connection, canonical_id)
+                    
+                    await record_reports_created(connection, [report])
+                return report
+            
+            report = await retry_on_missing_partition(connection, insert)
+            
+            await bump_data_version(connection)
+            
+            if image_path:
+                background_tasks.add_task(process_report_image, report["id"], report["created_at"], image_path)
             
-            return ReportResponse(
-                id=report["id"],
-                user_id=report["user_id"],
-                username=current_user["username"],
-                text=report["text"],
-                latitude=float(report["latitude"]) if report["latitude"] else None,
-                longitude=float(report["longitude"]) if report["longitude"] else None,
-                image_url=report["image_url"],
-                category=report["category"],
-                status=report["status"],
-                created_at=report["created_at"]
+            return RecordJSONResponse(
+                report_payload(report),
+                status_code=status.HTTP_201_CREATED
             )
             
         except Exception as e:
+            if image_path:
+                discard(image_path)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to create report: {str(e)}"
             )
 
+@reports_router.post("/batch", response_model=BatchReportResponse)
+async def create_reports_batch(
+    batch: BatchReportRequest,
+    current_user: dict = Depends(admitted_user)
+):
+    """
+    Create many reports at once (offline mobile sync). Items are keyed by a
+    client-generated client_id, so replaying a batch never creates duplicates.
+    """
+    
+    items = batch.items
+    if not items or len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch must contain between 1 and {MAX_BATCH_SIZE} reports"
+        )
+    
+    if sum(len(item.text) for item in items) > MAX_BATCH_TEXT_CHARS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {MAX_BATCH_TEXT_CHARS} characters of report text"
+        )
+    
+    client_ids = [item.client_id for item in items]
+    if len(set(client_ids)) != len(client_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Duplicate client_id in batch"
+        )
+    
+    geohashes = [
+        encode_geohash(item.latitude, item.longitude)
+        if item.latitude is not None and item.longitude is not None else None
+        for item in items
+    ]
+    
+    # Signatures travel as array literals, since unnest() would flatten a 2-D array;
+    # batch items are stored as canonical but can be matched by later submissions
+    signatures = await sign_texts([item.text for item in items])
+    minhash_literals = ["{" + ",".join(map(str, minhash)) + "}" for minhash, _ in signatures]
+    band_literals = ["{" + ",".join(map(str, bands)) + "}" for _, bands in signatures]
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        async def insert():
+            async with connection.transaction():
+                # One set-based insert; rows already submitted under the same
+                # (user_id, client_id) are skipped. Client ids are claimed in
+                # report_client_ids, as the partitioned reports table can't hold
+                # a unique index on them.
+                created = await connection.fetch("""
+                    WITH item AS (
+                        SELECT * FROM unnest($2::text[], $3::text[], $4::float8[], $5::float8[], $6::text[],
+                                             $7::text[], $8::text[], $9::text[])
+                            AS item(client_id, text, latitude, longitude, category, geohash, text_minhash, text_bands)
+                    ),
+                    claimed AS (
+                        INSERT INTO report_client_ids (user_id, client_id)
+                        SELECT $1, client_id FROM item
+                        ON CONFLICT DO NOTHING
+                        RETURNING client_id
+                    )
+                    INSERT INTO reports (
+                        user_id, client_id, text, latitude, longitude, category, status, geohash,
+                        text_minhash, text_bands, username
+                    )
+                    SELECT $1, item.client_id, item.text, item.latitude, item.longitude, item.category, 'pending',
+                           item.geohash, item.text_minhash::bigint[], item.text_bands::bigint[], $10
+                    FROM item
+                    JOIN claimed ON claimed.client_id = item.client_id
+                    RETURNING id, user_id, username, client_id, text, latitude::float8 AS latitude, longitude::float8 AS longitude,
+                              image_url, thumbnail_url, medium_url, category, status, created_at, geohash,
+                              duplicate_of, duplicate_count
+                """,
+                    current_user["id"],
+                    client_ids,
+                    [item.text for item in items],
+                    [item.latitude for item in items],
+                    [item.longitude for item in items],
+                    [item.category for item in items],
+                    geohashes,
+                    minhash_literals,
+                    band_literals,
+                    current_user["username"]
+                )
+                
+                await record_reports_created(connection, created)
+                
+                # Items whose client_id was already claimed were stored by an earlier submission
+                created_ids = {report["client_id"] for report in created}
+                duplicate_ids = [client_id for client_id in client_ids if client_id not in created_ids]
+                existing = []
+                if duplicate_ids:
+                    existing = await connection.fetch(EXISTING_CLIENT_IDS_QUERY, current_user["id"], duplicate_ids)
+            return created, existing
+        
+        created, existing = await retry_on_missing_partition(connection, insert)
+        created_ids = {report["client_id"] for report in created}
+        
+        if created:
+            await bump_data_version(connection)
+    
+    reports_by_client_id = {report["client_id"]: report for report in [*created, *existing]}
+    
+    return RecordJSONResponse({"results": [
+        {
+            "client_id": client_id,
+            "status": "created" if client_id in created_ids else "duplicate",
+            "report": report_payload(reports_by_client_id[client_id])
+        }
+        for client_id in client_ids
+    ]})
+
 @reports_router.post("/nearby", response_model=List[ReportResponse])
 async def get_nearby_reports(
     request: NearbyReportsRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(admitted_user)
 ):
     """Get reports within a specified radius (for mobile map view)"""
     
+    radius_km = request.radius_km if request.radius_km is not None else 5.0
+    query, args = build_nearby_query(request.latitude, request.longitude, radius_km)
+    
     db_pool = await get_db()
     
     async with db_pool.acquire() as connection:
-        # Using Haversine formula for distance calculation
-        reports = await connection.fetch("""
-            SELECT r.*, u.username,
-                   (6371 * acos(cos(radians($1)) * cos(radians(r.latitude)) 
-                   * cos(radians(r.longitude) - radians($2)) 
-                   + sin(radians($1)) * sin(radians(r.latitude)))) AS distance
-            FROM reports r
-            JOIN users u ON r.user_id = u.id
-            WHERE r.latitude IS NOT NULL AND r.longitude IS NOT NULL
-            HAVING distance <= $3
-            ORDER BY distance, r.created_at DESC
-            LIMIT 50
-        """, request.latitude, request.longitude, request.radius_km)
+        reports = await connection.fetch(query, *args)
         
-        return [
-            ReportResponse(
-                id=report["id"],
-                user_id=report["user_id"],
-                username=report["username"],
-                text=report["text"],
-                latitude=float(report["latitude"]) if report["latitude"] else None,
-                longitude=float(report["longitude"]) if report["longitude"] else None,
-                image_url=report["image_url"],
-                category=report["category"],
-                status=report["status"],
-                created_at=report["created_at"]
-            )
-            for report in reports
-        ]
+        return RecordJSONResponse(encode_reports(reports))
 
 @reports_router.get("/stats", response_model=ReportStats)
-async def get_report_stats(current_user: dict = Depends(get_current_user)):
+async def get_report_stats(
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(admitted_user)
+):
     """Get report statistics for dashboard"""
     
     db_pool = await get_db()
     
     async with db_pool.acquire() as connection:
-        stats = await connection.fetchrow("""
-            SELECT 
-                COUNT(*) as total_reports,
-                COUNT(*) FILTER (WHERE status = 'pending') as pending_reports,
-                COUNT(*) FILTER (WHERE status = 'resolved') as resolved_reports,
-                COUNT(*) FILTER (WHERE user_id = $1) as user_reports
-            FROM reports
-        """, current_user["id"])
+        version = await fetch_data_version(connection)
+        etag = weak_etag("stats", version, current_user["id"])
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
         
-        return ReportStats(
-            total_reports=stats["total_reports"],
-            pending_reports=stats["pending_reports"],
-            resolved_reports=stats["resolved_reports"],
-            user_reports=stats["user_reports"]
+        # Served from the incrementally maintained counters, not a table scan
+        stats = await counters.fetch_stats(connection, current_user["id"])
+        
+        return RecordJSONResponse(stats, headers=cache_headers(etag))
+
+@reports_router.get("/search", response_model=List[ReportResponse])
+async def search_reports(
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms (web search syntax)"),
+    category: Optional[str] = Query(None),
+    report_status: Optional[str] = Query(None, alias="status"),
+    since: Optional[datetime] = Query(None, description="Only reports created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only reports created before this time"),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    sort: str = Query("relevance", pattern="^(relevance|recent)$"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous X-Next-Cursor header"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(admitted_user)
+):
+    """Search report text, best matches (or newest) first, one page at a time"""
+    
+    location = (latitude, longitude, radius_km)
+    near = None
+    if any(value is not None for value in location):
+        if any(value is None for value in location):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="latitude, longitude and radius_km must be given together"
+            )
+        near = location
+    
+    try:
+        query, args = build_search_query(
+            q, sort, cursor, limit,
+            category=category,
+            report_status=report_status,
+            since=since,
+            until=until,
+            near=near
         )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        reports = await connection.fetch(query, *args)
+    
+    headers = {}
+    if len(reports) == limit:
+        last = reports[-1]
+        if sort == "relevance":
+            headers["X-Next-Cursor"] = encode_rank_cursor(last["rank"], last["id"])
+        else:
+            headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
+    
+    return RecordJSONResponse(encode_reports(reports), headers=headers)
 
 @reports_router.get("/categories")
 async def get_categories():
@@ -205,79 +831,160 @@ async def get_categories():
     }
 
 @reports_router.get("/my", response_model=List[ReportResponse])
-async def get_my_reports(current_user: dict = Depends(get_current_user)):
-    """Get all reports for the current user"""
+async def get_my_reports(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous X-Next-Cursor header"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream all remaining rows as NDJSON"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(admitted_user)
+):
+    """Get the current user's reports, newest first, one page at a time"""
+    return await list_reports(cursor, limit, stream, if_none_match, user_id=current_user["id"])
+
+@reports_router.get("/all", response_model=List[ReportResponse])
+async def get_all_reports(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous X-Next-Cursor header"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream all remaining rows as NDJSON"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(admitted_user)
+):
+    """Get all reports (admin/test endpoint), newest first, one page at a time"""
+    return await list_reports(cursor, limit, stream, if_none_match)
+
+@reports_router.get("/clusters", response_model=ClusterResponse)
+async def get_report_clusters(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=22),
+    current_user: dict = Depends(admitted_user)
+):
+    """Get aggregated report clusters for a map viewport (for zoomed-out map views)"""
+    
+    if min_lat > max_lat:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_lat must not be greater than max_lat"
+        )
+    
+    # A viewport crossing the antimeridian is covered as two boxes
+    if min_lon <= max_lon:
+        boxes = [(min_lat, min_lon, max_lat, max_lon)]
+    else:
+        boxes = [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+    
+    # Use the zoom's precision unless the viewport would need too many cells;
+    # single-character cells always fit, so a covering is always found
+    max_cells = MAX_VIEWPORT_CELLS // len(boxes)
+    coverings = [
+        covering_cells(*box, max_cells=max_cells, max_precision=zoom_to_precision(zoom))
+        for box in boxes
+    ]
+    precision = min(len(covering[0]) for covering in coverings)
+    cells = sorted({cell[:precision] for covering in coverings for cell in covering})
     
     db_pool = await get_db()
     
     async with db_pool.acquire() as connection:
-        reports = await connection.fetch("""
-            SELECT r.*, u.username
-            FROM reports r
-            JOIN users u ON r.user_id = u.id
-            WHERE r.user_id = $1
-            ORDER BY r.created_at DESC
-        """, current_user["id"])
+        cell_clusters = await fetch_clusters(connection, precision, cells)
         
-        return [
-            ReportResponse(
-                id=report["id"],
-                user_id=report["user_id"],
-                username=report["username"],
-                text=report["text"],
-                latitude=float(report["latitude"]) if report["latitude"] else None,
-                longitude=float(report["longitude"]) if report["longitude"] else None,
-                image_url=report["image_url"],
-                category=report["category"],
-                status=report["status"],
-                created_at=report["created_at"]
+        return ClusterResponse(
+            precision=precision,
+            clusters=[ReportCluster(**cluster) for cluster in cell_clusters]
+        )
+
+@reports_router.get("/feed")
+async def get_report_feed(
+    category: Optional[List[str]] = Query(None),
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    current_user: dict = Depends(admitted_user)
+):
+    """
+    Stream report deltas (created, status) as server-sent events, optionally
+    limited to categories and a viewport. A resync event means deltas were
+    dropped because the client fell behind; refetch the list.
+    """
+    
+    bounds = (min_lat, min_lon, max_lat, max_lon)
+    bbox = None
+    if any(bound is not None for bound in bounds):
+        if any(bound is None for bound in bounds) or min_lat > max_lat:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="An area filter needs min_lat <= max_lat, min_lon and max_lon"
             )
-            for report in reports
-        ]
+        bbox = bounds
+    
+    return StreamingResponse(
+        stream_events(categories=set(category) if category else None, bbox=bbox),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@reports_router.get("/all", response_model=List[ReportResponse])
-async def get_all_reports(current_user: dict = Depends(get_current_user)):
-    """Get all reports (admin/test endpoint)"""
+@reports_router.get("/export")
+async def export_reports(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    category: Optional[str] = Query(None),
+    report_status: Optional[str] = Query(None, alias="status"),
+    since: Optional[datetime] = Query(None, description="Only reports created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only reports created before this time"),
+    mine: bool = Query(False, description="Only the current user's reports"),
+    include_duplicates: bool = Query(False),
+    current_user: dict = Depends(admitted_user)
+):
+    """
+    Stream every matching report, oldest first, as CSV, NDJSON or Parquet.
+    Rows go from Postgres COPY to the client as they are produced, so exports
+    of any size use constant memory.
+    """
     
-    db_pool = await get_db()
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Parquet export requires pyarrow on the server"
+        )
     
-    async with db_pool.acquire() as connection:
-        reports = await connection.fetch("""
-            SELECT r.*, u.username
-            FROM reports r
-            JOIN users u ON r.user_id = u.id
-            ORDER BY r.created_at DESC
-        """)
-        
-        return [
-            ReportResponse(
-                id=report["id"],
-                user_id=report["user_id"],
-                username=report["username"],
-                text=report["text"],
-                latitude=float(report["latitude"]) if report["latitude"] else None,
-                longitude=float(report["longitude"]) if report["longitude"] else None,
-                image_url=report["image_url"],
-                category=report["category"],
-                status=report["status"],
-                created_at=report["created_at"]
-            )
-            for report in reports
-        ]
+    query, args = build_export_query(
+        category=category,
+        report_status=report_status,
+        since=since,
+        until=until,
+        user_id=current_user["id"] if mine else None,
+        include_duplicates=include_duplicates
+    )
+    filename = f"reports-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.{format}"
+    
+    return StreamingResponse(
+        EXPORT_STREAMS[format](query, args),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @reports_router.get("/{report_id}", response_model=ReportResponse)
-async def get_report(report_id: int, current_user: dict = Depends(get_current_user)):
+async def get_report(
+    report_id: int,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(admitted_user)
+):
     """Get a specific report by ID"""
     
     db_pool = await get_db()
     
     async with db_pool.acquire() as connection:
-        report = await connection.fetchrow("""
-            SELECT r.*, u.username
-            FROM reports r
-            JOIN users u ON r.user_id = u.id
-            WHERE r.id = $1
-        """, report_id)
+        # Revalidation only needs the row version, read by primary key
+        if if_none_match:
+            row_version = await connection.fetchval(REPORT_VERSION_QUERY, report_id)
+            if row_version is not None:
+                etag = weak_etag("report", report_id, row_version)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+        
+        report = await connection.fetchrow(REPORT_BY_ID_QUERY, report_id)
         
         if not report:
             raise HTTPException(
@@ -285,62 +992,174 @@ async def get_report(report_id: int, current_user: dict = Depends(get_current_us
                 detail="Report not found"
             )
         
-        return ReportResponse(
-            id=report["id"],
-            user_id=report["user_id"],
-            username=report["username"],
-            text=report["text"],
-            latitude=float(report["latitude"]) if report["latitude"] else None,
-            longitude=float(report["longitude"]) if report["longitude"] else None,
-            image_url=report["image_url"],
-            category=report["category"],
-            status=report["status"],
-            created_at=report["created_at"]
+        etag = weak_etag("report", report_id, report["row_version"])
+        return RecordJSONResponse(report_payload(report), headers=cache_headers(etag))
+
+@reports_router.put("/status", response_model=BulkStatusResponse)
+async def update_report_statuses(
+    update: BulkStatusUpdate,
+    current_user: dict = Depends(admitted_user)
+):
+    """
+    Set the status of many reports at once, given by report_ids or by a filter.
+    A filter changes up to MAX_BULK_STATUS_SIZE reports per call; repeat while
+    has_more is true.
+    """
+    
+    if update.status not in VALID_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"
         )
+    
+    if (update.report_ids is None) == (update.filter is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either report_ids or filter"
+        )
+    
+    if update.report_ids is not None and not 1 <= len(update.report_ids) <= MAX_BULK_STATUS_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"report_ids must contain between 1 and {MAX_BULK_STATUS_SIZE} ids"
+        )
+    
+    query, args = build_status_update_query(
+        update.status,
+        current_user["id"],
+        report_ids=update.report_ids,
+        filters=update.filter
+    )
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        results = await apply_status_update(connection, query, args)
+    
+    updated = sum(1 for row in results if row["outcome"] == "updated")
+    
+    return BulkStatusResponse(
+        status=update.status,
+        updated=updated,
+        has_more=update.filter is not None and len(results) == MAX_BULK_STATUS_SIZE,
+        results=[BulkStatusResult(id=row["id"], outcome=row["outcome"]) for row in results]
+    )
 
 @reports_router.put("/{report_id}/status")
 async def update_report_status(
     report_id: int,
     status_update: str = Form(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(admitted_user)
 ):
     """Update report status (for admin users or report owners)"""
     
-    valid_statuses = ["pending", "in_progress", "resolved", "rejected"]
-    if status_update not in valid_statuses:
+    if status_update not in VALID_STATUSES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"
         )
     
+    # For now, allow users to update their own reports
+    # In production, you might want admin-only access
+    query, args = build_status_update_query(status_update, current_user["id"], report_ids=[report_id])
+    
     db_pool = await get_db()
     
     async with db_pool.acquire() as connection:
-        # Check if report exists and user has permission
-        report = await connection.fetchrow(
-            "SELECT id, user_id FROM reports WHERE id = $1",
-            report_id
+        # Permission check and update in a single round trip
+        result = (await apply_status_update(connection, query, args))[0]
+    
+    if result["outcome"] == "not_found":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report not found"
         )
-        
-        if not report:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Report not found"
-            )
-        
-        # For now, allow users to update their own reports
-        # In production, you might want admin-only access
-        if report["user_id"] != current_user["id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to update this report"
-            )
-        
-        # Update status
-        await connection.execute(
-            "UPDATE reports SET status = $1 WHERE id = $2",
-            status_update,
-            report_id
+    
+    if result["outcome"] == "forbidden":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to update this report"
         )
-        
-        return {"message": "Report status updated successfully", "status": status_update}
\ No newline at end of file
+    
+    return {"message": "Report status updated successfully", "status": status_update}
+
+
+# Analytics read only the rollup tables, so their cost depends on the window
+# and the number of areas, never on the number of reports
+
+AREA_PATTERN = f"^[0-9b-hjkmnp-z]{{1,{analytics.AREA_PRECISION}}}$"
+
+async def analytics_window(connection: asyncpg.Connection, since: Optional[date], until: Optional[date]):
+    """
+    Resolve an analytics date range, defaulting to the last 30 days. Today is
+    the database's date, which the rollups are bucketed on.
+    """
+    until = until or await connection.fetchval("SELECT LOCALTIMESTAMP::date")
+    since = since or until - timedelta(days=29)
+    if since > until or (until - since).days >= analytics.MAX_ANALYTICS_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"since must not be after until, and the range may span at most {analytics.MAX_ANALYTICS_DAYS} days"
+        )
+    return since, until
+
+@analytics_router.get("/daily", response_model=List[DailyTrend])
+async def get_daily_trends(
+    since: Optional[date] = Query(None, description="First day (default 30 days ago)"),
+    until: Optional[date] = Query(None, description="Last day (default today)"),
+    category: Optional[str] = Query(None),
+    area: Optional[str] = Query(None, pattern=AREA_PATTERN, description="Geohash prefix of an area"),
+    current_user: dict = Depends(admitted_user)
+):
+    """Reports created and resolved per day and category"""
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        since, until = await analytics_window(connection, since, until)
+        return await analytics.fetch_daily(connection, since, until, category=category, area=area)
+
+@analytics_router.get("/resolution", response_model=List[AreaResolution])
+async def get_resolution_by_area(
+    since: Optional[date] = Query(None, description="First day (default 30 days ago)"),
+    until: Optional[date] = Query(None, description="Last day (default today)"),
+    category: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=analytics.MAX_ANALYTICS_AREAS),
+    current_user: dict = Depends(admitted_user)
+):
+    """Resolved reports and mean time to resolution per area, busiest areas first"""
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        since, until = await analytics_window(connection, since, until)
+        return await analytics.fetch_resolution_by_area(connection, since, until, category=category, limit=limit)
+
+@analytics_router.get("/backlog", response_model=List[AreaBacklog])
+async def get_backlog_by_area(
+    category: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=analytics.MAX_ANALYTICS_AREAS),
+    current_user: dict = Depends(admitted_user)
+):
+    """Open (pending or in progress) reports per area, largest backlogs first"""
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        return await analytics.fetch_backlog_by_area(connection, category=category, limit=limit)
+
+@analytics_router.get("/backlog/trend", response_model=List[BacklogPoint])
+async def get_backlog_trend(
+    since: Optional[date] = Query(None, description="First day (default 30 days ago)"),
+    until: Optional[date] = Query(None, description="Last day (default today)"),
+    category: Optional[str] = Query(None),
+    area: Optional[str] = Query(None, pattern=AREA_PATTERN, description="Geohash prefix of an area"),
+    current_user: dict = Depends(admitted_user)
+):
+    """Open backlog at the end of each day"""
+    
+    db_pool = await get_db()
+    
+    async with db_pool.acquire() as connection:
+        since, until = await analytics_window(connection, since, until)
+        return await analytics.fetch_backlog_trend(connection, since, until, category=category, area=area)
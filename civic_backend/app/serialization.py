@@ -0,0 +1,58 @@
+from decimal import Decimal
+from operator import itemgetter
+from typing import Any, Iterable
+import orjson
+from fastapi.responses import Response
+
+# Fields of a report as returned by the API (the ReportResponse schema)
+REPORT_FIELDS = (
+    "id", "user_id", "username", "text", "latitude", "longitude",
+    "image_url", "thumbnail_url", "medium_url", "category", "status", "created_at",
+    "duplicate_of", "duplicate_count"
+)
+
+# SELECT list producing exactly REPORT_FIELDS from `reports r` (the author's
+# username is denormalized onto reports). Coordinates are cast in SQL so rows
+# never carry Decimals to Python.
+REPORT_COLUMNS = """
+    r.id, r.user_id, r.username, r.text,
+    r.latitude::float8 AS latitude, r.longitude::float8 AS longitude,
+    r.image_url, r.thumbnail_url, r.medium_url, r.category, r.status, r.created_at,
+    r.duplicate_of, r.duplicate_count
+"""
+
+_report_values = itemgetter(*REPORT_FIELDS)
+
+def _default(value: Any):
+    """Serialize types orjson doesn't handle natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes"""
+    return orjson.dumps(content, default=_default)
+
+def report_payload(record) -> dict:
+    """Pick the API fields from a reports row"""
+    return dict(zip(REPORT_FIELDS, _report_values(record)))
+
+def encode_reports(records: Iterable) -> bytes:
+    """Serialize report rows to a JSON array in one pass"""
+    return dumps([dict(zip(REPORT_FIELDS, _report_values(record))) for record in records])
+
+def encode_report_line(record) -> bytes:
+    """Serialize one report row as an NDJSON line"""
+    return dumps(dict(zip(REPORT_FIELDS, _report_values(record)))) + b"\n"
+
+class RecordJSONResponse(Response):
+    """
+    JSON response for trusted database output. Returning it from an endpoint
+    skips response_model validation; pre-encoded bytes are sent as-is.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,125 @@
+import builtins
+import importlib.util
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Set STARTUP_PROFILE=1 to time every module imported while the app loads
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+
+# Modules listed in the profile report
+STARTUP_PROFILE_TOP = 15
+
+class ImportProfiler:
+    """
+    Times first-time module imports by wrapping builtins.__import__.
+    Records (cumulative, self) seconds per module, where self time excludes
+    nested imports.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self._stack: List[float] = []
+        self._original = None
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level:
+            package = (globals or {}).get("__package__") or ""
+            try:
+                resolved = importlib.util.resolve_name("." * level + name, package)
+            except (ImportError, ValueError):
+                resolved = name
+        else:
+            resolved = name
+
+        # `from package import module` loads submodules without a nested __import__
+        candidates = [resolved, *(f"{resolved}.{item}" for item in fromlist or () if item != "*")]
+        new = [module for module in candidates if module not in sys.modules]
+        if not new:
+            return self._original(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            # Names in fromlist may be attributes rather than modules
+            loaded = [module for module in new if module in sys.modules]
+            if loaded:
+                self.timings.setdefault(", ".join(loaded), (elapsed, elapsed - nested))
+
+    def slowest(self, count: int = STARTUP_PROFILE_TOP) -> List[Tuple[str, float, float]]:
+        """Return (module, cumulative, self) for the modules with the most self time"""
+        ranked = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        return [(name, cumulative, own) for name, (cumulative, own) in ranked[:count]]
+
+class StartupReport:
+    """Collects import and lifespan phase timings and logs them once startup finishes"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imported: Optional[float] = None
+        self.phases: List[Tuple[str, float]] = []
+        self.profiler: Optional[ImportProfiler] = None
+
+    def mark_imported(self):
+        """Record the end of application import"""
+        if self.imported is None:
+            self.imported = time.perf_counter() - self.started
+        if self.profiler:
+            self.profiler.uninstall()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time one step of the lifespan startup"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def summary(self) -> dict:
+        return {
+            "import_ms": round((self.imported or 0) * 1000, 1),
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+            "total_ms": round(((self.imported or 0) + sum(s for _, s in self.phases)) * 1000, 1)
+        }
+
+    def log(self):
+        summary = self.summary()
+        phases = ", ".join(f"{name} {ms:.0f} ms" for name, ms in summary["phases_ms"].items())
+        logger.info(
+            f"Startup took {summary['total_ms']:.0f} ms: "
+            f"import {summary['import_ms']:.0f} ms, {phases}"
+        )
+        if self.profiler:
+            lines = [
+                f"  {cumulative * 1000:8.1f} ms {own * 1000:8.1f} ms  {name}"
+                for name, cumulative, own in self.profiler.slowest()
+            ]
+            logger.info("Slowest imports (cumulative, self):\n" + "\n".join(lines))
+
+startup_report = StartupReport()
+
+if STARTUP_PROFILE:
+    startup_report.profiler = ImportProfiler()
+    startup_report.profiler.install()
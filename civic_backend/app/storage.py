@@ -1,74 +1,238 @@
 import os
-from supabase import create_client, Client
-from typing import Optional
+import asyncio
+import logging
+import io
+import shutil
 import uuid
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Storage configuration
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+BUCKET_NAME = "reports"
+
 # Supabase configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-BUCKET_NAME = "reports"
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+# Local filesystem configuration (public URLs are LOCAL_STORAGE_URL/<file>)
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "media")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/media")
+
+# Bytes read per chunk when streaming files to a backend
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def unique_filename(filename: str) -> str:
+    """Generate a collision-free object name keeping the original extension"""
+    file_extension = filename.split('.')[-1] if '.' in filename else 'jpg'
+    return f"{uuid.uuid4()}.{file_extension}"
+
+async def iter_file(source: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield a file's contents in chunks, reading off the event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, source.read, chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+class StorageBackend(ABC):
+    """Interface for report image storage"""
+
+    @abstractmethod
+    async def upload(self, source: BinaryIO, size: int, path: str, content_type: str) -> str:
+        """Stream size bytes from source to path and return its public URL (raises on failure)"""
+
+    @abstractmethod
+    async def delete(self, path: str) -> bool:
+        """Delete the object at path, returning whether it was removed"""
+
+    async def initialize_bucket(self):
+        """Create the bucket/container if it doesn't exist"""
+
+    async def close(self):
+        """Release any resources held by the backend"""
+
+class SupabaseStorage(StorageBackend):
+    """Supabase Storage over its REST API, using a pooled async HTTP client"""
+
+    def __init__(self, url: str, key: str, bucket: str = BUCKET_NAME):
+        # Imported here so other backends (and app startup) don't pay for the HTTP stack
+        import httpx
+        
+        self.url = url.rstrip("/")
+        self.bucket = bucket
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.url}/storage/v1",
+            headers={"Authorization": f"Bearer {key}", "apikey": key},
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+
+    def public_url(self, path: str) -> str:
+        """Return the public URL of an object in the bucket"""
+        return f"{self.url}/storage/v1/object/public/{self.bucket}/{path}"
+
+    async def upload(self, source: BinaryIO, size: int, path: str, content_type: str) -> str:
+        # A known Content-Length lets httpx stream the body without chunked encoding
+        response = await self.client.post(
+            f"/object/{self.bucket}/{path}",
+            content=iter_file(source),
+            headers={
+                "Content-Type": content_type,
+                "Content-Length": str(size),
+                "x-upsert": "false"
+            }
+        )
+        response.raise_for_status()
+        return self.public_url(path)
+
+    async def delete(self, path: str) -> bool:
+        response = await self.client.request(
+            "DELETE",
+            f"/object/{self.bucket}",
+            json={"prefixes": [path]}
+        )
+        return response.is_success
+
+    async def initialize_bucket(self):
+        response = await self.client.post(
+            "/bucket",
+            json={"id": self.bucket, "name": self.bucket, "public": True}
+        )
+        if response.is_success:
+            logger.info(f"Bucket '{self.bucket}' created successfully")
+        else:
+            # Bucket likely already exists
+            logger.info(f"Bucket '{self.bucket}' already exists or creation failed")
+
+    async def close(self):
+        await self.client.aclose()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+class LocalStorage(StorageBackend):
+    """Files in a local directory, served by the app under LOCAL_STORAGE_URL"""
 
-async def upload_file(content: bytes, filename: str, content_type: str = "image/jpeg") -> Optional[str]:
+    def __init__(self, directory: str = LOCAL_STORAGE_DIR, base_url: str = LOCAL_STORAGE_URL):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        # The static file mount expects the directory to exist
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _write(self, source: BinaryIO, path: str):
+        with open(os.path.join(self.directory, path), "xb") as f:
+            shutil.copyfileobj(source, f, STREAM_CHUNK_SIZE)
+
+    async def upload(self, source: BinaryIO, size: int, path: str, content_type: str) -> str:
+        # Keep disk I/O off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, source, path)
+        return f"{self.base_url}/{path}"
+
+    async def delete(self, path: str) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, os.remove, os.path.join(self.directory, path))
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def initialize_bucket(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+class MemoryStorage(StorageBackend):
+    """In-process storage for tests and benchmarks"""
+
+    def __init__(self, bucket: str = BUCKET_NAME):
+        self.bucket = bucket
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+
+    async def upload(self, source: BinaryIO, size: int, path: str, content_type: str) -> str:
+        self.objects[path] = (source.read(), content_type)
+        return f"memory://{self.bucket}/{path}"
+
+    async def delete(self, path: str) -> bool:
+        return self.objects.pop(path, None) is not None
+
+# Active storage backend, created in the application lifespan
+storage_backend: Optional[StorageBackend] = None
+
+def create_storage(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """Build the storage backend selected by configuration"""
+    if name == "supabase":
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        return SupabaseStorage(SUPABASE_URL, SUPABASE_KEY)
+    if name == "local":
+        return LocalStorage()
+    if name == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+
+def local_storage_mount_path() -> Optional[str]:
+    """Return the URL path local files are served from, if the local backend is selected"""
+    if STORAGE_BACKEND != "local":
+        return None
+    return urlparse(LOCAL_STORAGE_URL).path.rstrip("/") or "/media"
+
+async def init_storage():
+    """Create the configured storage backend"""
+    global storage_backend
+    storage_backend = create_storage()
+    logger.info(f"Storage backend '{STORAGE_BACKEND}' initialized")
+
+def get_storage() -> StorageBackend:
+    """Get the active storage backend"""
+    if not storage_backend:
+        raise RuntimeError("Storage backend not initialized")
+    return storage_backend
+
+async def close_storage():
+    """Close the storage backend"""
+    global storage_backend
+    if storage_backend:
+        await storage_backend.close()
+        storage_backend = None
+        logger.info("Storage backend closed")
+
+async def upload_file(
+    content: Union[bytes, BinaryIO],
+    filename: str,
+    content_type: str = "image/jpeg",
+    size: Optional[int] = None
+) -> Optional[str]:
     """
-    Upload file to Supabase storage bucket
+    Upload file to the storage backend, streaming file objects in chunks
     Returns public URL if successful, None if failed
     """
+    if isinstance(content, bytes):
+        content, size = io.BytesIO(content), len(content)
+    
     try:
-        # Generate unique filename
-        file_extension = filename.split('.')[-1] if '.' in filename else 'jpg'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        
-        # Upload file to bucket
-        result = supabase.storage.from_(BUCKET_NAME).upload(
-            path=unique_filename,
-            file=content,
-            file_options={
-                "content-type": content_type,
-                "upsert": "false"
-            }
-        )
-        
-        if result.error:
-            print(f"Upload error: {result.error}")
-            return None
-        
-        # Get public URL
-        public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(unique_filename)
-        return public_url
-        
+        return await get_storage().upload(content, size, unique_filename(filename), content_type)
     except Exception as e:
-        print(f"Storage upload error: {e}")
+        logger.error(f"Storage upload error: {e}")
         return None
 
-def delete_file(file_path: str) -> bool:
+async def delete_file(file_path: str) -> bool:
     """
-    Delete file from Supabase storage bucket
+    Delete file from the storage backend
     Returns True if successful, False if failed
     """
     try:
-        result = supabase.storage.from_(BUCKET_NAME).remove([file_path])
-        return not result.error
+        return await get_storage().delete(file_path)
     except Exception as e:
-        print(f"Storage delete error: {e}")
+        logger.error(f"Storage delete error: {e}")
         return False
 
 async def initialize_bucket():
     """Initialize storage bucket if it doesn't exist"""
     try:
-        # Try to create bucket (will fail if it already exists, which is fine)
-        supabase.storage.create_bucket(
-            BUCKET_NAME,
-            options={"public": True}
-        )
-        print(f"Bucket '{BUCKET_NAME}' created successfully")
-    except Exception:
-        # Bucket likely already exists
-        print(f"Bucket '{BUCKET_NAME}' already exists or creation failed")
\ No newline at end of file
+        await get_storage().initialize_bucket()
+    except Exception as e:
+        logger.error(f"Bucket initialization failed: {e}")
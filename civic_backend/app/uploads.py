@@ -0,0 +1,123 @@
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from starlette.responses import JSONResponse
+
+# Maximum image size for mobile uploads
+MAX_IMAGE_BYTES = 10 * 1024 * 1024  # 10MB
+
+# Allowance for multipart boundaries and the text fields sent with an image
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Bytes read per chunk when streaming uploads to storage
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# File extension used for each accepted image type
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/heic": "heic",
+    "image/heif": "heif",
+}
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Identify an image format from its leading magic bytes"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[4:8] == b"ftyp":
+        brand = header[8:12]
+        if brand in (b"heic", b"heix", b"hevc", b"hevx"):
+            return "image/heic"
+        if brand in (b"mif1", b"msf1", b"heif"):
+            return "image/heif"
+    return None
+
+async def validate_image_upload(image: UploadFile, max_bytes: int = MAX_IMAGE_BYTES) -> Tuple[str, int]:
+    """
+    Check an uploaded image without reading it into memory.
+    Returns (content type sniffed from the data, size in bytes).
+    """
+    header = await image.read(16)
+    content_type = sniff_image_type(header)
+    if content_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only image files are allowed"
+        )
+
+    # The multipart parser has already spooled the file, so its size is known
+    size = image.size
+    if size is None:
+        size = await _measure(image)
+
+    if size > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image file too large. Maximum size is {max_bytes // (1024 * 1024)}MB"
+        )
+
+    await image.seek(0)
+    return content_type, size
+
+async def _measure(image: UploadFile) -> int:
+    """Find the size of a spooled upload by reading through it in chunks"""
+    await image.seek(0)
+    size = 0
+    while True:
+        chunk = await image.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return size
+        size += len(chunk)
+
+class UploadTooLarge(HTTPException):
+    """Raised while receiving a request body that exceeds its route's limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body too large. Maximum size is {limit} bytes"
+        )
+
+class UploadSizeLimitMiddleware:
+    """
+    Enforce per-path request body limits as bytes arrive, so oversized uploads
+    are rejected before they are buffered or spooled in full.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Reject up front when the client declares an oversized body
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                error = UploadTooLarge(limit)
+                response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise UploadTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,27 +1,107 @@
 import os
 import jwt
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
 from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context, built on first use (passlib and bcrypt are slow to import)
+_pwd_context = None
+
+# bcrypt runs on a bounded worker pool so it never blocks the event loop.
+# "thread" suits the bcrypt backend (it releases the GIL); "process" isolates it fully.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+_hash_executor: Optional[Executor] = None
+_hash_slots: Optional[asyncio.Semaphore] = None
+_hash_counters = {"queued": 0, "in_flight": 0, "completed": 0, "rejected": 0}
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password hashing jobs are already waiting"""
 
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "b840b5d8d6ac6f0a6557442108d0c178efbee9560cd92f5ab049df7a415fa2c3")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+def get_pwd_context():
+    """Return the bcrypt CryptContext, creating it on first use"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+async def _run_password_job(func, *args):
+    """Run a hashing function on the worker pool, capping concurrency and queue depth"""
+    global _hash_executor, _hash_slots
+    
+    if _hash_executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+        _hash_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+    
+    if _hash_counters["queued"] >= PASSWORD_HASH_MAX_QUEUE:
+        _hash_counters["rejected"] += 1
+        raise PasswordPoolBusy("Password hashing queue is full")
+    
+    _hash_counters["queued"] += 1
+    try:
+        await _hash_slots.acquire()
+    finally:
+        _hash_counters["queued"] -= 1
+    
+    _hash_counters["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_counters["in_flight"] -= 1
+        _hash_counters["completed"] += 1
+        _hash_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the worker pool"""
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the worker pool"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+def password_pool_stats() -> dict:
+    """Return worker pool size, queue depth and job counters"""
+    return {
+        "executor": PASSWORD_HASH_EXECUTOR,
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        **_hash_counters
+    }
+
+def shutdown_password_pool():
+    """Stop the password hashing workers"""
+    global _hash_executor, _hash_slots
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False)
+        _hash_executor = None
+        _hash_slots = None
 
 def create_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT token"""
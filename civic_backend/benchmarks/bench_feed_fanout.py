@@ -0,0 +1,99 @@
+"""
+Fan-out cost of the live report feed.
+
+Subscribes thousands of in-process consumers to a FeedBroker, publishes
+deltas the way the NOTIFY listener does, and reports the time spent in each
+publish call (the event loop is blocked for that long) and the publish-to-
+delivery latency seen by consumers. A fraction of consumers can be made slow
+to show that they are resynced instead of growing their queues.
+
+No database is needed:
+
+    python -m benchmarks.bench_feed_fanout --subscribers 1000 5000 10000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import orjson
+
+from app.feed import FeedBroker, RESYNC_FRAME
+from .common import CATEGORIES, percentile
+
+async def consume(subscription, latencies: list, sent_at: dict, slow: bool):
+    """Drain a subscription, recording delivery latency per event for prompt consumers"""
+    while True:
+        frame = await subscription.queue.get()
+        if frame is None:
+            return
+        if frame == RESYNC_FRAME:
+            continue
+        if slow:
+            await asyncio.sleep(0.05)
+            continue
+        event = orjson.loads(frame.split(b"data: ", 1)[1])
+        latencies.append((time.perf_counter() - sent_at[event["id"]]) * 1000)
+
+async def run(subscribers: int, events: int, rate: float, slow_fraction: float, filtered: bool):
+    broker = FeedBroker()
+    rng = random.Random(1)
+    latencies, sent_at = [], {}
+
+    consumers = []
+    for i in range(subscribers):
+        categories = {rng.choice(CATEGORIES)} if filtered else None
+        subscription = broker.subscribe(categories=categories)
+        slow = rng.random() < slow_fraction
+        consumers.append(asyncio.create_task(consume(subscription, latencies, sent_at, slow)))
+    subscriptions = list(broker.subscribers)
+
+    publish_ms = []
+    for event_id in range(events):
+        payload = orjson.dumps({
+            "type": "created",
+            "id": event_id,
+            "category": rng.choice(CATEGORIES),
+            "status": "pending",
+            "latitude": 40.7,
+            "longitude": -74.0,
+        }).decode()
+        sent_at[event_id] = start = time.perf_counter()
+        broker.publish(payload)
+        publish_ms.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(1 / rate)
+
+    dropped = sum(subscription.dropped for subscription in subscriptions)
+    broker.close()
+    await asyncio.wait(consumers, timeout=5)
+
+    return {
+        "publish_p50": percentile(publish_ms, 50),
+        "publish_p99": percentile(publish_ms, 99),
+        "deliver_p50": percentile(latencies, 50),
+        "deliver_p99": percentile(latencies, 99),
+        "delivered": len(latencies),
+        "dropped": dropped,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200, help="events per second")
+    parser.add_argument("--slow-fraction", type=float, default=0.01)
+    parser.add_argument("--filtered", action="store_true", help="give each subscriber a category filter")
+    args = parser.parse_args()
+
+    print(f"{'subscribers':>11} {'publish p50/p99 ms':>20} {'deliver p50/p99 ms':>20} {'delivered':>10} {'dropped':>8}")
+    for subscribers in args.subscribers:
+        result = await run(subscribers, args.events, args.rate, args.slow_fraction, args.filtered)
+        print(
+            f"{subscribers:>11} "
+            f"{result['publish_p50']:>9.3f}/{result['publish_p99']:<10.3f} "
+            f"{result['deliver_p50']:>9.3f}/{result['deliver_p99']:<10.3f} "
+            f"{result['delivered']:>10} {result['dropped']:>8}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,395 @@
+"""
+Load test replaying a mobile traffic mix against the API.
+
+For each scale it resets the scratch civic_bench schema, seeds users and
+reports, starts the app under uvicorn against that schema (in-memory storage),
+runs --concurrency virtual clients for --seconds, and records throughput and
+p50/p95/p99 latency per endpoint. Results are written as JSON:
+
+    python -m benchmarks.bench_load --scales 10000 100000 --concurrency 50 --seconds 30
+
+Each client logs in, then repeatedly picks an action from the weighted mix
+(login, upload, all, my, nearby, stats), revalidating lists and stats with
+If-None-Match like the mobile app does. Per-user rate limits are switched off
+in the server under test unless --rate-limits is given; rejected requests (429,
+or 503 from load shedding) are counted separately and kept out of the latency
+figures. Compare two result files with
+
+    python -m benchmarks.bench_load --compare before.json after.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from app.analytics import rebuild_rollups
+from app.clusters import rebuild_report_cells
+from app.counters import reconcile_counters
+from app.utils import hash_password
+from .common import (
+    BENCH_SCHEMA, CATEGORIES, ISSUE_WORDS, create_bench_pool, create_schema, database_url,
+    seed_users, seed_reports, random_point, percentile
+)
+
+DEFAULT_MIX = "login=2,upload=5,all=20,my=15,nearby=40,stats=18"
+
+BENCH_PASSWORD = "bench-password"
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+def parse_mix(text: str) -> dict:
+    """Parse "name=weight,..." into {name: weight}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ACTIONS:
+            raise SystemExit(f"Unknown action in --mix: {name.strip()} (known: {', '.join(ACTIONS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def sample_image() -> bytes:
+    """A small JPEG comparable to a downscaled phone photo"""
+    from PIL import Image
+
+    rng = random.Random(1)
+    image = Image.new("RGB", (640, 480))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(640 * 480)])
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=80)
+    return buffer.getvalue()
+
+# Admission control refusals: counted on their own, not as served requests
+REJECTED_STATUSES = {429, 503}
+
+class Recorder:
+    """Latency samples of served requests, rejections and status codes per endpoint"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self.rejected = {}
+
+    async def request(self, name: str, client: httpx.AsyncClient, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        codes = self.statuses.setdefault(name, {})
+        codes[response.status_code] = codes.get(response.status_code, 0) + 1
+        if response.status_code in REJECTED_STATUSES:
+            self.rejected[name] = self.rejected.get(name, 0) + 1
+            return response
+        self.latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+    def summary(self, seconds: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors) | set(self.rejected)):
+            samples = self.latencies.get(name, [])
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors.get(name, 0),
+                "rejected": self.rejected.get(name, 0),
+                "status_codes": {str(code): count for code, count in sorted(self.statuses.get(name, {}).items())},
+                "throughput_rps": round(len(samples) / seconds, 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+                "max_ms": round(max(samples), 2) if samples else None
+            }
+        every = [sample for samples in self.latencies.values() for sample in samples]
+        total = {
+            "requests": len(every),
+            "errors": sum(self.errors.values()),
+            "rejected": sum(self.rejected.values()),
+            "throughput_rps": round(len(every) / seconds, 2),
+            "p50_ms": round(percentile(every, 50), 2),
+            "p95_ms": round(percentile(every, 95), 2),
+            "p99_ms": round(percentile(every, 99), 2)
+        }
+        return {"endpoints": endpoints, "total": total}
+
+class VirtualUser:
+    """One mobile client: a login session plus the validators it has cached"""
+
+    def __init__(self, client: httpx.AsyncClient, username: str, rng: random.Random, image: bytes, image_ratio: float):
+        self.client = client
+        self.username = username
+        self.rng = rng
+        self.image = image
+        self.image_ratio = image_ratio
+        self.headers = {}
+        self.etags = {}
+
+    async def get_cached(self, recorder: Recorder, name: str, url: str, params: dict = None):
+        """GET with the validator from the previous response, as the app's HTTP cache would"""
+        headers = dict(self.headers)
+        key = (url, tuple(sorted((params or {}).items())))
+        if key in self.etags:
+            headers["If-None-Match"] = self.etags[key]
+        response = await recorder.request(name, self.client, "GET", url, params=params, headers=headers)
+        if response is not None and response.headers.get("etag"):
+            self.etags[key] = response.headers["etag"]
+        return response
+
+async def do_login(user: VirtualUser, recorder: Recorder):
+    response = await recorder.request(
+        "login", user.client, "POST", "/api/auth/login",
+        json={"username": user.username, "password": BENCH_PASSWORD}
+    )
+    if response is not None and response.status_code == 200:
+        user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def do_upload(user: VirtualUser, recorder: Recorder):
+    latitude, longitude = random_point(user.rng)
+    data = {
+        "text": f"{' '.join(user.rng.sample(ISSUE_WORDS, 4))} near block {user.rng.randint(1, 999)}",
+        "latitude": f"{latitude:.6f}",
+        "longitude": f"{longitude:.6f}",
+        "category": user.rng.choice(CATEGORIES)
+    }
+    files = None
+    if user.rng.random() < user.image_ratio:
+        files = {"image": ("photo.jpg", user.image, "image/jpeg")}
+    await recorder.request("upload", user.client, "POST", "/api/reports/upload", data=data, files=files, headers=user.headers)
+
+async def do_all(user: VirtualUser, recorder: Recorder):
+    response = await user.get_cached(recorder, "all", "/api/reports/all", {"limit": 20})
+    # Some clients scroll past the first page
+    cursor = response.headers.get("x-next-cursor") if response is not None else None
+    if cursor and user.rng.random() < 0.3:
+        await recorder.request(
+            "all", user.client, "GET", "/api/reports/all",
+            params={"limit": 20, "cursor": cursor}, headers=user.headers
+        )
+
+async def do_my(user: VirtualUser, recorder: Recorder):
+    await user.get_cached(recorder, "my", "/api/reports/my", {"limit": 20})
+
+async def do_nearby(user: VirtualUser, recorder: Recorder):
+    latitude, longitude = random_point(user.rng)
+    await recorder.request(
+        "nearby", user.client, "POST", "/api/reports/nearby",
+        json={"latitude": latitude, "longitude": longitude, "radius_km": user.rng.choice([1.0, 2.0, 5.0])},
+        headers=user.headers
+    )
+
+async def do_stats(user: VirtualUser, recorder: Recorder):
+    await user.get_cached(recorder, "stats", "/api/reports/stats")
+
+ACTIONS = {
+    "login": do_login,
+    "upload": do_upload,
+    "all": do_all,
+    "my": do_my,
+    "nearby": do_nearby,
+    "stats": do_stats
+}
+
+async def run_user(user: VirtualUser, mix: dict, deadline: float, think_ms: float, recorder: Recorder):
+    """Replay the traffic mix until the deadline"""
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await ACTIONS[user.rng.choices(names, weights)[0]](user, recorder)
+        if think_ms:
+            await asyncio.sleep(user.rng.expovariate(1000 / think_ms))
+
+async def drive_load(base_url: str, args, mix: dict, image: bytes) -> dict:
+    """Log every client in, then run the mix for args.seconds"""
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        users = [
+            VirtualUser(client, f"bench_user_{i % args.users}", random.Random(args.seed + i), image, args.image_ratio)
+            for i in range(args.concurrency)
+        ]
+        # Initial logins are warm-up and not recorded
+        await asyncio.gather(*(do_login(user, Recorder()) for user in users))
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        await asyncio.gather(*(run_user(user, mix, deadline, args.think_ms, recorder) for user in users))
+        return recorder.summary(time.perf_counter() - start)
+
+async def seed(scale: int, users: int) -> float:
+    """Reset the benchmark schema and load users, reports and their aggregates"""
+    start = time.perf_counter()
+    password_hash = hash_password(BENCH_PASSWORD)
+    pool = await create_bench_pool()
+    try:
+        await create_schema(pool)
+        async with pool.acquire() as connection:
+            user_ids = await seed_users(connection, users, password_hash)
+            await seed_reports(connection, scale, user_ids)
+            await rebuild_report_cells(connection)
+            await reconcile_counters(connection)
+            await rebuild_rollups(connection)
+    finally:
+        await pool.close()
+    return time.perf_counter() - start
+
+def schema_url(url: str, schema: str) -> str:
+    """Point every app connection at the benchmark schema (asyncpg passes extra DSN params as settings)"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query["search_path"] = schema
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def start_server(port: int, workers: int, rate_limits: bool = False) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": schema_url(database_url(), BENCH_SCHEMA),
+        "STORAGE_BACKEND": "memory",
+        "COUNTER_RECONCILE_INTERVAL": "0",
+        # A few simulated clients replay many users' traffic back to back
+        "RATE_LIMITS_ENABLED": "1" if rate_limits else "0"
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning"
+        ],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+
+async def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise SystemExit(f"API server exited with code {server.returncode}")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit("API server did not become ready")
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_summary(scale: int, summary: dict):
+    print(f"\n{scale} reports")
+    print(
+        f"{'endpoint':>10} {'requests':>9} {'errors':>7} {'rejected':>9} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for name, row in [*summary["endpoints"].items(), ("total", summary["total"])]:
+        print(
+            f"{name:>10} {row['requests']:>9} {row['errors']:>7} {row['rejected']:>9} {row['throughput_rps']:>8.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+        )
+
+def compare(before_path: str, after_path: str):
+    """Print per-endpoint changes between two result files"""
+    before, after = (json.loads(Path(path).read_text()) for path in (before_path, after_path))
+    print(f"{before['run']['git_commit']} -> {after['run']['git_commit']}")
+    baseline = {run["reports"]: run for run in before["scales"]}
+    for run in after["scales"]:
+        previous = baseline.get(run["reports"])
+        if previous is None:
+            continue
+        print(f"\n{run['reports']} reports")
+        print(f"{'endpoint':>10} {'req/s':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+        rows = [*run["endpoints"].items(), ("total", run["total"])]
+        old_rows = {**previous["endpoints"], "total": previous["total"]}
+        for name, row in rows:
+            old = old_rows.get(name)
+            if old is None:
+                continue
+            cells = []
+            for key, width in (("throughput_rps", 16), ("p50_ms", 18), ("p95_ms", 18), ("p99_ms", 18)):
+                change = (row[key] - old[key]) / old[key] * 100 if old[key] else float("nan")
+                cells.append(f"{row[key]:.1f} ({change:+.0f}%)".rjust(width))
+            print(f"{name:>10} " + " ".join(cells))
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--users", type=int, default=1000, help="seeded user accounts")
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual clients")
+    parser.add_argument("--seconds", type=float, default=30.0, help="load duration per scale")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a client's requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted actions, name=weight,...")
+    parser.add_argument("--image-ratio", type=float, default=0.5, help="share of uploads with a photo")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--rate-limits", action="store_true", help="keep per-user rate limits on in the server")
+    parser.add_argument(
+        "--base-url",
+        help="use an already running API (started with DATABASE_URL pointing at the civic_bench schema)"
+    )
+    parser.add_argument("--output", help="results file (default benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    mix = parse_mix(args.mix)
+    image = sample_image()
+    started_at = datetime.now(timezone.utc)
+    results = {
+        "run": {
+            "started_at": started_at.isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+            "mix": mix
+        },
+        "scales": []
+    }
+
+    for scale in args.scales:
+        seed_seconds = await seed(scale, args.users)
+
+        server = None
+        base_url = args.base_url
+        if base_url is None:
+            base_url = f"http://127.0.0.1:{args.port}"
+            server = start_server(args.port, args.workers, args.rate_limits)
+        try:
+            if server:
+                await wait_until_ready(base_url, server)
+            summary = await drive_load(base_url, args, mix, image)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+        print_summary(scale, summary)
+        results["scales"].append({"reports": scale, "users": args.users, "seed_seconds": round(seed_seconds, 1), **summary})
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load-{started_at:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
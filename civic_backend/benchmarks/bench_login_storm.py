@@ -0,0 +1,83 @@
+"""
+Event-loop responsiveness during a login storm.
+
+Probes /health at a fixed rate while many clients log in concurrently, and
+compares /health latency before and during the storm. With bcrypt on the
+worker pool the two distributions should be nearly identical; with hashing on
+the event loop, /health latency grows with every concurrent login.
+
+Start the API first (e.g. `uvicorn app.main:app --port 8000`), then run
+
+    python -m benchmarks.bench_login_storm --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from .common import percentile
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, interval: float):
+    """Hit /health every interval seconds until stopped; return latencies in ms"""
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+async def login_worker(client: httpx.AsyncClient, credentials: dict, deadline: float, outcomes: dict):
+    """Log in repeatedly until the deadline, tallying response codes"""
+    while time.perf_counter() < deadline:
+        response = await client.post("/api/auth/login", json=credentials)
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+
+async def measure_health(client: httpx.AsyncClient, seconds: float, interval: float):
+    """Collect /health latencies for a fixed period"""
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_health(client, stop, interval))
+    await asyncio.sleep(seconds)
+    stop.set()
+    return await probe
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="bench_login_user")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent login clients")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each phase")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+    
+    credentials = {"username": args.username, "password": args.password}
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        # Registration fails harmlessly if the user already exists
+        await client.post("/api/auth/register", json=credentials)
+        
+        baseline = await measure_health(client, args.seconds, args.probe_interval)
+        
+        outcomes = {}
+        deadline = time.perf_counter() + args.seconds
+        workers = [
+            asyncio.create_task(login_worker(client, credentials, deadline, outcomes))
+            for _ in range(args.concurrency)
+        ]
+        storm = await measure_health(client, args.seconds, args.probe_interval)
+        await asyncio.gather(*workers)
+    
+    print(f"{'phase':>10} {'probes':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, latencies in (("baseline", baseline), ("storm", storm)):
+        print(
+            f"{name:>10} {len(latencies):>8} {percentile(latencies, 50):>8.2f} "
+            f"{percentile(latencies, 99):>8.2f} {max(latencies):>8.2f}"
+        )
+    logins = sum(outcomes.values())
+    print(f"logins: {logins} ({logins / args.seconds:.1f}/s), status codes: {outcomes}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Radius query latency for /api/reports/nearby at several table sizes.
+
+For each scale the benchmark loads synthetic reports into a scratch schema and
+times the geohash + bounding-box query used by the endpoint against a full-table
+Haversine scan (the pre-index query, with its invalid HAVING rewritten).
+
+    python -m benchmarks.bench_nearby --scales 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.routes import build_nearby_query
+from .common import create_bench_pool, create_schema, seed_users, seed_reports, random_point, percentile
+
+FULL_SCAN_QUERY = """
+    SELECT * FROM (
+        SELECT r.*, u.username,
+               (6371 * acos(LEAST(1.0, cos(radians($1)) * cos(radians(r.latitude))
+               * cos(radians(r.longitude) - radians($2))
+               + sin(radians($1)) * sin(radians(r.latitude))))) AS distance
+        FROM reports r
+        JOIN users u ON r.user_id = u.id
+        WHERE r.latitude IS NOT NULL AND r.longitude IS NOT NULL
+    ) nearby
+    WHERE distance <= $3
+    ORDER BY distance, created_at DESC
+    LIMIT 50
+"""
+
+async def time_queries(pool, points, radius_km, full_scan):
+    """Run one radius query per point and return latencies in milliseconds"""
+    latencies = []
+    async with pool.acquire() as connection:
+        for lat, lon in points:
+            if full_scan:
+                query, args = FULL_SCAN_QUERY, [lat, lon, radius_km]
+            else:
+                query, args = build_nearby_query(lat, lon, radius_km)
+            start = time.perf_counter()
+            await connection.fetch(query, *args)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200, help="radius queries per scale")
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--skip-full-scan", action="store_true", help="only time the indexed query")
+    args = parser.parse_args()
+    
+    rng = random.Random(7)
+    points = [random_point(rng) for _ in range(args.queries)]
+    
+    print(f"{'reports':>10} {'query':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for scale in args.scales:
+        pool = await create_bench_pool()
+        try:
+            await create_schema(pool)
+            async with pool.acquire() as connection:
+                user_ids = await seed_users(connection, 100)
+                await seed_reports(connection, scale, user_ids)
+            
+            variants = [("indexed", False)] if args.skip_full_scan else [("indexed", False), ("full-scan", True)]
+            for name, full_scan in variants:
+                # Warm the plan cache and buffers before measuring
+                await time_queries(pool, points[:10], args.radius_km, full_scan)
+                latencies = await time_queries(pool, points, args.radius_km, full_scan)
+                print(f"{scale:>10} {name:>10} {percentile(latencies, 50):>10.2f} {percentile(latencies, 99):>10.2f}")
+        finally:
+            await pool.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
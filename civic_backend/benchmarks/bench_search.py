@@ -0,0 +1,74 @@
+"""
+Full-text search latency for /api/reports/search at several table sizes.
+
+Loads synthetic reports into a scratch schema and times the endpoint's query
+(GIN-indexed search_vector) for single- and multi-word searches, alone and
+combined with a category filter or a radius, in both sort orders.
+
+    python -m benchmarks.bench_search --scales 100000 1000000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.routes import build_search_query
+from .common import (
+    CATEGORIES, ISSUE_WORDS, create_bench_pool, create_schema, seed_users, seed_reports,
+    random_point, percentile
+)
+
+def search_cases(rng: random.Random, count: int):
+    """Yield (label, build_search_query kwargs) pairs for a mix of searches"""
+    for _ in range(count):
+        one_word = rng.choice(ISSUE_WORDS)
+        two_words = " ".join(rng.sample(ISSUE_WORDS, 2))
+        lat, lon = random_point(rng)
+        yield "one word", {"text": one_word}
+        yield "two words", {"text": two_words}
+        yield "+ category", {"text": one_word, "category": rng.choice(CATEGORIES)}
+        yield "+ radius", {"text": one_word, "near": (lat, lon, 2.0)}
+
+async def time_searches(pool, cases, sort: str, limit: int):
+    """Run each search case and return latencies in milliseconds by label"""
+    latencies = {}
+    async with pool.acquire() as connection:
+        for label, kwargs in cases:
+            query, args = build_search_query(sort=sort, cursor=None, limit=limit, **kwargs)
+            start = time.perf_counter()
+            await connection.fetch(query, *args)
+            latencies.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+    return latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=50, help="searches per case and scale")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    
+    cases = list(search_cases(random.Random(7), args.queries))
+    
+    print(f"{'reports':>10} {'sort':>10} {'case':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    for scale in args.scales:
+        pool = await create_bench_pool()
+        try:
+            await create_schema(pool)
+            async with pool.acquire() as connection:
+                user_ids = await seed_users(connection, 100)
+                await seed_reports(connection, scale, user_ids)
+            
+            for sort in ("relevance", "recent"):
+                # Warm the plan cache and buffers before measuring
+                await time_searches(pool, cases[:20], sort, args.limit)
+                latencies = await time_searches(pool, cases, sort, args.limit)
+                for label, samples in latencies.items():
+                    print(
+                        f"{scale:>10} {sort:>10} {label:>12} "
+                        f"{percentile(samples, 50):>10.2f} {percentile(samples, 99):>10.2f}"
+                    )
+        finally:
+            await pool.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Row-to-JSON serialization cost for the report list endpoints.
+
+Compares the original path (one ReportResponse per row with Decimal->float
+conversion, then jsonable_encoder and json.dumps as FastAPI does for a
+response_model) with the shared encoder in app.serialization. No database is
+needed; rows are synthetic dicts shaped like asyncpg records.
+
+    python -m benchmarks.bench_serialization --rows 50 200 5000
+"""
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app.routes import ReportResponse
+from app.serialization import encode_reports
+from .common import CATEGORIES, STATUSES
+
+def make_rows(count: int, decimal_coordinates: bool):
+    """Build rows as the database returns them (Decimal before the SQL cast, float after)"""
+    rng = random.Random(1)
+    now = datetime.now()
+    rows = []
+    for i in range(count):
+        lat, lon = 40.7 + rng.random() / 10, -74.0 + rng.random() / 10
+        if decimal_coordinates:
+            lat, lon = Decimal(f"{lat:.8f}"), Decimal(f"{lon:.8f}")
+        rows.append({
+            "id": i,
+            "user_id": rng.randint(1, 100),
+            "username": f"user{i % 100}",
+            "text": f"Report {i}: streetlight out near block {rng.randint(1, 999)}",
+            "latitude": lat,
+            "longitude": lon,
+            "image_url": f"https://example.com/{i}.jpg",
+            "thumbnail_url": None,
+            "medium_url": None,
+            "category": rng.choice(CATEGORIES),
+            "status": rng.choice(STATUSES),
+            "created_at": now - timedelta(minutes=i),
+            "duplicate_of": None,
+            "duplicate_count": 0,
+        })
+    return rows
+
+def pydantic_path(rows) -> bytes:
+    """The per-row mapping previously duplicated across routes.py"""
+    models = [
+        ReportResponse(
+            id=report["id"],
+            user_id=report["user_id"],
+            username=report["username"],
+            text=report["text"],
+            latitude=float(report["latitude"]) if report["latitude"] else None,
+            longitude=float(report["longitude"]) if report["longitude"] else None,
+            image_url=report["image_url"],
+            thumbnail_url=report["thumbnail_url"],
+            medium_url=report["medium_url"],
+            category=report["category"],
+            status=report["status"],
+            created_at=report["created_at"],
+            duplicate_of=report["duplicate_of"],
+            duplicate_count=report["duplicate_count"]
+        )
+        for report in rows
+    ]
+    return json.dumps(jsonable_encoder(models)).encode()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 200, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'rows':>8} {'pydantic ms':>12} {'encoder ms':>12} {'speedup':>8}")
+    for count in args.rows:
+        decimal_rows = make_rows(count, decimal_coordinates=True)
+        float_rows = make_rows(count, decimal_coordinates=False)
+        number = max(1, 20_000 // count)
+        
+        old = min(timeit.repeat(lambda: pydantic_path(decimal_rows), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: encode_reports(float_rows), number=number, repeat=args.repeat)) / number
+        print(f"{count:>8} {old * 1000:>12.3f} {new * 1000:>12.3f} {old / new:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
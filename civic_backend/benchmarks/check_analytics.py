@@ -0,0 +1,129 @@
+"""
+Consistency check for the analytics rollups behind /api/analytics.
+
+Seeds the scratch schema with synthetic reports (a mix of open and closed ones),
+builds the rollups the way migration 19 does and checks the backlog trend: no
+history before the rebuild, today's figure equal to the open reports. Then it
+starts from empty rollups, creates and closes reports over several days through
+the same hooks the endpoints call, archives the oldest day's reports as partition
+maintenance would, and compares each day of the trend with the backlog recounted
+from the reports. Exits non-zero on any mismatch:
+
+    python -m benchmarks.check_analytics
+"""
+import argparse
+import asyncio
+import random
+from datetime import timedelta
+
+from app.analytics import (
+    OPEN_STATUSES, apply_reports_created, apply_status_changes, fetch_backlog_trend, rebuild_rollups,
+    remove_archived_reports
+)
+from .common import CATEGORIES, create_bench_pool, create_schema, seed_users, seed_reports
+
+CLOSED_STATUSES = ["resolved", "rejected"]
+
+async def check_rebuilt(connection, failures: list):
+    """After a rebuild: days before it have no figure, today matches the open reports"""
+    await rebuild_rollups(connection)
+    today = await connection.fetchval("SELECT LOCALTIMESTAMP::date")
+    trend = await fetch_backlog_trend(connection, today - timedelta(days=30), today)
+    open_now = await connection.fetchval(
+        "SELECT count(*) FROM reports WHERE COALESCE(status, 'pending') = ANY($1::text[])", list(OPEN_STATUSES)
+    )
+
+    for point in trend[:-1]:
+        if point["open"] is not None:
+            failures.append(f"rebuilt: {point['day']} predates the rebuild but has backlog {point['open']}")
+    if trend[-1]["open"] != open_now:
+        failures.append(f"rebuilt: today's backlog is {trend[-1]['open']}, {open_now} reports are open")
+
+async def check_incremental(connection, user_ids: list, days: int, per_day: int, seed: int, failures: list):
+    """
+    Create and close reports day by day through the hooks, archive the first
+    day's reports, then compare every day of the trend
+    """
+    rng = random.Random(seed)
+    await connection.execute("TRUNCATE reports, report_daily, report_backlog, analytics_state")
+    now = await connection.fetchval("SELECT LOCALTIMESTAMP")
+    today = now.date()
+
+    # (created day, closed day or None) per report, for the recount
+    lifetimes = []
+    for offset in range(days, -1, -1):
+        created_at = now - timedelta(days=offset)
+        reports = [
+            dict(record) for record in await connection.fetch("""
+                INSERT INTO reports (user_id, text, category, status, created_at)
+                SELECT u, 'check report', c, 'pending', $3
+                FROM unnest($1::int[], $2::text[]) AS item(u, c)
+                RETURNING id, user_id, category, status, created_at, geohash
+            """, rng.choices(user_ids, k=per_day), rng.choices(CATEGORIES, k=per_day), created_at)
+        ]
+        await apply_reports_created(connection, reports)
+
+        for report in reports:
+            close_offset = rng.randint(-3, offset) if rng.random() < 0.6 else -1
+            if close_offset >= 0:
+                changed_at = now - timedelta(days=close_offset)
+                new_status = rng.choice(CLOSED_STATUSES)
+                await connection.execute("UPDATE reports SET status = $2 WHERE id = $1", report["id"], new_status)
+                await apply_status_changes(
+                    connection, [({**report, "status": new_status, "changed_at": changed_at}, "pending")]
+                )
+                lifetimes.append((created_at.date(), changed_at.date()))
+            else:
+                lifetimes.append((created_at.date(), None))
+
+    # Archiving takes the first day's open reports out of the backlog today only
+    first_day = today - timedelta(days=days)
+    await connection.execute(f"""
+        CREATE TEMP TABLE check_archived AS
+        SELECT * FROM reports WHERE created_at < '{first_day + timedelta(days=1)}'
+    """)
+    await remove_archived_reports(connection, "check_archived")
+    await connection.execute("DROP TABLE check_archived")
+    lifetimes = [
+        (created, today if created == first_day and closed is None else closed)
+        for created, closed in lifetimes
+    ]
+
+    trend = await fetch_backlog_trend(connection, today - timedelta(days=days + 5), today)
+    for point in trend:
+        expected = sum(
+            1 for created, closed in lifetimes
+            if created <= point["day"] and (closed is None or closed > point["day"])
+        )
+        if point["open"] != expected:
+            failures.append(f"incremental: {point['day']} backlog {point['open']}, expected {expected}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20_000, help="synthetic reports to seed")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=20, help="days of incremental history")
+    parser.add_argument("--per-day", type=int, default=50, help="reports created per day")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    pool = await create_bench_pool()
+    failures = []
+    try:
+        await create_schema(pool)
+        async with pool.acquire() as connection:
+            user_ids = await seed_users(connection, args.users)
+            await seed_reports(connection, args.reports, user_ids)
+            await check_rebuilt(connection, failures)
+            await check_incremental(connection, user_ids, args.days, args.per_day, args.seed, failures)
+    finally:
+        await pool.close()
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        raise SystemExit(f"{len(failures)} analytics checks failed")
+    print("analytics rollups consistent")
+
+if __name__ == "__main__":
+    asyncio.run(main())
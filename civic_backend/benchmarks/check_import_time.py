@@ -0,0 +1,73 @@
+"""
+Import-time budget check for app.main.
+
+Imports app.main in fresh interpreters under `python -X importtime`, takes the
+fastest run, and exits non-zero if it exceeds the budget or if a module that
+should load lazily (on first use or in the lifespan) was imported. Suitable
+as a CI gate:
+
+    python -m benchmarks.check_import_time --budget-ms 800
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules app.main must not import eagerly
+LAZY_MODULES = ["passlib", "bcrypt", "PIL", "httpx"]
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def profile_import(module: str) -> dict:
+    """Import module in a fresh interpreter; return {module: (self_us, cumulative_us)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(own), int(cumulative))
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [profile_import(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda timings: timings[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"{'self ms':>10} {'cumulative ms':>14}  module")
+    for name, (own, cumulative) in sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"{own / 1000:>10.1f} {cumulative / 1000:>14.1f}  {name}")
+    print(f"\n{args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    eager = sorted({
+        name for name in best
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    })
+    if eager:
+        failures.append(f"modules that should load lazily were imported: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Query-plan regression check for the queries the endpoints issue.
+
+Seeds the scratch schema with synthetic reports and builds the map and analytics
+aggregates from them, runs EXPLAIN on each query the endpoints issue and exits
+non-zero if any plan scans a (non-empty) monthly reports partition, users, the
+map cells or the daily rollups sequentially, or sorts where the index order
+should serve the query. Partitions made ahead of time are empty and ignored; the
+per-area backlog is small and read whole. Queries that rank rows (by distance,
+relevance or recency), lock rows in id order or aggregate rollups may sort.
+Suitable as a CI gate:
+
+    python -m benchmarks.check_query_plans --reports 200000
+"""
+import argparse
+import asyncio
+import json
+from datetime import timedelta
+
+from app.analytics import (
+    build_backlog_by_area_query, build_backlog_net_query, build_daily_query, build_resolution_by_area_query,
+    rebuild_rollups
+)
+from app.clusters import CLUSTER_CELLS_QUERY, rebuild_report_cells
+from app.dedup import (
+    CANONICAL_CANDIDATES_QUERY, DUPLICATE_RADIUS_KM, DUPLICATE_WINDOW_DAYS, MAX_DUPLICATE_CANDIDATES
+)
+from app.export import build_export_query
+from app.geo import bounding_box, covering_cells, prefix_ranges
+from app.images import IMAGE_URLS_UPDATE_QUERY
+from app.pagination import DEFAULT_PAGE_SIZE, encode_cursor
+from app.partitions import partition_month
+from app.routes import (
+    EXISTING_CLIENT_IDS_QUERY, REPORT_BY_ID_QUERY, REPORT_VERSION_QUERY, BulkStatusFilter,
+    build_reports_page_query, build_nearby_query, build_search_query, build_status_update_query
+)
+from .common import create_bench_pool, create_schema, seed_users, seed_reports
+
+SCANNED_TABLES = {"reports", "users", "report_cells", "report_daily"}
+SORT_NODES = {"Sort", "Incremental Sort"}
+
+def scanned_table(node: dict):
+    """The table a scan node reads, counting monthly report partitions as reports"""
+    relation = node.get("Relation Name")
+    return "reports" if relation and partition_month(relation) else relation
+
+def plan_cases(sample) -> list:
+    """Return (name, (query, args), sort allowed) for every query the endpoints run"""
+    cursor = encode_cursor(sample["created_at"], sample["id"])
+    user_id, category = sample["user_id"], sample["category"]
+    since = sample["created_at"] - timedelta(days=30)
+    latitude, longitude = sample["latitude"], sample["longitude"]
+
+    # Duplicate candidates come from the cells around the sample, map cells from a ~4 km viewport
+    lows, highs = prefix_ranges(covering_cells(*bounding_box(latitude, longitude, DUPLICATE_RADIUS_KM)))
+    viewport = covering_cells(latitude - 0.02, longitude - 0.02, latitude + 0.02, longitude + 0.02, max_precision=5)
+
+    return [
+        ("all, first page", build_reports_page_query(None, DEFAULT_PAGE_SIZE), False),
+        ("all, next page", build_reports_page_query(cursor, DEFAULT_PAGE_SIZE), False),
+        ("my, first page", build_reports_page_query(None, DEFAULT_PAGE_SIZE, user_id), False),
+        ("my, next page", build_reports_page_query(cursor, DEFAULT_PAGE_SIZE, user_id), False),
+        ("report by id", (REPORT_BY_ID_QUERY, [sample["id"]]), False),
+        ("report version", (REPORT_VERSION_QUERY, [sample["id"]]), False),
+        (
+            "image urls update",
+            (IMAGE_URLS_UPDATE_QUERY, [sample["id"], sample["created_at"], "thumbnail", "medium"]),
+            False
+        ),
+        (
+            "batch client ids",
+            (EXISTING_CLIENT_IDS_QUERY, [user_id, ["bench-client-1", "bench-client-2"]]),
+            False
+        ),
+        (
+            "duplicate candidates",
+            (
+                CANONICAL_CANDIDATES_QUERY,
+                [lows, highs, [1, 2, 3], category, DUPLICATE_WINDOW_DAYS, MAX_DUPLICATE_CANDIDATES]
+            ),
+            True
+        ),
+        ("nearby", build_nearby_query(latitude, longitude, 2.0), True),
+        ("map clusters", (CLUSTER_CELLS_QUERY, [len(viewport[0]), viewport]), False),
+        ("search, relevance", build_search_query("pothole", "relevance", None, DEFAULT_PAGE_SIZE), True),
+        (
+            "search, recent + category",
+            build_search_query("pothole", "recent", None, DEFAULT_PAGE_SIZE, category=category),
+            True
+        ),
+        ("status, by id", build_status_update_query("resolved", user_id, report_ids=[sample["id"]]), True),
+        (
+            "status, by filter",
+            build_status_update_query("resolved", user_id, filters=BulkStatusFilter(category=category)),
+            True
+        ),
+        (
+            "export, category + dates",
+            build_export_query(category=category, since=since, until=sample["created_at"]),
+            False
+        ),
+        ("analytics, daily", build_daily_query(since.date(), sample["created_at"].date(), category), True),
+        (
+            "analytics, resolution",
+            build_resolution_by_area_query(since.date(), sample["created_at"].date(), category),
+            True
+        ),
+        ("analytics, backlog", build_backlog_by_area_query(category), True),
+        ("analytics, trend", build_backlog_net_query(since.date(), sample["created_at"].date(), category), True),
+    ]
+
+def plan_nodes(plan: dict, skip=None):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan tree, leaving out the subtrees skip selects"""
+    if skip is not None and skip(plan):
+        return
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child, skip)
+
+def plan_problems(plan: dict, allow_sort: bool, empty_partitions: frozenset = frozenset()) -> list:
+    # Empty partitions (the months made ahead of time) may be read any way at no cost
+    def reads_only_empty(node: dict) -> bool:
+        relations = {scan.get("Relation Name") for scan in plan_nodes(node) if "Relation Name" in scan}
+        return bool(relations) and relations <= empty_partitions
+
+    problems = []
+    for node in plan_nodes(plan, reads_only_empty):
+        if node["Node Type"] == "Seq Scan" and scanned_table(node) in SCANNED_TABLES:
+            problems.append(f"sequential scan on {node['Relation Name']}")
+        if node["Node Type"] in SORT_NODES and not allow_sort:
+            problems.append(f"{node['Node Type'].lower()} on {', '.join(node.get('Sort Key', []))}")
+    return problems
+
+def plan_summary(plan: dict) -> str:
+    """Scan nodes with their index, e.g. "Index Scan idx_reports_created" """
+    parts = []
+    for node in plan_nodes(plan):
+        if "Scan" in node["Node Type"] and scanned_table(node) in SCANNED_TABLES:
+            parts.append(f"{node['Node Type']} {node.get('Index Name', node['Relation Name'])}")
+    return ", ".join(parts) or plan["Node Type"]
+
+async def explain(connection, query: str, args: list) -> dict:
+    result = await connection.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+    return json.loads(result)[0]["Plan"]
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200_000, help="synthetic reports to seed")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--show-plans", action="store_true", help="print the full plan of failing queries")
+    args = parser.parse_args()
+
+    pool = await create_bench_pool()
+    failures = 0
+    try:
+        await create_schema(pool)
+        async with pool.acquire() as connection:
+            user_ids = await seed_users(connection, args.users)
+            await seed_reports(connection, args.reports, user_ids)
+            await rebuild_report_cells(connection)
+            await rebuild_rollups(connection)
+            await connection.execute("ANALYZE report_cells, report_daily, report_backlog")
+
+            # A row from the middle of the table, so cursors and filters are typical
+            sample = await connection.fetchrow("""
+                SELECT id, user_id, created_at, category,
+                       latitude::float8 AS latitude, longitude::float8 AS longitude
+                FROM reports ORDER BY id OFFSET $1 LIMIT 1
+            """, args.reports // 2)
+
+            empty_partitions = frozenset(await connection.fetchval("""
+                SELECT array_agg(relname) FROM pg_class
+                WHERE relispartition AND relname ~ '^reports_p[0-9]{6}$' AND reltuples <= 0
+            """) or [])
+            
+            print(f"{'query':<28} {'result':<6} plan")
+            for name, (query, query_args), allow_sort in plan_cases(sample):
+                plan = await explain(connection, query, query_args)
+                problems = plan_problems(plan, allow_sort, empty_partitions)
+                print(f"{name:<28} {'FAIL' if problems else 'ok':<6} {plan_summary(plan)}")
+                for problem in problems:
+                    print(f"{'':<35}{problem}")
+                if problems:
+                    failures += 1
+                    if args.show_plans:
+                        plan_text = await connection.fetch(f"EXPLAIN {query}", *query_args)
+                        print("\n".join(f"{'':<35}{row[0]}" for row in plan_text))
+    finally:
+        await pool.close()
+
+    if failures:
+        raise SystemExit(f"{failures} queries have plans that regressed")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against the Postgres server in BENCH_DATABASE_URL (falling back
+to DATABASE_URL) inside a dedicated schema, so the application's own tables are
+never touched. Run them from the civic_backend directory, e.g.
+
+    python -m benchmarks.bench_nearby
+"""
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Sequence, Tuple
+
+import asyncpg
+from dotenv import load_dotenv
+
+from app.migrations import apply_migrations
+from app.geo import EARTH_RADIUS_KM, encode_geohash
+from app.partitions import ensure_partitions
+
+load_dotenv()
+
+BENCH_SCHEMA = "civic_bench"
+
+CATEGORIES = ["infrastructure", "safety", "environment", "transportation", "utilities", "other"]
+STATUSES = ["pending", "in_progress", "resolved", "rejected"]
+
+# Vocabulary for synthetic report text, so text search has realistic selectivity
+ISSUE_WORDS = [
+    "pothole", "streetlight", "graffiti", "flooding", "sidewalk", "crack", "trash",
+    "overflowing", "bin", "signal", "broken", "tree", "fallen", "leak", "water",
+    "noise", "parking", "abandoned", "vehicle", "bench", "damaged", "manhole",
+    "cover", "missing", "sign", "crosswalk", "faded", "dumping", "illegal", "outage"
+]
+
+# Default synthetic city centre (New York) and spread of generated reports
+CENTER = (40.7128, -74.0060)
+SPREAD_KM = 30.0
+
+def database_url() -> str:
+    """Return the database URL benchmarks should run against"""
+    url = os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not url:
+        raise SystemExit("Set BENCH_DATABASE_URL or DATABASE_URL to run benchmarks")
+    return url
+
+async def create_bench_pool(schema: str = BENCH_SCHEMA, reset: bool = True, **kwargs) -> asyncpg.Pool:
+    """Create a pool whose search_path points at a (freshly reset) benchmark schema"""
+    url = database_url()
+    
+    connection = await asyncpg.connect(url)
+    try:
+        if reset:
+            await connection.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        await connection.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    finally:
+        await connection.close()
+    
+    kwargs.setdefault("min_size", 1)
+    kwargs.setdefault("max_size", 10)
+    return await asyncpg.create_pool(url, server_settings={"search_path": schema}, **kwargs)
+
+async def create_schema(pool: asyncpg.Pool):
+    """Create the application tables inside the benchmark schema"""
+    async with pool.acquire() as connection:
+        await apply_migrations(connection)
+
+def random_point(rng: random.Random, center: Tuple[float, float] = CENTER, spread_km: float = SPREAD_KM):
+    """Return a random coordinate within spread_km of center"""
+    lat, lon = center
+    dlat = math.degrees(spread_km / EARTH_RADIUS_KM)
+    dlon = math.degrees(spread_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    return lat + rng.uniform(-dlat, dlat), lon + rng.uniform(-dlon, dlon)
+
+async def seed_users(connection: asyncpg.Connection, count: int, password_hash: str = "x") -> List[int]:
+    """Insert synthetic users and return their ids"""
+    await connection.copy_records_to_table(
+        "users",
+        records=[(f"bench_user_{i}", password_hash) for i in range(count)],
+        columns=["username", "password"]
+    )
+    rows = await connection.fetch("SELECT id FROM users ORDER BY id")
+    return [row["id"] for row in rows]
+
+async def seed_reports(
+    connection: asyncpg.Connection,
+    count: int,
+    user_ids: Sequence[int],
+    seed: int = 42,
+    chunk_size: int = 50_000
+):
+    """Bulk-load synthetic geolocated reports spread over the last year"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    columns = ["user_id", "text", "latitude", "longitude", "category", "status", "created_at", "geohash"]
+    
+    # Monthly partitions exist from migration time onwards; the backdated rows need older ones
+    await ensure_partitions(connection, now - timedelta(days=366))
+    
+    for start in range(0, count, chunk_size):
+        records = []
+        for i in range(start, min(start + chunk_size, count)):
+            lat, lon = random_point(rng)
+            records.append((
+                rng.choice(user_ids),
+                f"Synthetic report {i}: {' '.join(rng.sample(ISSUE_WORDS, 4))} "
+                f"near block {rng.randint(1, 999)}",
+                Decimal(f"{lat:.8f}"),
+                Decimal(f"{lon:.8f}"),
+                rng.choice(CATEGORIES),
+                rng.choice(STATUSES),
+                now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+                encode_geohash(lat, lon)
+            ))
+        await connection.copy_records_to_table("reports", records=records, columns=columns)
+    
+    await connection.execute("ANALYZE reports")
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Return the pct-th percentile (0-100) of samples using nearest-rank"""
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
@@ -1,6 +1,18 @@
 // components/ReportCard.js
 import React from 'react';
-import { View, Text, Image, StyleSheet } from 'react-native';
+import { View, Text, Image, StyleSheet, Dimensions, PixelRatio } from 'react-native';
+
+// Longest edge in pixels of the server-generated thumbnail variant
+const THUMBNAIL_EDGE = 400;
+
+// Pick the smallest image variant that still covers the card at this screen density
+const pickImageUri = (report) => {
+  const cardPixels = PixelRatio.getPixelSizeForLayoutSize(Dimensions.get('window').width);
+  if (report.thumbnail_url && cardPixels <= THUMBNAIL_EDGE) {
+    return report.thumbnail_url;
+  }
+  return report.medium_url || report.image_url;
+};
 
 const ReportCard = ({ report }) => {
   const statusColor = report.status === 'resolved' ? 'green' : 'orange';
@@ -25,7 +37,7 @@ const ReportCard = ({ report }) => {
 
       {report.image_url && (
         <Image 
-          source={{ uri: report.image_url }} 
+          source={{ uri: pickImageUri(report) }} 
           style={styles.image} 
           resizeMode="cover" 
         />
@@ -8,12 +8,15 @@ import api from '../services/api';
 const AllReportsScreen = () => {
   const [reports, setReports] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const fetchAllReports = async () => {
     setLoading(true);
     try {
       const response = await api.get('/api/reports/all');
       setReports(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       Alert.alert('Error', error.response?.data?.detail || 'Failed to fetch all reports.');
       console.error(error);
@@ -22,6 +25,21 @@ const AllReportsScreen = () => {
     }
   };
 
+  // Fetch the next page when the list is scrolled near its end
+  const fetchMoreReports = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get('/api/reports/all', { params: { cursor: nextCursor } });
+      setReports((current) => [...current, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error(error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useFocusEffect(
     React.useCallback(() => {
       fetchAllReports();
@@ -42,6 +60,9 @@ const AllReportsScreen = () => {
         data={reports}
         keyExtractor={(item) => item.id.toString()}
         renderItem={({ item }) => <ReportCard report={item} />}
+        onEndReached={fetchMoreReports}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={loadingMore && <ActivityIndicator style={styles.footer} />}
         contentContainerStyle={reports.length === 0 && styles.centered}
         ListEmptyComponent={
           <Text style={styles.emptyText}>No reports have been uploaded yet.</Text>
@@ -62,6 +83,9 @@ const styles = StyleSheet.create({
     justifyContent: 'center',
     alignItems: 'center',
   },
+  footer: {
+    marginVertical: 10,
+  },
   emptyText: {
     fontSize: 16,
     color: 'gray',
@@ -8,12 +8,15 @@ import api from '../services/api';
 const MyReportsScreen = () => {
   const [reports, setReports] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const fetchMyReports = async () => {
     setLoading(true);
     try {
       const response = await api.get('/api/reports/my');
       setReports(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       Alert.alert('Error', error.response?.data?.detail || 'Failed to fetch your reports.');
       console.error(error);
@@ -22,6 +25,21 @@ const MyReportsScreen = () => {
     }
   };
 
+  // Fetch the next page when the list is scrolled near its end
+  const fetchMoreReports = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get('/api/reports/my', { params: { cursor: nextCursor } });
+      setReports((current) => [...current, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error(error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useFocusEffect(
     React.useCallback(() => {
       fetchMyReports();
@@ -42,6 +60,9 @@ const MyReportsScreen = () => {
         data={reports}
         keyExtractor={(item) => item.id.toString()}
         renderItem={({ item }) => <ReportCard report={item} />}
+        onEndReached={fetchMoreReports}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={loadingMore && <ActivityIndicator style={styles.footer} />}
         contentContainerStyle={reports.length === 0 && styles.centered}
         ListEmptyComponent={
           <Text style={styles.emptyText}>You haven't uploaded any reports yet.</Text>
@@ -62,6 +83,9 @@ const styles = StyleSheet.create({
     justifyContent: 'center',
     alignItems: 'center',
   },
+  footer: {
+    marginVertical: 10,
+  },
   emptyText: {
     fontSize: 16,
     color: 'gray',